@@ -9,6 +9,7 @@ import logging
 import tkinter as tk
 from tkinter import ttk
 from skimage.metrics import structural_similarity as ssim
+from peak_finder import find_peaks
 
 logging.basicConfig(
     level=logging.INFO,
@@ -350,21 +351,20 @@ def analyze_button_images(run_time=30):  # 30 seconds
         
         # Find matches
         result = cv2.matchTemplate(img_bgr, button['pre_img'], cv2.TM_CCORR_NORMED)
-        locations = np.where(result >= confidence_threshold)
+        peaks = find_peaks(result, confidence_threshold, (template_w, template_h), max_peaks=20)
         
-        print(f"\nFound {len(locations[0])} potential matches")
+        print(f"\nFound {len(peaks)} potential matches")
         
         best_match = None
         best_distance = float('inf')
         
-        for pt in zip(*locations[::-1]):
+        for confidence, pt in peaks:
             # Calculate monitor-relative coordinates
             match_x = cal_x - search_margin_x + pt[0]
             match_y = cal_y - search_margin_y + pt[1]
             
             # Calculate distance from calibration point
             distance = ((match_x - cal_x) ** 2 + (match_y - cal_y) ** 2) ** 0.5
-            confidence = result[pt[1], pt[0]]
             
             print(f"\nFound match:")
             print(f"  Template position in search region: ({pt[0]}, {pt[1]})")
@@ -511,19 +511,18 @@ def find_button_in_region(search_region, template_img, target_monitor, original_
     # Find all matches above threshold
     result = cv2.matchTemplate(img_bgr, template_img, cv2.TM_CCORR_NORMED)
     threshold = 0.75
-    locations = np.where(result >= threshold)
+    template_h, template_w = template_img.shape[:2]
     
     best_match = None
     best_confidence = 0
     
-    for pt in zip(*locations[::-1]):  # Switch columns and rows
+    for confidence, pt in find_peaks(result, threshold, (template_w, template_h), max_peaks=20):
         # These coordinates are relative to the search region
         match_x = pt[0] + search_region["left"] - target_monitor["left"]
         match_y = pt[1] + search_region["top"] - target_monitor["top"]
         
         # Calculate distance from original calibration position
         distance = ((match_x - original_coords[0]) ** 2 + (match_y - original_coords[1]) ** 2) ** 0.5
-        confidence = result[pt[1], pt[0]]
         
         print(f"Found match at ({match_x}, {match_y}) relative to monitor")
         print(f"Distance from calibration: {distance:.1f}px")
@@ -639,56 +638,14 @@ def analyze_single_screenshot():
         # Find all matches in the screenshot
         result = cv2.matchTemplate(screenshot_bgr, template, cv2.TM_CCORR_NORMED)
         
-        # Get matches
-        matches = []
+        # Distinct high-confidence instances (overlapping peaks merged), best first
         template_h, template_w = template.shape[:2]
+        top_matches = [
+            {'x': x + template_w // 2, 'y': y + template_h // 2, 'confidence': confidence}
+            for confidence, (x, y) in find_peaks(result, 0.9, (template_w, template_h), max_peaks=5)
+        ]
         
-        # Flatten result array and get indices of top matches
-        flat_result = result.flatten()
-        top_indices = np.argsort(flat_result)[-50:]  # Get more initial matches
-        
-        for idx in top_indices[::-1]:  # Process highest confidence first
-            # Convert flat index back to 2D coordinates
-            y_idx, x_idx = np.unravel_index(idx, result.shape)
-            confidence = flat_result[idx]
-            
-            if confidence < 0.9:  # Only consider very high confidence matches
-                continue
-                
-            match_x = x_idx + template_w//2
-            match_y = y_idx + template_h//2
-            
-            # Add to matches list
-            matches.append({
-                'x': match_x,
-                'y': match_y,
-                'confidence': confidence
-            })
-        
-        # Group matches by x-axis position (within 20px)
-        x_groups = {}
-        for match in matches:
-            grouped = False
-            for base_x in x_groups:
-                if abs(match['x'] - base_x) <= 20:
-                    x_groups[base_x].append(match)
-                    grouped = True
-                    break
-            if not grouped:
-                x_groups[match['x']] = [match]
-        
-        # Find best match in each x-position group
-        best_matches = []
-        for base_x, group in x_groups.items():
-            # Sort by confidence first, then y-position
-            group.sort(key=lambda m: (m['confidence'], m['y']), reverse=True)
-            best_matches.append(group[0])
-        
-        # Sort final matches by confidence
-        best_matches.sort(key=lambda m: m['confidence'], reverse=True)
-        top_matches = best_matches[:5]
-        
-        print(f"\nTop {len(top_matches)} matches for Button {i} (grouped by x-position):")
+        print(f"\nTop {len(top_matches)} matches for Button {i}:")
         for idx, match in enumerate(top_matches, 1):
             print(f"Match {idx}:")
             print(f"  Position: ({match['x']}, {match['y']})")
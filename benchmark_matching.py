@@ -0,0 +1,118 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import cv2
+from pyramid_match import PyramidMatcher
+
+METHODS = [
+    ('TM_CCOEFF_NORMED', cv2.TM_CCOEFF_NORMED),
+    ('TM_CCORR_NORMED', cv2.TM_CCORR_NORMED),
+    ('TM_SQDIFF_NORMED', cv2.TM_SQDIFF_NORMED)
+]
+
+DEFAULT_FRAMES = ['images/field.png', 'images/field1.png', 'images/field2.png', 'images/debug-case.png',
+                  'debug/full_screen.png']
+
+
+def load_frames(paths, width, height):
+    """Load screenshots and scale them to the benchmark frame size."""
+    frames = []
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"Skipping unreadable frame: {path}")
+            continue
+        frames.append((Path(path).name, cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)))
+    return frames
+
+
+def sample_templates(frame, count, template_w, template_h, rng):
+    """Crop templates from textured parts of a frame (flat crops match everywhere and say nothing)."""
+    templates = []
+    attempts = 0
+    while len(templates) < count and attempts < count * 50:
+        attempts += 1
+        x = int(rng.integers(0, frame.shape[1] - template_w))
+        y = int(rng.integers(0, frame.shape[0] - template_h))
+        crop = frame[y:y + template_h, x:x + template_w]
+        if crop.std() > 20:
+            templates.append(((x, y), crop.copy()))
+    return templates
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = func()
+    return value, (time.perf_counter() - start) / repeat
+
+
+def benchmark(frames, templates_per_frame, template_size, repeat, matcher, seed):
+    rng = np.random.default_rng(seed)
+    template_w, template_h = template_size
+    stats = {name: {'agree': 0, 'total': 0, 'score_error': [], 'full': 0.0, 'pyramid': 0.0}
+             for name, _ in METHODS}
+
+    for frame_name, frame in frames:
+        for origin, template in sample_templates(frame, templates_per_frame, template_w, template_h, rng):
+            for name, method in METHODS:
+                lower_is_better = method == cv2.TM_SQDIFF_NORMED
+
+                def full():
+                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(cv2.matchTemplate(frame, template, method))
+                    return (min_val, min_loc) if lower_is_better else (max_val, max_loc)
+
+                (full_value, full_loc), full_time = timed(full, repeat)
+                (pyr_value, pyr_loc), pyr_time = timed(lambda: matcher.match(frame, template, method), repeat)
+
+                entry = stats[name]
+                entry['total'] += 1
+                entry['full'] += full_time
+                entry['pyramid'] += pyr_time
+                entry['score_error'].append(abs(full_value - pyr_value))
+                # Same location, or an equally good one (repeated UI elements tie)
+                if (abs(full_loc[0] - pyr_loc[0]) <= 1 and abs(full_loc[1] - pyr_loc[1]) <= 1) or \
+                        abs(full_value - pyr_value) < 1e-3:
+                    entry['agree'] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pyramid search with full-resolution template matching')
+    parser.add_argument('frames', nargs='*', help='Screenshots to search (default: bundled screenshots)')
+    parser.add_argument('--size', default='3840x2160', help='Frame size to scale screenshots to (default: 3840x2160)')
+    parser.add_argument('--template', default='80x40', help='Template size (default: 80x40)')
+    parser.add_argument('--templates', type=int, default=5, help='Templates sampled per frame (default: 5)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (default: 3)')
+    parser.add_argument('--levels', type=int, default=2, help='Maximum pyramid levels (default: 2)')
+    parser.add_argument('--top-k', type=int, default=5, help='Coarse candidates refined (default: 5)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split('x'))
+    template_size = tuple(int(v) for v in args.template.split('x'))
+    base = Path(__file__).parent
+    frames = load_frames(args.frames or [base / path for path in DEFAULT_FRAMES], width, height)
+    if not frames:
+        print("No frames to benchmark")
+        return
+
+    matcher = PyramidMatcher(max_levels=args.levels, top_k=args.top_k)
+    stats = benchmark(frames, args.templates, template_size, args.repeat, matcher, args.seed)
+
+    print(f"\n{len(frames)} frames at {width}x{height}, {args.template} templates, "
+          f"{args.levels} levels, top-{args.top_k}")
+    print("Method            | Agreement | Max score error | Full (ms) | Pyramid (ms) | Speedup")
+    print("-" * 86)
+    for name, entry in stats.items():
+        if not entry['total']:
+            continue
+        full_ms = entry['full'] / entry['total'] * 1000
+        pyr_ms = entry['pyramid'] / entry['total'] * 1000
+        print(f"{name:<17} | {entry['agree'] / entry['total']:>8.1%} | {max(entry['score_error']):>15.4f} | "
+              f"{full_ms:>9.1f} | {pyr_ms:>12.1f} | {full_ms / pyr_ms:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
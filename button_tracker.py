@@ -0,0 +1,95 @@
+import threading
+import time
+
+
+class Track:
+    """Last-known box of one button and its estimated motion in pixels per second."""
+
+    def __init__(self, x, y, width, height, seen_at):
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.vx = 0.0
+        self.vy = 0.0
+        self.seen_at = seen_at
+
+
+class ButtonTracker:
+    """Track-by-detection for buttons that were already found.
+
+    Every detection updates a track holding the button's box and a smoothed
+    velocity (panels scroll, buttons rarely jump). ``window()`` predicts
+    where the button is now and returns a small search window around that
+    box; callers search it first and fall back to a full search on a miss,
+    which drops the track. Tracks older than ``max_age`` seconds are dropped
+    too, as the prediction is no longer worth trusting.
+    """
+
+    def __init__(self, margin=16, smoothing=0.5, max_age=30.0, clock=time.monotonic):
+        self.margin = margin  # Slack in pixels around the predicted box
+        self.smoothing = smoothing  # Weight of the newest velocity sample
+        self.max_age = max_age
+        self.clock = clock
+        self._tracks = {}  # key -> Track
+        self._lock = threading.Lock()
+
+    def update(self, key, x, y, width, height):
+        """Record a detection of key's button with its top-left corner at (x, y)."""
+        now = self.clock()
+        with self._lock:
+            track = self._tracks.get(key)
+            if track is None or (track.width, track.height) != (width, height):
+                self._tracks[key] = Track(x, y, width, height, now)
+                return
+            elapsed = now - track.seen_at
+            if elapsed > 0:
+                a = self.smoothing
+                track.vx = a * (x - track.x) / elapsed + (1 - a) * track.vx
+                track.vy = a * (y - track.y) / elapsed + (1 - a) * track.vy
+            track.x, track.y, track.seen_at = x, y, now
+
+    def predict(self, key):
+        """Predicted (x, y, width, height) box of key's button, or None if it is not tracked."""
+        now = self.clock()
+        with self._lock:
+            track = self._tracks.get(key)
+            if track is None:
+                return None
+            elapsed = now - track.seen_at
+            if elapsed > self.max_age:
+                del self._tracks[key]
+                return None
+            return (int(round(track.x + track.vx * elapsed)), int(round(track.y + track.vy * elapsed)),
+                    track.width, track.height)
+
+    def window(self, key, image_width, image_height):
+        """Search window (x, y, width, height) around the predicted box inside the image, or None."""
+        box = self.predict(key)
+        if box is None:
+            return None
+        x, y, width, height = box
+        x0 = max(0, x - self.margin)
+        y0 = max(0, y - self.margin)
+        x1 = min(image_width, x + width + self.margin)
+        y1 = min(image_height, y + height + self.margin)
+        if x1 - x0 < width or y1 - y0 < height:
+            # Predicted off-screen: the button scrolled away
+            self.miss(key)
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+    def miss(self, key):
+        """The button was not in its window: stop tracking it."""
+        with self._lock:
+            self._tracks.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._tracks)
+
+    def forget(self, key=None):
+        """Drop every track, or one."""
+        with self._lock:
+            if key is None:
+                self._tracks.clear()
+            else:
+                self._tracks.pop(key, None)
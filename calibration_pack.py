@@ -0,0 +1,258 @@
+import os
+import re
+import json
+import mmap
+import struct
+import logging
+import tempfile
+import argparse
+from pathlib import Path
+import numpy as np
+import cv2
+from metric_calibration import METRIC_FILE, HOVER_SCREEN_FILE, AFTER_SCREEN_FILE, MetricChoice, locate_recording
+from scale_search import SCALE_FILE
+
+PACK_FILE = 'calibration.pack'
+PACK_MAGIC = b'CAAPACK\0'
+PACK_VERSION = 1
+# Array data starts on these boundaries, so every array is an aligned view into the mapped file
+PACK_ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')  # magic, version, header length
+
+# Names of the images a monitor's calibration is made of, inside the pack
+HOVER = 'hover'
+AFTER = 'after'
+HOVER_SCREEN = 'screen_hover'
+AFTER_SCREEN = 'screen_after'
+
+
+def _align(offset):
+    return -(-offset // PACK_ALIGNMENT) * PACK_ALIGNMENT
+
+
+def _read_pair(path):
+    """Comma separated integers from a text file such as click_coords.txt, or None."""
+    try:
+        return [int(value) for value in Path(path).read_text().strip().split(',')]
+    except (OSError, ValueError):
+        return None
+
+
+class CalibrationPack:
+    """One monitor's calibration in a single versioned, memory-mapped file.
+
+    The file starts with a magic string, the format version and the length
+    of a JSON header holding the scalar calibration (click position, monitor
+    geometry, scale, the calibrated metric and the recorded button
+    variations) and the offset, shape and dtype of every image. The images
+    follow as raw arrays, so ``load()`` maps the whole file at once and every
+    image is a read-only view into it, without decoding or copying.
+    Windows cannot replace or delete a mapped file, so ``close()`` copies
+    the images into memory and releases the mapping first; ``save()`` does
+    this itself when it overwrites the file the pack was loaded from.
+    """
+
+    def __init__(self, images=None, click=None, monitor=None, scale=1.0, metric=None, buttons=None):
+        self.logger = logging.getLogger('calibration_pack')
+        self.images = dict(images or {})  # name -> uint8 image array
+        self.click = click  # Click position recorded with the hover image (click_coords.txt)
+        self.monitor = monitor  # Monitor geometry at calibration, {'left', 'top', 'width', 'height'}
+        self.scale = scale  # Template scale that found the button
+        self.metric = metric  # MetricChoice, or None to try every method
+        # Recorded button variations: {'index', 'click', 'monitor'} with images button_<index>_pre/post
+        self.buttons = list(buttons or [])
+        self._mapping = None
+        self._path = None  # File the images are mapped from
+
+    @property
+    def calibrated(self):
+        """Whether the pack has everything the bot needs to click the accept button."""
+        return HOVER in self.images and AFTER in self.images and self.click is not None
+
+    def image(self, name):
+        return self.images.get(name)
+
+    def recording(self, template):
+        """Recording tuple of metric_calibration.load_recording() for a compiled hover template, or None."""
+        images = [self.images.get(name) for name in (AFTER, HOVER_SCREEN, AFTER_SCREEN)]
+        if any(image is None for image in images):
+            return None
+        return locate_recording(template, *images)
+
+    def _header(self):
+        return {
+            'click': self.click,
+            'monitor': self.monitor,
+            'scale': self.scale,
+            'metric': self.metric.to_dict() if self.metric is not None else None,
+            'buttons': self.buttons,
+            'arrays': {}
+        }
+
+    def close(self):
+        """Copy the images into memory and release the mapped file, so it can be replaced or deleted."""
+        if self._mapping is None:
+            return
+        images = {}
+        for name, image in self.images.items():
+            images[name] = image.copy()
+            images[name].flags.writeable = False
+        self.images = images
+        mapping, self._mapping, path, self._path = self._mapping, None, self._path, None
+        try:
+            mapping.close()
+        except BufferError:
+            # Views handed out earlier are still alive; the file is unmapped once they are released
+            self.logger.debug(f"Calibration pack {path} is still in use and stays mapped until released")
+
+    def save(self, path):
+        """Write the pack, replacing any previous one at once."""
+        path = Path(path)
+        if self._path is not None and os.path.abspath(self._path) == os.path.abspath(path):
+            self.close()
+        arrays = {name: np.ascontiguousarray(image) for name, image in self.images.items()}
+        header = self._header()
+        # Offsets depend on the header length, which depends on the offsets; lay out until stable
+        data_start = 0
+        while True:
+            offset = data_start
+            for name, array in arrays.items():
+                header['arrays'][name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+                offset = _align(offset + array.nbytes)
+            encoded = json.dumps(header).encode()
+            start = _align(_PREAMBLE.size + len(encoded))
+            if start == data_start:
+                break
+            data_start = start
+
+        # Readers keep mapping the old file until the new one is complete and swapped in
+        fd, temp_path = tempfile.mkstemp(prefix=path.name, suffix='.tmp', dir=path.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_PREAMBLE.pack(PACK_MAGIC, PACK_VERSION, len(encoded)))
+                f.write(encoded)
+                for name, array in arrays.items():
+                    f.seek(header['arrays'][name]['offset'])
+                    f.write(array.tobytes())
+            os.replace(temp_path, path)
+        except OSError:
+            os.unlink(temp_path)
+            raise
+        self.logger.info(f"Saved calibration pack {path} ({len(arrays)} images)")
+
+    @classmethod
+    def load(cls, path):
+        """Map a saved pack, or return None if the file is missing, invalid or of another version."""
+        logger = logging.getLogger('calibration_pack')
+        try:
+            with open(path, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot map calibration pack {path}: {str(e)}")
+            return None
+
+        try:
+            magic, version, header_length = _PREAMBLE.unpack_from(mapping)
+            if magic != PACK_MAGIC:
+                raise ValueError("not a calibration pack")
+            if version != PACK_VERSION:
+                raise ValueError(f"version {version}, expected {PACK_VERSION}")
+            header = json.loads(mapping[_PREAMBLE.size:_PREAMBLE.size + header_length])
+            images = {}
+            for name, spec in header['arrays'].items():
+                shape = tuple(spec['shape'])
+                images[name] = np.frombuffer(mapping, dtype=np.dtype(spec['dtype']), count=int(np.prod(shape)),
+                                             offset=spec['offset']).reshape(shape)
+            metric = MetricChoice.from_dict(header['metric']) if header['metric'] is not None else None
+            pack = cls(images, header['click'], header['monitor'], float(header['scale']), metric,
+                       header['buttons'])
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring calibration pack {path}: {str(e)}")
+            return None
+        pack._mapping = mapping  # Keeps the mapping open for as long as its views are used
+        pack._path = Path(path)
+        return pack
+
+    def __repr__(self):
+        return f"CalibrationPack({len(self.images)} images, {len(self.buttons)} buttons, scale={self.scale:g})"
+
+
+def import_assets(monitor_assets, monitor=None):
+    """Build a pack from a monitor's calibration files, or return None if there are none.
+
+    Reads accept_button.png, accept_after.png, click_coords.txt, the
+    calibration screenshots, metric.json and scale.json, and the button
+    variations button_<N>_pre.png, button_<N>_post.png, click_coords_<N>.txt
+    and monitor_<N>.txt. monitor is the geometry to record when the files
+    do not say (it is taken from the variations otherwise).
+    """
+    monitor_assets = Path(monitor_assets)
+    logger = logging.getLogger('calibration_pack')
+    images = {}
+    for name, filename in ((HOVER, 'accept_button.png'), (AFTER, 'accept_after.png'),
+                           (HOVER_SCREEN, HOVER_SCREEN_FILE), (AFTER_SCREEN, AFTER_SCREEN_FILE)):
+        path = monitor_assets / filename
+        if path.exists():
+            # The hover template keeps its alpha channel; transparent pixels are not matched
+            image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED if name == HOVER else cv2.IMREAD_COLOR)
+            if image is None:
+                logger.warning(f"Skipping unreadable calibration image {path}")
+                continue
+            images[name] = image
+    # Buttons are 80x40; a crop saved in the transposed orientation is rotated as TemplateBank does
+    for name in (HOVER, AFTER):
+        if name in images and images[name].shape[:2] == (80, 40):
+            images[name] = cv2.rotate(images[name], cv2.ROTATE_90_CLOCKWISE)
+
+    buttons = []
+    for pre_file in sorted(monitor_assets.glob('button_*_pre.png')):
+        index = int(re.match(r'button_(\d+)_pre\.png$', pre_file.name).group(1))
+        pre, post = cv2.imread(str(pre_file)), cv2.imread(str(monitor_assets / f'button_{index}_post.png'))
+        if pre is None or post is None:
+            logger.warning(f"Skipping incomplete button variation {index} in {monitor_assets}")
+            continue
+        images[f'button_{index}_pre'], images[f'button_{index}_post'] = pre, post
+        geometry = _read_pair(monitor_assets / f'monitor_{index}.txt')
+        buttons.append({
+            'index': index,
+            'click': _read_pair(monitor_assets / f'click_coords_{index}.txt'),
+            'monitor': dict(zip(('left', 'top', 'width', 'height'), geometry)) if geometry else None
+        })
+    buttons.sort(key=lambda button: button['index'])
+
+    click = _read_pair(monitor_assets / 'click_coords.txt')
+    if not images and click is None:
+        return None
+    if monitor is None:
+        monitor = next((button['monitor'] for button in buttons if button['monitor']), None)
+
+    scale = 1.0
+    scale_file = monitor_assets / SCALE_FILE
+    if scale_file.exists():
+        try:
+            scale = float(json.loads(scale_file.read_text())['scale'])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring invalid scale file {scale_file}: {e}")
+    metric = MetricChoice.load(monitor_assets / METRIC_FILE)
+    return CalibrationPack(images, click, monitor, scale, metric, buttons)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack each monitor\'s calibration files into calibration.pack')
+    parser.add_argument('--assets', type=Path, default=Path('assets'), help='Assets directory (default: assets)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+
+    for directory in sorted(args.assets.glob('monitor_*')):
+        pack = import_assets(directory)
+        if pack is None:
+            print(f"{directory}: no calibration files")
+            continue
+        pack.save(directory / PACK_FILE)
+        print(f"{directory}: {pack}{'' if pack.calibrated else ' (no accept button calibration)'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import time
+import logging
+import numpy as np
+import cv2
+
+
+class ChangeGate:
+    """Cheap gate in front of template matching that skips frames identical to the last searched one.
+
+    Each frame is reduced to a grid of per-tile mean colours. Detection only
+    needs to run when a tile differs from the signature of the last frame
+    that was actually searched.
+    """
+
+    def __init__(self, tile_size=32, threshold=1, refresh_interval=10.0):
+        self.logger = logging.getLogger('change_gate')
+        self.tile_size = tile_size
+        self.threshold = threshold  # Minimum change of a tile's mean colour (0-255)
+        self.refresh_interval = refresh_interval  # Force a search after this many seconds, None to disable
+        self._signatures = {}  # key -> signature of the last searched frame
+        self._searched_at = {}  # key -> time of the last search
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    def signature(self, image):
+        """Downsample a frame to one mean colour per tile."""
+        height, width = image.shape[:2]
+        grid = (max(1, -(-width // self.tile_size)), max(1, -(-height // self.tile_size)))
+        return cv2.resize(image, grid, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def changed_tiles(self, image, key=0):
+        """Return a boolean tile grid marking tiles that changed since the last searched frame."""
+        signature = self.signature(image)
+        previous = self._signatures.get(key)
+        if previous is None or previous.shape != signature.shape:
+            return np.ones(signature.shape[:2], dtype=bool)
+        diff = np.abs(signature - previous)
+        if diff.ndim == 3:
+            diff = diff.max(axis=2)
+        return diff >= self.threshold
+
+    def should_search(self, image, key=0):
+        """Return True if the frame needs a detection pass, and remember it as the last searched frame."""
+        self.frames_seen += 1
+        now = time.time()
+        signature = self.signature(image)
+        previous = self._signatures.get(key)
+
+        if previous is not None and previous.shape == signature.shape:
+            stale = (self.refresh_interval is not None and
+                     now - self._searched_at.get(key, 0) >= self.refresh_interval)
+            if not stale and not np.any(np.abs(signature - previous) >= self.threshold):
+                self.frames_skipped += 1
+                return False
+
+        self._signatures[key] = signature
+        self._searched_at[key] = now
+        return True
+
+    def pending(self, key=0):
+        """Whether the next frame for key is searched whatever it shows (nothing searched yet, or invalidated)."""
+        return key not in self._signatures
+
+    def invalidate(self, key=None):
+        """Force the next frame to be searched, for one key or for all of them."""
+        if key is None:
+            self._signatures.clear()
+            self._searched_at.clear()
+        else:
+            self._signatures.pop(key, None)
+            self._searched_at.pop(key, None)
+
+    @property
+    def skip_ratio(self):
+        """Fraction of frames that were skipped without running detection."""
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
@@ -0,0 +1,54 @@
+import numpy as np
+import cv2
+
+
+class ClickVerifier:
+    """Tells whether a clicked button's region has changed, from pixel signatures.
+
+    A signature is the region shrunk to ``size`` by area averaging: a few
+    hundred bytes of BGR that ignore single-pixel noise such as a blinking
+    caret. ``arm()`` stores the signature of the region at click time and
+    ``changed()`` compares later grabs against it by mean absolute
+    difference, so a probe costs microseconds and never touches the disk.
+    Regions are expected to be grabbed every ``interval`` seconds.
+    """
+
+    def __init__(self, size=(16, 8), threshold=12.0, interval=0.1):
+        self.size = size  # Signature (width, height)
+        self.threshold = threshold  # Mean absolute BGR difference that counts as a change
+        self.interval = interval
+        self.last_distance = 0.0  # Distance measured by the latest changed() probe
+        self._baseline = None
+        self._template_signatures = {}  # template path -> signature of the template
+
+    def signature(self, image):
+        """Signature of a BGR image; a copy, so ring-buffer frames can be reused afterwards."""
+        return cv2.resize(image, self.size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    @staticmethod
+    def distance(a, b):
+        """Mean absolute difference between two signatures, in 0-255 units."""
+        return float(np.abs(a - b).mean())
+
+    def arm(self, image, template=None):
+        """Remember the region as it was at click time.
+
+        With the button's CompiledTemplate, returns False when the region no
+        longer looks like the button, i.e. it changed before it was grabbed.
+        """
+        self._baseline = self.signature(image)
+        if template is None:
+            return True
+        expected = self._template_signatures.get(template.path)
+        if expected is None:
+            expected = self._template_signatures[template.path] = self.signature(template.bgr)
+        return self.distance(self._baseline, expected) <= self.threshold
+
+    def changed(self, image):
+        """True once the region differs from its click-time signature."""
+        self.last_distance = self.distance(self.signature(image), self._baseline)
+        return self.last_distance > self.threshold
+
+    def forget(self):
+        """Drop cached template signatures, e.g. after recalibration."""
+        self._template_signatures.clear()
@@ -1,10 +1,12 @@
-import cv2
-import numpy as np
 import pyautogui
 import time
 import logging
 import os
 from image_matcher import ImageMatcher
+from match_quality import rank_matches
+from screen_capture import CaptureEngine
+from change_gate import ChangeGate
+from scan_scheduler import ScanScheduler
 from datetime import datetime
 
 # Configure PyAutoGUI
@@ -32,20 +34,19 @@ class ClickBot:
             ]
         )
         
-        # Create temp directory if it doesn't exist
-        self.temp_dir = os.path.join(os.path.dirname(__file__), "temp")
-        os.makedirs(self.temp_dir, exist_ok=True)
+        # Capture through the shared engine (MIT-SHM on X11 when available, mss otherwise)
+        self.capture = CaptureEngine()
+        self.screen_region = self.capture.sct.monitors[0]  # Bounding box of all monitors
         
         # Load and preprocess target image once
-        self.target_image = cv2.imread(self.target_path)
+        self.target_image = self.matcher.load_template(self.target_path)
         if self.target_image is None:
             raise ValueError(f"Failed to load target image: {self.target_path}")
     
     def capture_screen(self):
         """Capture the current screen."""
         try:
-            screenshot = pyautogui.screenshot()
-            return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            return self.capture.grab(self.screen_region).image
         except Exception as e:
             logging.error(f"Error capturing screen: {str(e)}")
             return None
@@ -56,88 +57,76 @@ class ClickBot:
             # Get current mouse position
             current_x, current_y = pyautogui.position()
             
+            # Match coordinates are relative to the captured region
+            target_x = self.screen_region['left'] + match.center_x
+            target_y = self.screen_region['top'] + match.center_y
+            
             # Only move and click if we're not already at the target
-            if abs(current_x - match.center_x) > 5 or abs(current_y - match.center_y) > 5:
+            if abs(current_x - target_x) > 5 or abs(current_y - target_y) > 5:
                 # Move to target center and click
-                pyautogui.moveTo(match.center_x, match.center_y, duration=0.2)
+                pyautogui.moveTo(target_x, target_y, duration=0.2)
                 pyautogui.click()
                 
-                logging.info(f"Clicked target at ({match.center_x}, {match.center_y}) with confidence {match.confidence:.2f}")
+                logging.info(f"Clicked target at ({target_x}, {target_y}) with confidence {match.confidence:.2f}")
                 return True
             return False
         except Exception as e:
             logging.error(f"Error clicking target: {str(e)}")
             return False
     
-    def run(self, check_interval=1.0):
+    def run(self, check_interval=1.0, burst_interval=0.2, cpu_budget=0.25):
         """Run the clickbot continuously."""
         logging.info("Starting ClickBot...")
         logging.info(f"Using target image: {self.target_path}")
         
         last_click_time = 0
-        consecutive_fails = 0
+        # Scan fast after a screen change or click, backing off to twice check_interval when idle
+        scheduler = ScanScheduler(burst_interval=burst_interval, idle_interval=check_interval * 2,
+                                  cpu_budget=cpu_budget)
+        change_gate = ChangeGate()
         
         while True:
             try:
-                # Add longer delay if we've had multiple failures
-                if consecutive_fails > 5:
-                    time.sleep(check_interval * 2)
-                    consecutive_fails = 0
-                
                 # Capture screen
                 screen = self.capture_screen()
                 if screen is None:
-                    consecutive_fails += 1
-                    time.sleep(check_interval)
+                    scheduler.wait()
                     continue
                 
-                # Save screen to temp file for matcher
-                temp_screen_path = os.path.join(self.temp_dir, "current_screen.png")
-                cv2.imwrite(temp_screen_path, screen)
+                # Nothing changed since the last search, so there is nothing new to match
+                if not change_gate.should_search(screen):
+                    scheduler.wait()
+                    continue
+                scheduler.notify_activity()
                 
-                # Find matches
-                self.matcher.load_images(temp_screen_path, self.target_path)
+                # Find matches in the captured frame, without a round trip through disk
+                self.matcher.set_images(screen, self.target_image)
                 matches = self.matcher.find_matches()
                 
                 if matches:
-                    # Sort matches by quality
-                    matches.sort(key=lambda m: (
-                        m.quality.structural_similarity * 0.4 +
-                        m.confidence * 0.3 +
-                        m.quality.edge_similarity * 0.2 +
-                        m.quality.histogram_similarity * 0.1
-                    ), reverse=True)
-                    
-                    # Get best match
-                    best_match = matches[0]
+                    # Best match by quality, computing the expensive metrics only for contenders
+                    best_match = rank_matches(matches)[0]
                     
                     # Only click if we're very confident and enough time has passed since last click
                     current_time = time.time()
                     if (best_match.confidence > 0.9 and 
-                        best_match.quality.structural_similarity > 0.8 and
-                        current_time - last_click_time > 2.0):
-                        if self.click_target(best_match):
+                        best_match.quality.structural_similarity > 0.8):
+                        if current_time - last_click_time > 2.0 and self.click_target(best_match):
                             last_click_time = current_time
-                            consecutive_fails = 0
-                            time.sleep(1.0)  # Short delay after successful click
-                            continue
+                            scheduler.notify_activity()
+                        # Clicked, held back by the click guard or failed, the target may still be
+                        # there, so search the next frame even if unchanged
+                        change_gate.invalidate()
                 
                 # Wait before next check
-                time.sleep(check_interval)
+                scheduler.wait()
                 
             except KeyboardInterrupt:
                 logging.info("ClickBot stopped by user")
                 break
             except Exception as e:
                 logging.error(f"Error in main loop: {str(e)}")
-                consecutive_fails += 1
-                time.sleep(check_interval)
-        
-        # Cleanup
-        try:
-            os.remove(os.path.join(self.temp_dir, "current_screen.png"))
-        except:
-            pass
+                scheduler.wait()
 
 if __name__ == "__main__":
     bot = ClickBot()
@@ -0,0 +1,140 @@
+import logging
+import threading
+import numpy as np
+import cv2
+
+
+class ColorPrefilter:
+    """Proposes small search windows where the button's fill colour appears.
+
+    The fill colour is the dominant Lab colour in the middle of the template
+    (calibration centres the template on the button). Each frame is
+    converted to Lab at reduced resolution and thresholded around that
+    colour; connected components of plausible button size and solidity
+    become windows of the template size plus ``pad`` pixels on each side,
+    centred on the component. ``candidates()`` returns None, meaning search
+    everything, when the colour is not distinctive enough to trust: no
+    dominant fill, too much of the frame matching, or too many components.
+    Every ``full_scan_every`` calls for the same key (one per monitor) it
+    also returns None, so a button whose colour drifted is still found by a
+    full search. ``calibrate()`` fits the tolerance to a recorded screen, or
+    disables the prefilter for a template whose colour does not isolate the
+    button there; the result applies to every scaled copy of the template.
+    """
+
+    # Lab tolerances tried by calibrate(), tightest first
+    TOLERANCES = (6, 8, 10, 12, 14, 18)
+
+    def __init__(self, tolerance=10, pad=10, downscale=2, size_range=(0.5, 2.5), min_solidity=0.5,
+                 max_coverage=0.2, max_candidates=20, full_scan_every=20):
+        self.logger = logging.getLogger('color_prefilter')
+        self.tolerance = tolerance  # Lab distance per channel still counted as the fill colour
+        self.pad = pad
+        self.downscale = downscale
+        self.size_range = size_range  # Component size relative to the template, per side
+        self.min_solidity = min_solidity  # Fill pixels over component bounding-box area
+        self.max_coverage = max_coverage
+        self.max_candidates = max_candidates
+        self.full_scan_every = full_scan_every
+        self._calls = {}  # key -> candidates() calls, counted separately for each monitor
+        self._calls_lock = threading.Lock()
+        self._fill_colors = {}  # template path -> Lab fill colour, or None if it has none
+        self._tolerances = {}  # unscaled template path -> calibrated tolerance, or None if disabled
+
+    def fill_color(self, template):
+        """Dominant Lab colour of the template's central half, or None if no colour dominates."""
+        if template.path in self._fill_colors:
+            return self._fill_colors[template.path]
+        height, width = template.height, template.width
+        centre = template.bgr[height // 4:height - height // 4, width // 4:width - width // 4]
+        lab = cv2.cvtColor(np.ascontiguousarray(centre), cv2.COLOR_BGR2LAB).reshape(-1, 3).astype(np.int32)
+        # Most common coarse colour bin, refined to the mean colour of its pixels
+        bins = lab // 16
+        keys = (bins[:, 0] * 16 + bins[:, 1]) * 16 + bins[:, 2]
+        values, counts = np.unique(keys, return_counts=True)
+        color = None
+        if counts.max() >= 0.3 * len(keys):
+            color = lab[keys == values[np.argmax(counts)]].mean(axis=0)
+        self._fill_colors[template.path] = color
+        return color
+
+    def calibrate(self, template, screen, location):
+        """Pick the tightest colour tolerance that still proposes the button in a recorded screen.
+
+        location is the button's top-left corner in screen. Returns the
+        tolerance, or None (and disables the prefilter for this template)
+        when no tolerance isolates the button.
+        """
+        color = self.fill_color(template)
+        if color is not None:
+            x, y = location
+            for tolerance in self.TOLERANCES:
+                windows = self._windows(screen, template, color, tolerance)
+                if windows and any(wx <= x and wy <= y and x + template.width <= wx + ww and
+                                   y + template.height <= wy + wh for wx, wy, ww, wh in windows):
+                    self._tolerances[template.source] = tolerance
+                    self.logger.info(f"Colour prefilter for {template} calibrated: tolerance {tolerance}, "
+                                     f"{len(windows)} windows")
+                    return tolerance
+        self._tolerances[template.source] = None
+        self.logger.info(f"Colour prefilter disabled for {template}: its colour does not isolate the button")
+        return None
+
+    def candidates(self, image, template, key=None):
+        """Search windows (x, y, width, height) in image coordinates, or None to search the whole image.
+
+        key identifies the caller's monitor, so each monitor gets its own
+        periodic full search.
+        """
+        with self._calls_lock:
+            calls = self._calls[key] = self._calls.get(key, 0) + 1
+        if self.full_scan_every and calls % self.full_scan_every == 0:
+            return None
+        color = self.fill_color(template)
+        tolerance = self._tolerances.get(template.source, self.tolerance)
+        if color is None or tolerance is None:
+            return None
+        return self._windows(image, template, color, tolerance)
+
+    def _windows(self, image, template, color, tolerance):
+        scale = self.downscale
+        small = cv2.resize(image, None, fx=1.0 / scale, fy=1.0 / scale, interpolation=cv2.INTER_AREA)
+        lab = cv2.cvtColor(small, cv2.COLOR_BGR2LAB)
+        lower = np.clip(color - tolerance, 0, 255).astype(np.uint8)
+        upper = np.clip(color + tolerance, 0, 255).astype(np.uint8)
+        mask = cv2.inRange(lab, lower, upper)
+        if cv2.countNonZero(mask) > self.max_coverage * mask.size:
+            return None
+        # Anti-aliased glyph edges split the fill; close the gaps
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        low, high = self.size_range
+        min_w, max_w = low * template.width / scale, high * template.width / scale
+        min_h, max_h = low * template.height / scale, high * template.height / scale
+        sizes = stats[1:]
+        plausible = ((sizes[:, cv2.CC_STAT_WIDTH] >= min_w) & (sizes[:, cv2.CC_STAT_WIDTH] <= max_w) &
+                     (sizes[:, cv2.CC_STAT_HEIGHT] >= min_h) & (sizes[:, cv2.CC_STAT_HEIGHT] <= max_h) &
+                     (sizes[:, cv2.CC_STAT_AREA] >= self.min_solidity *
+                      sizes[:, cv2.CC_STAT_WIDTH] * sizes[:, cv2.CC_STAT_HEIGHT]))
+        labels_kept = np.nonzero(plausible)[0] + 1
+        if len(labels_kept) > self.max_candidates:
+            return None
+
+        image_h, image_w = image.shape[:2]
+        window_w = min(image_w, template.width + 2 * self.pad)
+        window_h = min(image_h, template.height + 2 * self.pad)
+        windows = []
+        for label in labels_kept:
+            # Component bounding-box centre, back at full resolution
+            x, y, w, h = stats[label, :4]
+            cx, cy = (x + w / 2.0) * scale, (y + h / 2.0) * scale
+            wx = int(min(max(0, round(cx - window_w / 2.0)), image_w - window_w))
+            wy = int(min(max(0, round(cy - window_h / 2.0)), image_h - window_h))
+            windows.append((wx, wy, window_w, window_h))
+        return windows
+
+    def invalidate(self):
+        """Forget fill colours and calibrated tolerances, e.g. after recalibration."""
+        self._fill_colors.clear()
+        self._tolerances.clear()
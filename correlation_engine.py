@@ -0,0 +1,172 @@
+import logging
+import threading
+import numpy as np
+import cv2
+
+# Methods that can be derived from one TM_CCORR pass and the frame's integral images
+FUSED_METHODS = (cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED, cv2.TM_SQDIFF_NORMED)
+
+
+class PreparedFrame:
+    """Per-frame state shared by every template: the frame and its integral images.
+
+    Works on grayscale or BGR frames. Window statistics for a template size
+    are derived from the integral images on first use and cached, so
+    templates of the same size share them.
+    """
+
+    def __init__(self, image, min_deviation=1e-3):
+        if image.ndim not in (2, 3):
+            raise ValueError("PreparedFrame expects a grayscale or colour image")
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        self.channels = 1 if image.ndim == 2 else image.shape[2]
+        self.min_deviation = min_deviation  # Windows flatter than this score as featureless
+        sums, sqsums = cv2.integral2(image, sdepth=cv2.CV_64F)
+        self.sum = sums.reshape(sums.shape[0], sums.shape[1], self.channels)
+        self.sqsum = sqsums.reshape(sqsums.shape[0], sqsums.shape[1], self.channels).sum(axis=2)
+        self._window_stats = {}  # (width, height) -> dict of window maps
+        self._lock = threading.Lock()
+
+    def window_stats(self, width, height):
+        """Window maps for a template size.
+
+        ``sum`` holds one float32 window-sum map per channel, ``sqsum`` the
+        window sum of squares over all channels, ``inv_norm`` 1 / sqrt(sqsum)
+        and ``inv_deviation`` 1 / sqrt(centred sum of squares). Inverses of
+        flat windows are 0 and those windows are flagged in ``flat_norm`` and
+        ``flat_deviation``.
+        """
+        key = (width, height)
+        with self._lock:
+            stats = self._window_stats.get(key)
+            if stats is None:
+                stats = self._compute_window_stats(width, height)
+                self._window_stats[key] = stats
+            return stats
+
+    def _compute_window_stats(self, width, height):
+        rows, cols = self.height - height + 1, self.width - width + 1
+        s, sq = self.sum, self.sqsum
+        window_sum = s[height:, width:] - s[:rows, width:] - s[height:, :cols] + s[:rows, :cols]
+        window_sqsum = sq[height:, width:] - sq[:rows, width:] - sq[height:, :cols] + sq[:rows, :cols]
+        centred = window_sqsum - np.sum(window_sum * window_sum, axis=2) / (width * height)
+
+        deviation = np.sqrt(np.maximum(centred, 0.0))
+        norm = np.sqrt(np.maximum(window_sqsum, 0.0))
+        flat_deviation = deviation <= self.min_deviation
+        flat_norm = norm <= self.min_deviation
+        inv_deviation = np.zeros_like(deviation)
+        np.divide(1.0, deviation, out=inv_deviation, where=~flat_deviation)
+        inv_norm = np.zeros_like(norm)
+        np.divide(1.0, norm, out=inv_norm, where=~flat_norm)
+        return {
+            'sum': [np.ascontiguousarray(window_sum[:, :, c], dtype=np.float32) for c in range(self.channels)],
+            'sqsum': window_sqsum.astype(np.float32),
+            'inv_norm': inv_norm.astype(np.float32),
+            'inv_deviation': inv_deviation.astype(np.float32),
+            'flat_norm': flat_norm,
+            'flat_deviation': flat_deviation
+        }
+
+
+class CorrelationEngine:
+    """Scores many templates against one prepared frame, several metrics per correlation pass.
+
+    TM_CCOEFF_NORMED, TM_CCORR_NORMED and TM_SQDIFF_NORMED all follow from
+    the plain cross-correlation sum(f * t), the frame's per-window sums and
+    sums of squares (from its integral images, once per frame and template
+    size) and the template's mean and norms (precomputed in its
+    CompiledTemplate). Each template therefore costs one TM_CCORR pass plus
+    a few multiply-adds per requested metric.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('correlation_engine')
+
+    def prepare(self, image):
+        """Prepare a grayscale or BGR frame for scoring."""
+        return PreparedFrame(image)
+
+    @staticmethod
+    def _template_terms(frame, template):
+        """Template pixels and statistics matching the frame's channel count."""
+        if frame.channels == 1:
+            return template.gray, [template.gray_mean], template.gray_norm, template.gray_zero_mean_norm
+        return template.bgr, list(template.bgr_mean), template.bgr_norm, template.bgr_zero_mean_norm
+
+    def cross_correlation(self, frame, template):
+        """Sum of frame * template at every position where the template fits (TM_CCORR)."""
+        pixels = self._template_terms(frame, template)[0]
+        return cv2.matchTemplate(frame.image, pixels, cv2.TM_CCORR)
+
+    def scores(self, frame, template, methods=FUSED_METHODS):
+        """Result maps of the requested methods, keyed by method, or None if the template does not fit.
+
+        Maps agree with cv2.matchTemplate to float32 precision.
+        """
+        if template.height > frame.height or template.width > frame.width:
+            return None
+        pixels, means, norm, zero_mean_norm = self._template_terms(frame, template)
+        if template.mask is not None:
+            # The closed forms assume every template pixel counts
+            return {method: cv2.matchTemplate(frame.image, pixels, method, mask=template.mask) for method in methods}
+
+        stats = frame.window_stats(template.width, template.height)
+        cross = cv2.matchTemplate(frame.image, pixels, cv2.TM_CCORR)
+        results = {}
+        for method in methods:
+            if method == cv2.TM_CCORR_NORMED:
+                # sum(f * t) / sqrt(sum(f^2) * sum(t^2))
+                result = cv2.multiply(cross, stats['inv_norm'], scale=1.0 / norm) if norm else np.zeros_like(cross)
+            elif method == cv2.TM_SQDIFF_NORMED:
+                # (sum(f^2) - 2 * sum(f * t) + sum(t^2)) / sqrt(sum(f^2) * sum(t^2))
+                if norm:
+                    sqdiff = cv2.scaleAdd(cross, -2.0, stats['sqsum'])
+                    sqdiff += norm * norm
+                    result = cv2.multiply(sqdiff, stats['inv_norm'], scale=1.0 / norm)
+                    result[stats['flat_norm']] = 1.0
+                else:
+                    result = np.ones_like(cross)
+            elif method == cv2.TM_CCOEFF_NORMED:
+                # sum((f - mean_f) * (t - mean_t)) = sum(f * t) - sum_c(mean_t_c * sum(f_c))
+                if zero_mean_norm:
+                    numerator = cross
+                    for window_sum, mean in zip(stats['sum'], means):
+                        numerator = cv2.scaleAdd(window_sum, -float(mean), numerator)
+                    result = cv2.multiply(numerator, stats['inv_deviation'], scale=1.0 / zero_mean_norm)
+                else:
+                    result = np.zeros_like(cross)
+            else:
+                raise ValueError(f"Method {method} cannot be fused")
+            lower = 0.0 if method == cv2.TM_SQDIFF_NORMED else -1.0
+            results[method] = np.clip(result, lower, 1.0, out=result)
+        return results
+
+    def peaks(self, frame, template, methods=FUSED_METHODS):
+        """Best (value, location) per method: the minimum for SQDIFF, the maximum otherwise."""
+        results = self.scores(frame, template, methods)
+        if results is None:
+            return None
+        peaks = {}
+        for method, result in results.items():
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            peaks[method] = (min_val, min_loc) if method == cv2.TM_SQDIFF_NORMED else (max_val, max_loc)
+        return peaks
+
+    def score(self, frame, template):
+        """TM_CCOEFF_NORMED map of a compiled template over a prepared frame, or None if it does not fit."""
+        results = self.scores(frame, template, (cv2.TM_CCOEFF_NORMED,))
+        return None if results is None else results[cv2.TM_CCOEFF_NORMED]
+
+    def score_all(self, frame, templates):
+        """Best (value, location) of every template against the same prepared frame, keyed by path."""
+        best = {}
+        for template in templates:
+            result = self.score(frame, template)
+            if result is None:
+                best[template.path] = None
+                continue
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            best[template.path] = (max_val, max_loc)
+        return best
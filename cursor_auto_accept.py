@@ -6,15 +6,31 @@ import argparse
 from pathlib import Path
 from collections import deque
 from datetime import datetime, timedelta
-import mss
 import numpy as np
 import cv2
 from PIL import Image
 from pynput import keyboard
 import tkinter as tk
-from threading import Thread, Event
+from threading import Thread, Event, Lock
+from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
 import queue
+from screen_capture import CaptureEngine
+from change_gate import ChangeGate
+from roi_heatmap import RoiHeatmap
+from pipeline import DetectionPipeline
+from scan_scheduler import ScanScheduler
+from pyramid_match import PyramidMatcher
+from template_bank import TemplateBank
+from correlation_engine import CorrelationEngine
+from metric_calibration import (DEFAULT_MATCH_METHODS, HOVER_SCREEN_FILE, AFTER_SCREEN_FILE,
+                                calibrate_monitor, pick_match, to_confidence)
+from calibration_pack import CalibrationPack, PACK_FILE, HOVER, import_assets
+from scale_search import ScaleSearch, SCALE_FILE
+from color_prefilter import ColorPrefilter
+from button_tracker import ButtonTracker
+from click_verifier import ClickVerifier
+from monitor_layout import create_watcher, monitor_layout
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +42,13 @@ logging.basicConfig(
     ]
 )
 
+def monitor_index_at(monitors, x, y):
+    """Return the index of the monitor containing a screen point (0 if none does)"""
+    for index, m in enumerate(monitors):
+        if m["left"] <= x < m["left"] + m["width"] and m["top"] <= y < m["top"] + m["height"]:
+            return index
+    return 0
+
 class MainWindow:
     def __init__(self, toggle_callback, calibrate_callback):
         self.root = tk.Tk()
@@ -120,6 +143,7 @@ class MainWindow:
         self.calibrating = False
         self.button_states = []
         self.capturing = False
+        self.monitors = []
         
     def start_drag(self, event):
         """Start window drag"""
@@ -158,6 +182,7 @@ class MainWindow:
             self.root.after_cancel(after_id)
             
         self.capturing = True
+        self.monitors = sct.monitors[1:]  # Used to save calibration for the right monitor
         try:
             # Clear previous text
             self.clear_log()
@@ -200,13 +225,17 @@ class MainWindow:
                 # Use the middle sample to avoid any transition frames
                 hover_bgr = samples[1]
                 
+                # The whole monitor too, so calibration can see what the button must stand out from
+                monitor = self.monitors[monitor_index_at(self.monitors, hover_x, hover_y)]
+                hover_screen = cv2.cvtColor(np.asarray(sct.grab(monitor)), cv2.COLOR_BGRA2BGR)
+                
                 self.add_log("\nHover state captured!")
                 self.add_log("Click the button now...")
                 
                 # Start click capture after a longer delay
                 self.root.after(3000, lambda: countdown_click(3))
                 
-                return hover_x, hover_y, hover_bgr, hover_region
+                return hover_x, hover_y, hover_bgr, hover_region, monitor, hover_screen
             
             def countdown_click(count):
                 if count > 0:
@@ -218,7 +247,7 @@ class MainWindow:
             def capture_click():
                 try:
                     # Store hover state
-                    hover_x, hover_y, hover_bgr, hover_region = capture_hover()
+                    hover_x, hover_y, hover_bgr, hover_region, monitor, hover_screen = capture_hover()
                     
                     # Click the button
                     pyautogui.click()
@@ -240,6 +269,7 @@ class MainWindow:
                     
                     # Use the last sample to ensure button has disappeared
                     after_bgr = samples[-1]
+                    after_screen = cv2.cvtColor(np.asarray(sct.grab(monitor)), cv2.COLOR_BGRA2BGR)
                     
                     # Verify the samples are consistent
                     diffs = []
@@ -259,6 +289,8 @@ class MainWindow:
                         'hover_x': hover_x,
                         'hover_y': hover_y,
                         'after_img': after_bgr,
+                        'hover_screen': hover_screen,
+                        'after_screen': after_screen,
                         'click_x': hover_x,
                         'click_y': hover_y
                     }]
@@ -287,8 +319,12 @@ class MainWindow:
             return False
         
         try:
+            # Save to the monitor the button was captured on
+            state = self.button_states[0]
+            monitor_index = monitor_index_at(self.monitors, state['hover_x'], state['hover_y'])
+            
             # First clean up any existing calibration files
-            monitor_assets = assets_dir / "monitor_0"
+            monitor_assets = assets_dir / f"monitor_{monitor_index}"
             monitor_assets.mkdir(exist_ok=True)
             for file in monitor_assets.glob("*"):
                 file.unlink()
@@ -298,7 +334,6 @@ class MainWindow:
             after_file = monitor_assets / 'accept_after.png'
             coords_file = monitor_assets / 'click_coords.txt'
             
-            state = self.button_states[0]
             cv2.imwrite(str(hover_file), state['hover_img'])
             cv2.imwrite(str(after_file), state['after_img'])
             
@@ -306,7 +341,22 @@ class MainWindow:
             with open(coords_file, 'w') as f:
                 f.write(f"{state['hover_x']},{state['hover_y']}")
             
-            self.add_log("\nCalibration complete! Bot will start running.")
+            # Save the full-monitor screenshots and pick the single metric that
+            # separates the button from the rest of this screen
+            cv2.imwrite(str(monitor_assets / HOVER_SCREEN_FILE), state['hover_screen'])
+            cv2.imwrite(str(monitor_assets / AFTER_SCREEN_FILE), state['after_screen'])
+            choice = calibrate_monitor(monitor_assets)
+            # The bot reads the calibration from one packed file
+            pack = import_assets(monitor_assets, self.monitors[monitor_index])
+            pack.metric = choice
+            pack.save(monitor_assets / PACK_FILE)
+            if choice is not None:
+                self.add_log(f"Fast mode metric: {choice.name} (threshold {choice.threshold:.3f}, "
+                             f"margin {choice.margin:.3f})")
+            else:
+                self.add_log("No single metric separates the button; fast mode will try every method")
+            
+            self.add_log(f"\nCalibration complete for monitor {monitor_index}! Bot will start running.")
             self.status_label.config(text="Ready")
             
             # Reset calibration state
@@ -561,9 +611,49 @@ class CalibrationWindow:
             self.root.after(ms, func)
 
 class CursorAutoAccept:
-    def __init__(self):
+    # Matching methods and their thresholds; for SQDIFF lower is better
+    MATCH_METHODS = DEFAULT_MATCH_METHODS
+
+    # Regions at least this many template areas large are searched coarse-to-fine in pyramid mode
+    PYRAMID_MIN_AREA_RATIO = 64
+
+    # A peak this far below its threshold (in confidence units) may be the button at another scale
+    SCALE_NEAR_MISS = 0.15
+
+    def __init__(self, pyramid=False, single_metric=False, color_prefilter=False):
         self.logger = logging.getLogger(__name__)
-        self.sct = mss.mss()
+        # Coarse-to-fine search for large regions, when enabled
+        self.pyramid = PyramidMatcher() if pyramid else None
+        # Score only the metric calibration picked for each monitor, when enabled
+        self.single_metric = single_metric
+        # Match only in small windows around the button's fill colour, when enabled
+        self.prefilter = ColorPrefilter() if color_prefilter else None
+        self._prefilter_calibrated = set()  # monitors whose recording the prefilter was fitted to
+        # Buttons already found are searched for around their predicted position first
+        self.tracker = ButtonTracker()
+        # Tells from pixel signatures when a clicked button went away
+        self.click_verifier = ClickVerifier()
+        # One long-lived capture engine owns the mss session and the frame buffers
+        self.capture = CaptureEngine()
+        # Monitors are re-read only when X11 reports that the layout changed
+        self.layout_watcher = create_watcher()
+        
+        # Skip detection while the screen is unchanged since the last searched frame
+        self.change_gate = ChangeGate()
+        
+        # Per-monitor heatmaps of where accept buttons were found
+        self.heatmaps = {}
+        
+        # Calibration templates are read and converted once, not on every tick
+        self.templates = TemplateBank()
+        # Derives all three matching scores from a single correlation pass
+        self.correlation = CorrelationEngine()
+        self._packs = {}  # monitor index -> CalibrationPack, or None if not calibrated
+        self._pack_lock = Lock()
+        self._hover_templates = {}  # monitor index -> CompiledTemplate, or None if not calibrated
+        self._metric_choices = {}  # monitor index -> MetricChoice, or None to try every method
+        # Display scaling or UI zoom can differ from calibration; each monitor's scale is found once
+        self.scales = ScaleSearch()
         
         # Rate limiting: max 8 clicks per minute
         self.click_history = deque(maxlen=8)
@@ -576,6 +666,19 @@ class CursorAutoAccept:
         # Initialize monitor info
         self.monitors = self.get_monitors()
         self.logger.info(f"Found {len(self.monitors)} monitors")
+        # Every monitor's calibration is mapped once, up front
+        for i in range(len(self.monitors)):
+            self._calibration_pack(i)
+        
+        # Capture, detection and clicking run as separate pipeline stages; scans burst to
+        # 10/s after a screen change or click and decay to one per second when idle
+        self.scheduler = ScanScheduler(burst_interval=0.1, idle_interval=1.0, half_life=5.0, cpu_budget=0.25)
+        self.pipeline = DetectionPipeline(self._pipeline_capture, self._pipeline_detect, self._click_match,
+                                          queue_size=1, name='accept-pipeline', scheduler=self.scheduler,
+                                          release_fn=self._pipeline_release)
+        # cv2 releases the GIL while matching, so monitors are scanned in parallel threads
+        self.scan_pool = ThreadPoolExecutor(max_workers=max(1, len(self.monitors)),
+                                            thread_name_prefix='monitor-scan')
         for i, m in enumerate(self.monitors):
             self.logger.info(f"Monitor {i}: {m['width']}x{m['height']} at ({m['left']}, {m['top']})")
             
@@ -607,6 +710,8 @@ class CursorAutoAccept:
     def toggle_bot(self):
         """Toggle bot on/off"""
         if self.main_window.calibrating and not self.main_window.capturing:
+            # Calibration files are about to be rewritten, so reload them on next use
+            self.invalidate_calibration()
             # Return assets directory for saving calibration
             return self.assets_dir
             
@@ -617,13 +722,8 @@ class CursorAutoAccept:
             if self.main_window:
                 self.main_window.add_log("Bot stopped")
         else:
-            # Check if calibration exists
-            monitor_assets = self.assets_dir / "monitor_0"
-            hover_file = monitor_assets / 'accept_button.png'
-            after_file = monitor_assets / 'accept_after.png'
-            coords_file = monitor_assets / 'click_coords.txt'
-            
-            if not all(f.exists() for f in [hover_file, after_file, coords_file]):
+            # Check if calibration exists for at least one monitor
+            if not any(self._load_hover_template(i) is not None for i in range(len(self.monitors))):
                 # Reset play button since we're going to calibrate
                 if self.main_window:
                     self.main_window.is_playing = False
@@ -644,25 +744,31 @@ class CursorAutoAccept:
             Thread(target=self.run_bot, daemon=True).start()
             
     def run_bot(self):
-        """Main bot loop"""
+        """Main bot loop: runs the capture/detect/click pipeline until stopped"""
         self.logger.info("Starting Cursor Auto Accept Bot")
         if self.main_window:
             self.main_window.add_log("Starting Cursor Auto Accept Bot")
         
-        last_not_found_log = 0
-        
-        while not self.stop_event.is_set():
-            if self.find_and_click_accept():
-                time.sleep(0.5)
-            else:
-                current_time = time.time()
-                if current_time - last_not_found_log >= 5:
+        self.pipeline.start()
+        last_acted = 0
+        try:
+            while not self.stop_event.wait(5):
+                stats = self.pipeline.stats()
+                if stats['acted'] == last_acted:
                     message = "Still searching for accept button..."
                     self.logger.info(message)
                     if self.main_window:
                         self.main_window.add_log(message)
-                    last_not_found_log = current_time
-                time.sleep(0.2)
+                last_acted = stats['acted']
+                self.logger.info(f"Pipeline: {stats['captured']} captured, {stats['detected']} detected, "
+                                 f"{stats['acted']} clicked, queue depth {stats['frame_queue_depth']}/"
+                                 f"{stats['action_queue_depth']}, dropped {stats['dropped_frames']} frames/"
+                                 f"{stats['dropped_actions']} matches, {stats['stale_actions']} stale")
+        finally:
+            self.pipeline.stop(timeout=1.0)
+            # Heat recorded since the last debounced save
+            for heatmap in list(self.heatmaps.values()):
+                heatmap.flush()
                 
     def run(self):
         """Initialize and start the bot"""
@@ -670,10 +776,15 @@ class CursorAutoAccept:
         # Create and show main window in main thread
         self.create_main_window()
 
+    @property
+    def sct(self):
+        """The capture engine's mss session (reopened when the monitor layout changes)"""
+        return self.capture.sct
+
     def get_monitors(self):
         """Get list of all monitors"""
         monitors = []
-        for m in self.sct.monitors[1:]:  # Skip the "all monitors" monitor
+        for m in self.capture.monitors:  # The "all monitors" monitor is already skipped
             # Adjust monitor coordinates to be relative to primary monitor
             monitors.append({
                 "left": m["left"],
@@ -682,8 +793,7 @@ class CursorAutoAccept:
                 "height": m["height"]
             })
             self.logger.info(f"Monitor found: {m['width']}x{m['height']} at ({m['left']}, {m['top']})")
-        # Only use the first monitor
-        return [monitors[0]]
+        return monitors
 
     def _ensure_monitor_calibration(self, monitor_index):
         """Ensure calibration file exists for a monitor"""
@@ -735,6 +845,11 @@ class CursorAutoAccept:
         # Save click offset from template top-left
         with open(coords_file, 'w') as f:
             f.write(f"40,20")  # Center of 80x40 region
+        # The new template is at this monitor's current scale
+        (monitor_assets / SCALE_FILE).unlink(missing_ok=True)
+        # Releases the mapped pack before it is replaced
+        self.invalidate_calibration()
+        import_assets(monitor_assets, self.monitors[monitor_index]).save(monitor_assets / PACK_FILE)
             
         print(f"\nCalibration complete for monitor {monitor_index}!")
         print(f"Saved accept button image to {calibration_file}")
@@ -748,13 +863,19 @@ class CursorAutoAccept:
         
         return len(self.click_history) < self.MAX_CLICKS_PER_MINUTE
 
-    def monitor_click_area(self, x, y, monitor, timeout=20):
+    def monitor_click_area(self, x, y, monitor, timeout=20, monitor_index=0):
         """Monitor the area around a click for changes"""
-        # Define the button region (same size as calibration)
-        button_region = {"top": y-20, "left": x-40, "width": 80, "height": 40}
+        # The hover template, at the monitor's scale, tells whether the button is still there
+        hover_template = self._load_hover_template(monitor_index)
+        if hover_template is not None:
+            hover_template = hover_template.scaled(self._monitor_scale(monitor_index))
         
-        # Get initial screenshot of button area
-        initial = np.array(self.sct.grab(button_region))
+        # Define the button region (same size as calibration, at the monitor's scale)
+        width, height = hover_template.size if hover_template is not None else (80, 40)
+        button_region = {"top": y - height // 2, "left": x - width // 2, "width": width, "height": height}
+        
+        # Signature of the button area at click time; later probes only compare signatures
+        button_present = self.click_verifier.arm(self.capture.grab(button_region).image, hover_template)
         time.sleep(0.2)  # Small delay to let UI start changing
         
         start_time = time.time()
@@ -765,49 +886,34 @@ class CursorAutoAccept:
         if self.main_window:
             self.main_window.add_log(message)
         
-        # Load the hover template to check if button is still there
-        monitor_assets = self.assets_dir / "monitor_0"
-        hover_file = monitor_assets / 'accept_button.png'
+        if hover_template is not None and not button_present:
+            message = "Button already gone after click"
+            self.logger.info(message)
+            if self.main_window:
+                self.main_window.add_log(message)
+            return True
         
-        if hover_file.exists():
-            hover_template = cv2.imread(str(hover_file))
-            if hover_template is not None:
-                # Ensure template is in correct orientation
-                if hover_template.shape[0] != 40 or hover_template.shape[1] != 80:
-                    hover_template = cv2.rotate(hover_template, cv2.ROTATE_90_CLOCKWISE)
-                
-                while time.time() - start_time < timeout:
-                    # Capture current state of button area
-                    current = np.array(self.sct.grab(button_region))
-                    current_bgr = cv2.cvtColor(current, cv2.COLOR_BGRA2BGR)
-                    
-                    # Check if button is still visible
-                    result = cv2.matchTemplate(current_bgr, hover_template, cv2.TM_CCOEFF_NORMED)
-                    confidence = result.max()
-                    
-                    message = f"Button visibility confidence: {confidence:.3f}"
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    
-                    if confidence < 0.6:  # Button is no longer visible
-                        message = "Button appears gone (low confidence)"
-                        self.logger.info(message)
-                        if self.main_window:
-                            self.main_window.add_log(message)
-                        return True
-                    
-                    elif time.time() - last_change_time > 1.0:  # No changes for 1 second
-                        message = "Button still visible, clicking again..."
-                        self.logger.info(message)
-                        if self.main_window:
-                            self.main_window.add_log(message)
-                        pyautogui.click(x, y)
-                        time.sleep(0.1)
-                        pyautogui.click(x, y)
-                        last_change_time = time.time()
-                    
-                    time.sleep(0.1)
+        while time.time() - start_time < timeout:
+            # Capture current state of button area and compare it with the click-time signature
+            if self.click_verifier.changed(self.capture.grab(button_region).image):
+                message = f"Button area changed (difference {self.click_verifier.last_distance:.1f})"
+                self.logger.info(message)
+                if self.main_window:
+                    self.main_window.add_log(message)
+                return True
+            self.logger.debug(f"Button area difference: {self.click_verifier.last_distance:.1f}")
+            
+            if time.time() - last_change_time > 1.0:  # No changes for 1 second
+                message = "Button still visible, clicking again..."
+                self.logger.info(message)
+                if self.main_window:
+                    self.main_window.add_log(message)
+                pyautogui.click(x, y)
+                time.sleep(0.1)
+                pyautogui.click(x, y)
+                last_change_time = time.time()
+            
+            time.sleep(self.click_verifier.interval)
         
         message = "Monitoring timed out"
         self.logger.warning(message)
@@ -815,7 +921,480 @@ class CursorAutoAccept:
             self.main_window.add_log(message)
         return False
 
+    def _get_heatmap(self, monitor_index, monitor):
+        """Get the ROI heatmap for a monitor, loading it from its assets on first use"""
+        heatmap = self.heatmaps.get(monitor_index)
+        if heatmap is None or (heatmap.width, heatmap.height) != (monitor['width'], monitor['height']):
+            if heatmap is not None:
+                heatmap.flush()
+            path = self.assets_dir / f"monitor_{monitor_index}" / 'roi_heatmap.npy'
+            heatmap = RoiHeatmap(path, monitor['width'], monitor['height'])
+            self.heatmaps[monitor_index] = heatmap
+        return heatmap
+
+    def _match_methods(self, img_bgr, template, metric=None, near_misses=None):
+        """Return the best match above its method's threshold.
+
+        Tries every method in MATCH_METHODS, or only the calibrated one when a
+        MetricChoice is given. Without a match, a peak of the first method
+        within SCALE_NEAR_MISS of its threshold is appended to near_misses as
+        (confidence, location).
+        """
+        method_thresholds = metric.match_methods() if metric is not None else self.MATCH_METHODS
+        methods = [method for method, threshold in method_thresholds]
+        use_pyramid = (self.pyramid is not None and template.mask is None and
+                       img_bgr.shape[0] * img_bgr.shape[1] >=
+                       self.PYRAMID_MIN_AREA_RATIO * template.width * template.height)
+        if use_pyramid:
+            peaks = {method: self.pyramid.match(img_bgr, template.bgr, method, template_pyramid=template.bgr_pyramid)
+                     for method in methods}
+        else:
+            # One correlation pass yields the best value and location of every method
+            peaks = self.correlation.peaks(self.correlation.prepare(img_bgr), template, methods)
+            if peaks is None:
+                return None
+        
+        for method in methods:
+            confidence = to_confidence(method, peaks[method][0])
+            if metric is None:
+                self.logger.info(f"Method {method} confidence: {confidence:.3f}")
+            else:
+                self.logger.debug(f"{metric.name} confidence: {confidence:.3f}")
+        
+        match = pick_match(peaks, method_thresholds)
+        if match is None:
+            if near_misses is not None:
+                method, threshold = method_thresholds[0]
+                value, loc = peaks[method]
+                if to_confidence(method, value) >= to_confidence(method, threshold) - self.SCALE_NEAR_MISS:
+                    near_misses.append((to_confidence(method, value), loc))
+            return None
+        confidence, loc = match
+        return {
+            'confidence': confidence,
+            'relative_x': loc[0],
+            'relative_y': loc[1]
+        }
+
+    def _search_regions(self, img_bgr, template, regions, metric=None, near_misses=None):
+        """Match the template inside each (x, y, width, height) region and return the best match.
+
+        Near misses (see _match_methods) are appended to near_misses in monitor-relative coordinates.
+        """
+        template_w, template_h = template.size
+        best_match = None
+        for x, y, w, h in regions:
+            if w < template_w or h < template_h:
+                continue
+            region_misses = [] if near_misses is not None else None
+            match = self._match_methods(img_bgr[y:y + h, x:x + w], template, metric, region_misses)
+            if region_misses:
+                near_misses.extend((confidence, (mx + x, my + y)) for confidence, (mx, my) in region_misses)
+            if match and (best_match is None or match['confidence'] > best_match['confidence']):
+                # Convert region-relative location to monitor-relative
+                match['relative_x'] += x
+                match['relative_y'] += y
+                best_match = match
+        return best_match
+
+    def _load_hover_template(self, monitor_index):
+        """Compiled hover template of a monitor, or None if the monitor is not calibrated.
+
+        The template is compiled from the monitor's calibration pack and
+        cached until invalidate_calibration() is called, so the hot loop never
+        touches the disk.
+        """
+        if monitor_index in self._hover_templates:
+            return self._hover_templates[monitor_index]
+        
+        pack = self._calibration_pack(monitor_index)
+        hover_template = None
+        if pack is not None and pack.calibrated:
+            pack_file = self.assets_dir / f"monitor_{monitor_index}" / PACK_FILE
+            # Compiled from a copy, so the template does not keep the pack file mapped
+            hover_template = self.templates.add(f"{pack_file}:{HOVER}", np.array(pack.image(HOVER)))
+        self._hover_templates[monitor_index] = hover_template
+        return hover_template
+
+    def _calibration_pack(self, monitor_index):
+        """Calibration pack of a monitor, or None if the monitor has no calibration at all.
+
+        Packs are mapped once and cached until invalidate_calibration(). A
+        monitor calibrated before packs existed gets its calibration files
+        imported into a pack on first use.
+        """
+        with self._pack_lock:
+            if monitor_index in self._packs:
+                return self._packs[monitor_index]
+            
+            monitor_assets = self.assets_dir / f"monitor_{monitor_index}"
+            monitor = self.monitors[monitor_index] if monitor_index < len(self.monitors) else None
+            pack = CalibrationPack.load(monitor_assets / PACK_FILE)
+            if pack is None:
+                imported = import_assets(monitor_assets, monitor)
+                if imported is not None:
+                    imported.save(monitor_assets / PACK_FILE)
+                    self.logger.info(f"Imported calibration files of monitor {monitor_index} into {PACK_FILE}")
+                    pack = CalibrationPack.load(monitor_assets / PACK_FILE)
+            if pack is not None and monitor is not None and pack.monitor is not None and \
+                    (pack.monitor['width'], pack.monitor['height']) != (monitor['width'], monitor['height']):
+                self.logger.warning(f"Monitor {monitor_index} was calibrated at {pack.monitor['width']}x"
+                                    f"{pack.monitor['height']}, now {monitor['width']}x{monitor['height']}")
+            self._packs[monitor_index] = pack
+            return pack
+
+    def _load_metric_choice(self, monitor_index):
+        """Calibrated single metric of a monitor, or None to try every method.
+
+        Monitors calibrated before metrics were recorded get one chosen from
+        their calibration screenshots on first use; without screenshots the
+        bot falls back to trying every method.
+        """
+        if not self.single_metric:
+            return None
+        if monitor_index in self._metric_choices:
+            return self._metric_choices[monitor_index]
+        
+        pack = self._calibration_pack(monitor_index)
+        choice = pack.metric if pack is not None else None
+        hover_template = self._load_hover_template(monitor_index)
+        if choice is None and hover_template is not None:
+            recording = pack.recording(hover_template)
+            if recording is not None:
+                monitor_assets = self.assets_dir / f"monitor_{monitor_index}"
+                choice = calibrate_monitor(monitor_assets, recording=recording)
+                # The recording's images are views into the mapped pack, which save() has to release
+                recording = None
+                if choice is not None:
+                    # Chosen once; later runs read it from the pack
+                    pack.metric = choice
+                    try:
+                        pack.save(monitor_assets / PACK_FILE)
+                    except OSError as e:
+                        self.logger.warning(f"Cannot store the metric of monitor {monitor_index} in "
+                                            f"{PACK_FILE}: {str(e)}")
+        if choice is None:
+            self.logger.warning(f"No single metric calibrated for monitor {monitor_index}, trying every method")
+        else:
+            self.logger.info(f"Monitor {monitor_index} uses {choice.name} above {choice.threshold:.3f}")
+        self._metric_choices[monitor_index] = choice
+        return choice
+
+    def _monitor_scale(self, monitor_index):
+        """Template scale of a monitor: the one last found by a sweep, else the calibrated one"""
+        pack = self._calibration_pack(monitor_index)
+        return self.scales.scale(monitor_index, pack.scale if pack is not None else 1.0)
+
+    def _save_scale(self, monitor_index, scale):
+        """Keep a scale adopted by a sweep in the monitor's calibration pack, so later runs start from it"""
+        pack = self._calibration_pack(monitor_index)
+        if pack is None:
+            return
+        pack.scale = scale
+        try:
+            pack.save(self.assets_dir / f"monitor_{monitor_index}" / PACK_FILE)
+        except OSError as e:
+            self.logger.warning(f"Cannot store the scale of monitor {monitor_index} in {PACK_FILE}: {str(e)}")
+
+    def _color_candidates(self, monitor_index, img_bgr, template):
+        """Windows around the button's fill colour, or None to fall back to the ROI plan"""
+        if self.prefilter is None:
+            return None
+        if monitor_index not in self._prefilter_calibrated:
+            # Fit the colour tolerance to the screen recorded at calibration, when there is one
+            hover_template = self._load_hover_template(monitor_index)
+            recording = self._calibration_pack(monitor_index).recording(hover_template) \
+                if hover_template is not None else None
+            if recording is not None:
+                recorded_template, after_img, hover_screen, after_screen, location = recording
+                self.prefilter.calibrate(recorded_template, hover_screen, location)
+            self._prefilter_calibrated.add(monitor_index)
+        return self.prefilter.candidates(img_bgr, template, key=monitor_index)
+
+    def invalidate_calibration(self):
+        """Forget loaded calibration templates so they are re-read after recalibration"""
+        with self._pack_lock:
+            # Unmapped so recalibration can replace or delete the files
+            for pack in self._packs.values():
+                if pack is not None:
+                    pack.close()
+            self._packs.clear()
+        self._hover_templates.clear()
+        self._metric_choices.clear()
+        self.scales.forget()
+        self.tracker.forget()
+        self.click_verifier.forget()
+        self._prefilter_calibrated.clear()
+        if self.prefilter is not None:
+            self.prefilter.invalidate()
+        self.templates.invalidate()
+        self.change_gate.invalidate()
+
+    def _scan_monitor(self, monitor_index, monitor, img_bgr, template):
+        """Search one monitor's frame for the accept button (runs on the scan pool)"""
+        metric = self._load_metric_choice(monitor_index)
+        full_frame = [(0, 0, img_bgr.shape[1], img_bgr.shape[0])]
+        calibrated = template
+        template = calibrated.scaled(self._monitor_scale(monitor_index))
+        # The first scan of a monitor since startup or a resolution change checks every scale
+        discovery = self.scales.claim_discovery(monitor_index)
+        
+        heatmap = self._get_heatmap(monitor_index, monitor)
+        template_w, template_h = template.size
+        near_misses = []
+        
+        # A button found on an earlier tick is looked for around its predicted position first
+        match = None
+        window = self.tracker.window(monitor_index, img_bgr.shape[1], img_bgr.shape[0])
+        if window is not None:
+            match = self._search_regions(img_bgr, template, [window], metric, near_misses)
+            if match:
+                self.logger.debug(f"Monitor {monitor_index}: tracked button found in {window}")
+            else:
+                self.tracker.miss(monitor_index)
+        
+        if not match:
+            # The button's fill colour narrows the search to a few small windows
+            regions = self._color_candidates(monitor_index, img_bgr, template)
+            if regions is not None:
+                self.logger.debug(f"Monitor {monitor_index}: searching {len(regions)} colour candidate windows")
+            else:
+                # Search the learned high-probability regions first, the whole monitor when due
+                regions = heatmap.plan(template_w, template_h)
+                if regions is None:
+                    regions = full_frame
+                    self.logger.debug(f"Monitor {monitor_index}: full-frame scan")
+                else:
+                    self.logger.debug(f"Monitor {monitor_index}: searching {len(regions)} ROIs "
+                                      f"({heatmap.searched_fraction(regions):.1%} of monitor)")
+            match = self._search_regions(img_bgr, template, regions, metric, near_misses)
+        
+        if not match and (discovery or near_misses):
+            if discovery:
+                # Zoom or display scaling may have changed while the bot was not watching, moving the
+                # button too, so every scale is tried on the whole monitor once
+                regions = full_frame
+                self.logger.debug(f"Monitor {monitor_index}: scale discovery")
+            else:
+                # Something scored just below the threshold; at another scale it may be the button
+                confidence, (x, y) = max(near_misses)
+                regions = [self._sweep_region((x, y, template_w, template_h), calibrated, img_bgr.shape)]
+                self.logger.debug(f"Monitor {monitor_index}: near miss ({confidence:.3f}) at ({x}, {y})")
+            scale, match = self.scales.sweep(
+                monitor_index,
+                lambda s: self._search_regions(img_bgr, calibrated.scaled(s), regions, metric),
+                force=discovery)
+            if match:
+                template = calibrated.scaled(scale)
+                template_w, template_h = template.size
+                self._save_scale(monitor_index, scale)
+        
+        if not match:
+            heatmap.miss()
+            return None
+        
+        heatmap.hit(match['relative_x'], match['relative_y'], template_w, template_h)
+        self.tracker.update(monitor_index, match['relative_x'], match['relative_y'], template_w, template_h)
+        match.update({
+            'monitor': monitor,
+            'monitor_index': monitor_index,
+            'width': template_w,
+            'height': template_h
+        })
+        return match
+
+    def _sweep_region(self, box, calibrated, shape):
+        """Region around a near-miss box that fits the calibrated template at every swept scale"""
+        x, y, width, height = box
+        largest = max(self.scales.scales)
+        half_w = int(calibrated.width * largest) // 2 + self.tracker.margin
+        half_h = int(calibrated.height * largest) // 2 + self.tracker.margin
+        center_x, center_y = x + width // 2, y + height // 2
+        x0, y0 = max(0, center_x - half_w), max(0, center_y - half_h)
+        x1, y1 = min(shape[1], center_x + half_w), min(shape[0], center_y + half_h)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def _check_layout(self):
+        """Rebuild monitor state when X11 reports a layout change that moved, resized, added or removed a monitor"""
+        if self.layout_watcher is None or not self.layout_watcher.poll():
+            return False
+        old_monitors = self.monitors
+        self.capture.refresh_layout()
+        monitors = self.get_monitors()
+        if monitor_layout(monitors) == monitor_layout(old_monitors):
+            self.logger.debug("Monitor layout unchanged")
+            return False
+
+        message = f"Monitor layout changed: {len(monitors)} monitors"
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        for index in range(min(len(monitors), len(old_monitors))):
+            old, new = old_monitors[index], monitors[index]
+            if (old['width'], old['height']) != (new['width'], new['height']):
+                # A resized monitor may be scaled differently: its scale is discovered again and its
+                # heatmap is rebuilt on next use
+                self.scales.forget(index)
+        # Frames and tracked positions were captured in the old coordinates
+        self.change_gate.invalidate()
+        self.tracker.forget()
+        self.monitors = monitors
+        if len(monitors) != len(old_monitors):
+            old_pool = self.scan_pool
+            self.scan_pool = ThreadPoolExecutor(max_workers=max(1, len(monitors)),
+                                                thread_name_prefix='monitor-scan')
+            old_pool.shutdown(wait=False)
+        return True
+
+    def _capture_calibrated(self, lease=False):
+        """Grab every calibrated monitor that changed since it was last searched.
+
+        Returns a list of (monitor_index, monitor, image, template) scans, or
+        None when no monitor is calibrated. With lease, the images keep their
+        capture ring slots until passed to capture.release().
+        """
+        self._check_layout()
+        # Collect every monitor that has calibration assets
+        calibrated = []
+        for index, monitor in enumerate(self.monitors):
+            hover_template = self._load_hover_template(index)
+            if hover_template is not None:
+                calibrated.append((index, monitor, hover_template))
+        
+        if not calibrated:
+            message = "Missing calibration files. Please run calibration first."
+            self.logger.warning(message)
+            if self.main_window:
+                self.main_window.add_log(message)
+            return None
+        
+        scans = []
+        for index, monitor, hover_template in calibrated:
+            # XDamage (when available) says the monitor is untouched, so skip even the grab
+            if not self.change_gate.pending(index) and self.capture.has_changed(monitor) is False:
+                continue
+            frame = self.capture.grab(monitor, lease=lease)
+            
+            # Nothing changed since the last searched frame, so there is nothing new to find
+            if not self.change_gate.should_search(frame.image, key=index):
+                if lease:
+                    self.capture.release(frame)
+                continue
+            scans.append((index, monitor, frame.image, hover_template))
+        return scans
+
+    def _detect_best(self, scans):
+        """Match all captured monitors concurrently and return the best match, or None"""
+        futures = [self.scan_pool.submit(self._scan_monitor, *scan) for scan in scans]
+        best_match = None
+        for future in futures:
+            match = future.result()
+            if match and (best_match is None or match['confidence'] > best_match['confidence']):
+                best_match = match
+        return best_match
+
+    def _click_match(self, best_match):
+        """Click a detected accept button, verify it went away and restore the cursor"""
+        if not self.can_click():
+            message = "Rate limit reached (8 clicks/minute). Waiting..."
+            self.logger.info(message)
+            if self.main_window:
+                self.main_window.add_log(message)
+            return False
+        
+        # Store current mouse position
+        original_x, original_y = pyautogui.position()
+        
+        monitor = best_match['monitor']
+        monitor_index = best_match['monitor_index']
+        message = f"\nBest match confidence: {best_match['confidence']:.3f}"
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+            
+        # Calculate screen coordinates relative to monitor
+        click_x = monitor["left"] + best_match['relative_x'] + best_match['width'] // 2  # Center of template
+        click_y = monitor["top"] + best_match['relative_y'] + best_match['height'] // 2
+        
+        # Log coordinates for debugging
+        message = f"Match at ({best_match['relative_x']}, {best_match['relative_y']}) in monitor {monitor_index}"
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        
+        message = f"Screen position: ({click_x}, {click_y})"
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        
+        # Ensure coordinates are within screen bounds
+        screen_width = monitor["width"] + monitor["left"]
+        screen_height = monitor["height"] + monitor["top"]
+        click_x = max(monitor["left"] + 10, min(click_x, screen_width - 10))
+        click_y = max(monitor["top"] + 10, min(click_y, screen_height - 10))
+        
+        # Move to position and click
+        message = "Moving to button position..."
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        pyautogui.moveTo(click_x, click_y)
+        time.sleep(0.1)  # Small delay
+        
+        message = "Performing click..."
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        pyautogui.click()
+        time.sleep(0.1)  # Small delay between clicks
+        pyautogui.click()  # Double click to ensure it registers
+        self.click_history.append(datetime.now())
+        # The button may still be there, so search the next frame even if unchanged
+        self.change_gate.invalidate(monitor_index)
+        
+        # Monitor the click area for changes
+        message = "Monitoring click area for changes..."
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        self.monitor_click_area(click_x, click_y, monitor, monitor_index=monitor_index)
+        
+        # Restore original cursor position, kept inside the monitor it was on
+        message = "Restoring cursor position..."
+        self.logger.info(message)
+        if self.main_window:
+            self.main_window.add_log(message)
+        home = self.monitors[monitor_index_at(self.monitors, original_x, original_y)]
+        restore_x = max(home["left"] + 10, min(original_x, home["left"] + home["width"] - 10))
+        restore_y = max(home["top"] + 10, min(original_y, home["top"] + home["height"] - 10))
+        pyautogui.moveTo(restore_x, restore_y)
+        # Frames captured during verification are stale; start from fresh ones
+        self.change_gate.invalidate(monitor_index)
+        # The accepted button is gone now, which says nothing about the scale
+        self.scales.postpone(monitor_index)
+        return True
+
+    def _pipeline_capture(self):
+        """Capture stage: skip capturing entirely while clicks are rate limited"""
+        if not self.can_click():
+            return None
+        # Frames are views into the capture ring; their slots are leased until detection is done with them
+        return self._capture_calibrated(lease=True) or None
+
+    def _pipeline_release(self, scans):
+        """Hand a scanned, dropped or discarded capture's ring slots back to the capture engine"""
+        for index, monitor, image, template in scans:
+            self.capture.release(image)
+
+    def _pipeline_detect(self, scans):
+        """Detection stage: log misses and hand the best match to the actuation stage"""
+        best_match = self._detect_best(scans)
+        if best_match is None:
+            self.logger.debug("No matches found above confidence threshold")
+        return best_match
+
     def find_and_click_accept(self):
+        """Run capture, detection and the click once, synchronously"""
         if not self.can_click():
             message = "Rate limit reached (8 clicks/minute). Waiting..."
             self.logger.info(message)
@@ -824,171 +1403,22 @@ class CursorAutoAccept:
             return False
             
         try:
-            # Store current mouse position
-            original_x, original_y = pyautogui.position()
-            
-            # Only check monitor 0
-            monitor = self.monitors[0]
-            monitor_assets = self.assets_dir / "monitor_0"
-            
-            # Log monitor info for debugging
-            self.logger.info(f"Using monitor: {monitor['width']}x{monitor['height']} at ({monitor['left']}, {monitor['top']})")
-            
-            # Check for calibration files
-            hover_file = monitor_assets / 'accept_button.png'
-            after_file = monitor_assets / 'accept_after.png'
-            coords_file = monitor_assets / 'click_coords.txt'
-            
-            if not all(f.exists() for f in [hover_file, after_file, coords_file]):
-                message = "Missing calibration files. Please run calibration first."
-                self.logger.warning(message)
-                if self.main_window:
-                    self.main_window.add_log(message)
-                return False
-            
-            # Load template
-            hover_template = cv2.imread(str(hover_file))
-            if hover_template is None:
-                message = "Failed to load template"
-                self.logger.error(message)
-                if self.main_window:
-                    self.main_window.add_log(message)
+            scans = self._capture_calibrated()
+            if not scans:
                 return False
             
-            # Ensure template is in correct orientation (80x40)
-            if hover_template.shape[0] != 40 or hover_template.shape[1] != 80:
-                hover_template = cv2.rotate(hover_template, cv2.ROTATE_90_CLOCKWISE)
+            best_match = self._detect_best(scans)
+            if best_match:
+                return self._click_match(best_match)
             
-            try:
-                # Capture monitor
-                screenshot = self.sct.grab(monitor)
-                img = np.array(screenshot)
-                img_bgr = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-                
-                # Try different matching methods
-                methods = [
-                    (cv2.TM_CCOEFF_NORMED, 0.6),  # Method, threshold
-                    (cv2.TM_CCORR_NORMED, 0.8),
-                    (cv2.TM_SQDIFF_NORMED, 0.2)  # For SQDIFF, lower is better
-                ]
-                
-                best_match = None
-                best_confidence = -1
-                
-                for method, threshold in methods:
-                    # Match against hover template
-                    result = cv2.matchTemplate(img_bgr, hover_template, method)
-                    
-                    if method == cv2.TM_SQDIFF_NORMED:
-                        # For SQDIFF, we want minimum value
-                        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                        confidence = 1.0 - min_val  # Convert to confidence
-                        loc = min_loc
-                    else:
-                        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                        confidence = max_val
-                        loc = max_loc
-                    
-                    message = f"Method {method} confidence: {confidence:.3f}"
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    
-                    # Check if this match is better
-                    if method == cv2.TM_SQDIFF_NORMED:
-                        if confidence > (1.0 - threshold) and confidence > best_confidence:
-                            best_confidence = confidence
-                            best_match = {
-                                'confidence': confidence,
-                                'relative_x': loc[0],
-                                'relative_y': loc[1]
-                            }
-                    else:
-                        if confidence > threshold and confidence > best_confidence:
-                            best_confidence = confidence
-                            best_match = {
-                                'confidence': confidence,
-                                'relative_x': loc[0],
-                                'relative_y': loc[1]
-                            }
-                
-                # Take best match
-                if best_match:
-                    message = f"\nBest match confidence: {best_match['confidence']:.3f}"
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                        
-                    # Calculate screen coordinates relative to monitor
-                    click_x = monitor["left"] + best_match['relative_x'] + 40  # Center of template
-                    click_y = monitor["top"] + best_match['relative_y'] + 20
-                    
-                    # Log coordinates for debugging
-                    message = f"Match at ({best_match['relative_x']}, {best_match['relative_y']}) in monitor"
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    
-                    message = f"Screen position: ({click_x}, {click_y})"
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    
-                    # Ensure coordinates are within screen bounds
-                    screen_width = monitor["width"] + monitor["left"]
-                    screen_height = monitor["height"] + monitor["top"]
-                    click_x = max(monitor["left"] + 10, min(click_x, screen_width - 10))
-                    click_y = max(monitor["top"] + 10, min(click_y, screen_height - 10))
-                    
-                    # Move to position and click
-                    message = "Moving to button position..."
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    pyautogui.moveTo(click_x, click_y)
-                    time.sleep(0.1)  # Small delay
-                    
-                    message = "Performing click..."
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    pyautogui.click()
-                    time.sleep(0.1)  # Small delay between clicks
-                    pyautogui.click()  # Double click to ensure it registers
-                    self.click_history.append(datetime.now())
-                    
-                    # Monitor the click area for changes
-                    message = "Monitoring click area for changes..."
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    self.monitor_click_area(click_x, click_y, monitor)
-                    
-                    # Restore original cursor position
-                    message = "Restoring cursor position..."
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    restore_x = max(monitor["left"] + 10, min(original_x, screen_width - 10))
-                    restore_y = max(monitor["top"] + 10, min(original_y, screen_height - 10))
-                    pyautogui.moveTo(restore_x, restore_y)
-                    return True
-                else:
-                    message = "No matches found above confidence threshold"
-                    self.logger.info(message)
-                    if self.main_window:
-                        self.main_window.add_log(message)
-                    return False
+            message = "No matches found above confidence threshold"
+            self.logger.info(message)
+            if self.main_window:
+                self.main_window.add_log(message)
+            return False
                     
-            except Exception as e:
-                message = f"Error finding matches: {str(e)}"
-                self.logger.error(message)
-                if self.main_window:
-                    self.main_window.add_log(message)
-                return False
-            
         except Exception as e:
-            message = f"Unexpected error: {str(e)}"
+            message = f"Error finding matches: {str(e)}"
             self.logger.error(message)
             if self.main_window:
                 self.main_window.add_log(message)
@@ -999,9 +1429,15 @@ def main():
     parser.add_argument('--capture', action='store_true', help='Force recalibration by capturing new accept button images')
     parser.add_argument('--monitor', type=int, help='Calibrate a specific monitor (0-based index)')
     parser.add_argument('--test', action='store_true', help='Run in test mode with 10s timeout')
+    parser.add_argument('--pyramid', action='store_true', help='Search large regions coarse-to-fine (faster on big monitors)')
+    parser.add_argument('--single-metric', action='store_true',
+                        help='Score only the matching method calibration picked for each monitor')
+    parser.add_argument('--color-prefilter', action='store_true',
+                        help="Match only around regions of the accept button's fill colour")
     args = parser.parse_args()
 
-    bot = CursorAutoAccept()
+    bot = CursorAutoAccept(pyramid=args.pyramid, single_metric=args.single_metric,
+                           color_prefilter=args.color_prefilter)
     
     if args.capture:
         bot.capture_accept_button(args.monitor)
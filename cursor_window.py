@@ -0,0 +1,256 @@
+import os
+import sys
+import ctypes
+import logging
+from x11_capture import (X11CaptureError, XEvent, X_ERROR_HANDLER, _load_library, add_error_listener,
+                         remove_error_listener)
+
+# Xlib constants
+ANY_PROPERTY_TYPE = 0
+IS_VIEWABLE = 2
+STRUCTURE_NOTIFY_MASK = 1 << 17
+SUBSTRUCTURE_NOTIFY_MASK = 1 << 19
+PROPERTY_CHANGE_MASK = 1 << 22
+
+# WM_CLASS of the Cursor editor (instance "cursor", class "Cursor")
+CURSOR_WM_CLASS = 'cursor'
+
+
+class XWindowAttributes(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('border_width', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('visual', ctypes.c_void_p),
+        ('root', ctypes.c_ulong),
+        ('class_', ctypes.c_int),
+        ('bit_gravity', ctypes.c_int),
+        ('win_gravity', ctypes.c_int),
+        ('backing_store', ctypes.c_int),
+        ('backing_planes', ctypes.c_ulong),
+        ('backing_pixel', ctypes.c_ulong),
+        ('save_under', ctypes.c_int),
+        ('colormap', ctypes.c_ulong),
+        ('map_installed', ctypes.c_int),
+        ('map_state', ctypes.c_int),
+        ('all_event_masks', ctypes.c_long),
+        ('your_event_mask', ctypes.c_long),
+        ('do_not_propagate_mask', ctypes.c_long),
+        ('override_redirect', ctypes.c_int),
+        ('screen', ctypes.c_void_p)
+    ]
+
+
+def wm_class_matches(raw, wanted):
+    """Whether a raw WM_CLASS value ("instance\\0class\\0") names the wanted application, ignoring case."""
+    names = raw.decode('latin-1', 'replace').split('\0')
+    return any(name.lower() == wanted.lower() for name in names if name)
+
+
+def clip_rectangle(left, top, width, height, screen_width, screen_height):
+    """Part of a rectangle on the screen, as a capture region, or None if none of it is."""
+    x0, y0 = max(0, left), max(0, top)
+    x1, y1 = min(screen_width, left + width), min(screen_height, top + height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return {'left': x0, 'top': y0, 'width': x1 - x0, 'height': y1 - y0}
+
+
+class CursorWindowLocator:
+    """Finds the Cursor window on X11 through EWMH and follows its geometry.
+
+    The window is the first entry of the window manager's _NET_CLIENT_LIST
+    (or, without an EWMH window manager, of the root window's children)
+    whose WM_CLASS names wm_class. ``region()`` returns its rectangle on the
+    root window, clipped to the screen, or None while no such window is
+    mapped. Structure and property events on the root and the window mark
+    the rectangle stale; ``poll()`` drains them and reports whether the
+    region changed, so callers never rescan the screen for it.
+    """
+
+    def __init__(self, display_name=None, wm_class=CURSOR_WM_CLASS):
+        self.logger = logging.getLogger('cursor_window')
+        self.wm_class = wm_class
+        self.display = None
+        self.window = None
+        self._region = None
+        self._stale = True
+        self._last_error = None
+
+        if not sys.platform.startswith('linux'):
+            raise X11CaptureError("Window tracking is only available on X11")
+        display_name = display_name or os.environ.get('DISPLAY')
+        if not display_name:
+            raise X11CaptureError("DISPLAY is not set")
+
+        self.x11 = _load_library('X11')
+        self._declare_functions()
+        self.display = self.x11.XOpenDisplay(display_name.encode())
+        if not self.display:
+            raise X11CaptureError(f"Cannot open display {display_name}")
+        add_error_listener(self.x11, self._on_x_error)
+
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.client_list_atom = self.x11.XInternAtom(self.display, b'_NET_CLIENT_LIST', 0)
+        self.wm_class_atom = self.x11.XInternAtom(self.display, b'WM_CLASS', 0)
+        # Windows opening, closing or moving (their frames are children of the root) and screen resizes
+        self.x11.XSelectInput(self.display, self.root,
+                              STRUCTURE_NOTIFY_MASK | SUBSTRUCTURE_NOTIFY_MASK | PROPERTY_CHANGE_MASK)
+        self.x11.XFlush(self.display)
+
+    def _declare_functions(self):
+        x11 = self.x11
+        vp, ul, i, ui = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_uint
+
+        x11.XOpenDisplay.restype = vp
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [vp]
+        x11.XDefaultScreen.argtypes = [vp]
+        x11.XRootWindow.restype = ul
+        x11.XRootWindow.argtypes = [vp, i]
+        x11.XInternAtom.restype = ul
+        x11.XInternAtom.argtypes = [vp, ctypes.c_char_p, i]
+        x11.XGetWindowProperty.argtypes = [vp, ul, ul, ctypes.c_long, ctypes.c_long, i, ul, ctypes.POINTER(ul),
+                                           ctypes.POINTER(i), ctypes.POINTER(ul), ctypes.POINTER(ul),
+                                           ctypes.POINTER(ctypes.POINTER(ctypes.c_ubyte))]
+        x11.XQueryTree.argtypes = [vp, ul, ctypes.POINTER(ul), ctypes.POINTER(ul),
+                                   ctypes.POINTER(ctypes.POINTER(ul)), ctypes.POINTER(ui)]
+        x11.XGetWindowAttributes.argtypes = [vp, ul, ctypes.POINTER(XWindowAttributes)]
+        x11.XTranslateCoordinates.argtypes = [vp, ul, ul, i, i, ctypes.POINTER(i), ctypes.POINTER(i),
+                                              ctypes.POINTER(ul)]
+        x11.XSelectInput.argtypes = [vp, ul, ctypes.c_long]
+        x11.XFlush.argtypes = [vp]
+        x11.XSync.argtypes = [vp, i]
+        x11.XFree.argtypes = [vp]
+        x11.XPending.argtypes = [vp]
+        x11.XNextEvent.argtypes = [vp, ctypes.POINTER(XEvent)]
+        x11.XSetErrorHandler.restype = vp
+        x11.XSetErrorHandler.argtypes = [X_ERROR_HANDLER]
+
+    def _on_x_error(self, display, event):
+        # Windows can disappear between two requests; such errors only mean "not there"
+        if display == self.display:
+            self._last_error = True
+
+    def _property(self, window, atom):
+        """A window property: bytes for 8-bit formats, a list of ints for 32-bit ones, or None if unset."""
+        actual_type, actual_format = ctypes.c_ulong(), ctypes.c_int()
+        count, remaining = ctypes.c_ulong(), ctypes.c_ulong()
+        data = ctypes.POINTER(ctypes.c_ubyte)()
+        status = self.x11.XGetWindowProperty(self.display, window, atom, 0, 1 << 16, 0, ANY_PROPERTY_TYPE,
+                                             ctypes.byref(actual_type), ctypes.byref(actual_format),
+                                             ctypes.byref(count), ctypes.byref(remaining), ctypes.byref(data))
+        if status != 0 or not data:
+            return None
+        try:
+            if actual_format.value == 32:
+                # Format 32 items are returned as C longs
+                items = ctypes.cast(data, ctypes.POINTER(ctypes.c_ulong))
+                return [items[k] for k in range(count.value)]
+            return ctypes.string_at(data, count.value * actual_format.value // 8)
+        finally:
+            self.x11.XFree(data)
+
+    def _client_windows(self):
+        """Top-level client windows, from _NET_CLIENT_LIST when the window manager publishes it."""
+        clients = None
+        if self.client_list_atom:
+            clients = self._property(self.root, self.client_list_atom)
+        if clients:
+            return clients
+        root, parent = ctypes.c_ulong(), ctypes.c_ulong()
+        children, count = ctypes.POINTER(ctypes.c_ulong)(), ctypes.c_uint()
+        if not self.x11.XQueryTree(self.display, self.root, ctypes.byref(root), ctypes.byref(parent),
+                                   ctypes.byref(children), ctypes.byref(count)):
+            return []
+        try:
+            return [children[k] for k in range(count.value)]
+        finally:
+            if children:
+                self.x11.XFree(children)
+
+    def find(self):
+        """Window id of the Cursor window, or None."""
+        self._last_error = None
+        for window in self._client_windows():
+            wm_class = self._property(window, self.wm_class_atom)
+            if isinstance(wm_class, bytes) and wm_class_matches(wm_class, self.wm_class):
+                return window
+        return None
+
+    def _geometry(self, window):
+        """(left, top, width, height) of a viewable window on the root, or None."""
+        self._last_error = None
+        attributes = XWindowAttributes()
+        if not self.x11.XGetWindowAttributes(self.display, window, ctypes.byref(attributes)):
+            return None
+        if attributes.map_state != IS_VIEWABLE:
+            return None
+        x, y, child = ctypes.c_int(), ctypes.c_int(), ctypes.c_ulong()
+        if not self.x11.XTranslateCoordinates(self.display, window, self.root, 0, 0,
+                                              ctypes.byref(x), ctypes.byref(y), ctypes.byref(child)):
+            return None
+        self.x11.XSync(self.display, 0)
+        if self._last_error:
+            return None
+        return x.value, y.value, attributes.width, attributes.height
+
+    def _screen_size(self):
+        """Current size of the root window, which follows monitor layout changes."""
+        attributes = XWindowAttributes()
+        self.x11.XGetWindowAttributes(self.display, self.root, ctypes.byref(attributes))
+        return attributes.width, attributes.height
+
+    def _refresh(self):
+        geometry = self._geometry(self.window) if self.window is not None else None
+        if geometry is None:
+            window = self.find()
+            if window != self.window:
+                self.window = window
+                if window is not None:
+                    # Resizes, unmaps and the window manager's move notifications
+                    self.x11.XSelectInput(self.display, window, STRUCTURE_NOTIFY_MASK)
+                    self.logger.info(f"Found Cursor window 0x{window:x}")
+            geometry = self._geometry(window) if window is not None else None
+        self._region = clip_rectangle(*geometry, *self._screen_size()) if geometry else None
+        self._stale = False
+
+    def poll(self):
+        """Process pending X events; True when the region changed since the last call."""
+        event = XEvent()
+        while self.x11.XPending(self.display):
+            self.x11.XNextEvent(self.display, ctypes.byref(event))
+            self._stale = True
+        if not self._stale:
+            return False
+        previous = self._region
+        self._refresh()
+        if self._region != previous:
+            self.logger.info(f"Cursor window region: {self._region}")
+            return True
+        return False
+
+    def region(self):
+        """Capture region {'left', 'top', 'width', 'height'} of the Cursor window, or None."""
+        if self._stale:
+            self.poll()
+        return self._region
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+        remove_error_listener(self._on_x_error)
+
+
+def create_locator(display_name=None, wm_class=CURSOR_WM_CLASS):
+    """A CursorWindowLocator, or None when no X11 display can be used."""
+    try:
+        return CursorWindowLocator(display_name, wm_class)
+    except (X11CaptureError, OSError) as e:
+        logging.getLogger('cursor_window').info(f"Window tracking unavailable ({str(e)})")
+        return None
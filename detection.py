@@ -0,0 +1,167 @@
+import os
+import logging
+import numpy as np
+from peak_finder import find_peaks
+
+# Target classes ClickBot looks for
+ACCEPT = 'accept'
+NOTE_ICON = 'note-icon'
+ERROR_ICON = 'error-icon'
+NOTE_WITH_ICON = 'note-with-icon'
+
+
+class TargetClass:
+    """One kind of thing to detect: its template files, threshold and search region.
+
+    region is {'left', 'top', 'width', 'height'} in screen coordinates, or
+    None for the whole captured frame.
+    """
+
+    def __init__(self, name, template_paths, threshold=0.8, region=None, max_instances=10):
+        self.name = name
+        self.template_paths = list(template_paths)
+        self.threshold = threshold
+        self.region = region
+        self.max_instances = max_instances
+
+    def __repr__(self):
+        return f"TargetClass({self.name!r}, {len(self.template_paths)} templates)"
+
+
+class Detection:
+    """One instance of a target class, centred at (x, y) in screen coordinates."""
+
+    def __init__(self, kind, template, x, y, width, height, confidence):
+        self.kind = kind
+        self.template = template  # Template file that matched
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.confidence = confidence
+
+    def to_match(self):
+        """The match dict ImageMatcher.find_all_matches reports for the same instance."""
+        return {'confidence': self.confidence, 'x': self.x, 'y': self.y, 'width': self.width,
+                'height': self.height, 'template': self.template}
+
+    def __repr__(self):
+        return f"Detection({self.kind!r}, ({self.x}, {self.y}), confidence={self.confidence:.3f})"
+
+
+class DetectionResult:
+    """Every detection of one pass, grouped by target class."""
+
+    def __init__(self, detections):
+        self.detections = detections
+        self._by_kind = {}
+        for detection in detections:
+            self._by_kind.setdefault(detection.kind, []).append(detection)
+
+    def of(self, kind):
+        """Detections of one target class, best first within each template."""
+        return self._by_kind.get(kind, [])
+
+    def found(self, kind):
+        return bool(self._by_kind.get(kind))
+
+    def __iter__(self):
+        return iter(self.detections)
+
+    def __len__(self):
+        return len(self.detections)
+
+
+class DetectionPass:
+    """Evaluates every target class against one frame, preparing the frame once.
+
+    The frame is converted to grayscale once by the caller. When most of it
+    changed since the last pass, each search region (the whole screen, or a
+    class's region) is prepared once for the correlation engine and every
+    template is scored against it; otherwise only dirty tiles are re-matched
+    per template, as in ImageMatcher.find_all_matches. Either way a target
+    class adds only the correlation cost of its own templates.
+    """
+
+    def __init__(self, matcher, targets=()):
+        self.logger = logging.getLogger('detection')
+        self.matcher = matcher
+        self.targets = list(targets)
+        self._missing = set()  # template files already reported missing
+        self._outside = set()  # target classes whose region is currently outside the frame
+
+    def add(self, target):
+        self.targets.append(target)
+        return target
+
+    def _templates(self, target, exclude):
+        for path in target.template_paths:
+            if path in exclude or path in self._missing:
+                continue
+            if not os.path.exists(path):
+                self.logger.warning(f"Template for {target.name} not found: {path}")
+                self._missing.add(path)
+                continue
+            template = self.matcher.load_template(path)
+            if template is not None:
+                yield path, template
+
+    def _region_key(self, target, origin, shape):
+        """A target's region as (left, top, width, height) in the frame, clipped to it.
+
+        Returns None to search the whole frame, or False when none of the
+        region is inside the frame (a warning is logged once until it is).
+        """
+        region = target.region
+        if region is None:
+            return None
+        left, top = region['left'] - origin[0], region['top'] - origin[1]
+        x0, y0 = max(0, left), max(0, top)
+        x1, y1 = min(shape[1], left + region['width']), min(shape[0], top + region['height'])
+        if x1 <= x0 or y1 <= y0:
+            if target.name not in self._outside:
+                self.logger.warning(f"Search region of {target.name} {region} is outside the captured frame "
+                                    f"at {origin}; not searching for it")
+                self._outside.add(target.name)
+            return False
+        self._outside.discard(target.name)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def detect(self, screen_gray, exclude=(), origin=(0, 0)):
+        """Run every target class over a grayscale frame; template files in exclude are skipped.
+
+        origin is the screen position of the frame's top-left corner, which
+        target regions are translated by. Detections are in frame coordinates.
+        """
+        prepare = self.matcher.pyramid is None and \
+            self.matcher.dirty_fraction(screen_gray) > self.matcher.INCREMENTAL_MAX_DIRTY
+        areas = {}  # region key -> (grayscale area, offset, prepared frame or None)
+        detections = []
+        for target in self.targets:
+            key = self._region_key(target, origin, screen_gray.shape)
+            if key is False:
+                continue
+            if key not in areas:
+                if key is None:
+                    area, offset = screen_gray, (0, 0)
+                else:
+                    left, top, width, height = key
+                    area, offset = np.ascontiguousarray(screen_gray[top:top + height, left:left + width]), (left, top)
+                areas[key] = (area, offset, self.matcher.correlation.prepare(area) if prepare else None)
+            area, (left, top), frame = areas[key]
+
+            for path, template in self._templates(target, exclude):
+                if frame is not None:
+                    result = self.matcher.correlation.score(frame, template)
+                    if result is None:
+                        continue
+                    peaks = find_peaks(result, target.threshold, template.size, target.max_instances)
+                    found = [(value, loc[0] + template.width // 2, loc[1] + template.height // 2)
+                             for value, loc in peaks]
+                else:
+                    found = [(match['confidence'], match['x'], match['y']) for match in
+                             self.matcher.find_template_instances(area, template, target.threshold,
+                                                                  target.max_instances,
+                                                                  cache_key=f"{target.name}:{path}")]
+                for confidence, x, y in found:
+                    detections.append(Detection(target.name, path, x + left, y + top,
+                                                template.width, template.height, confidence))
+        return DetectionResult(detections)
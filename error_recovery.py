@@ -1,15 +1,24 @@
 import os
 import time
 import pyautogui
+import numpy as np
 from PIL import Image
 import logging
+from image_matcher import ImageMatcher
+from detection import DetectionPass, TargetClass, NOTE_ICON, ERROR_ICON, NOTE_WITH_ICON
 
 class ErrorRecoveryHandler:
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, matcher=None, search_region=None):
         self.debug = debug
-        self.error_indicators = ['note-icon.png']
+        # Indicator classes detected on every pass, and their template files
+        self.error_indicators = {NOTE_ICON: 'note-icon.png', ERROR_ICON: 'error-icon.png',
+                                 NOTE_WITH_ICON: 'note-with-icon.png'}
+        self.recovery_triggers = (NOTE_ICON,)  # Indicators that start the recovery sequence
         self.error_threshold = 0.8  # Confidence threshold for error detection
         self.max_retries = 3  # Maximum number of retries for recovery
+        # Part of the screen the indicators appear in (the chat panel), as
+        # {'left', 'top', 'width', 'height'} in screen coordinates; None searches the whole frame
+        self.search_region = search_region
         
         # Set up logging
         log_dir = os.path.join(os.path.dirname(__file__), "temp", "logs")
@@ -24,25 +33,21 @@ class ErrorRecoveryHandler:
         )
         self.logger = logging.getLogger('error_recovery')
         
-        # Load reference images
+        # Match with the same engine and template cache as the accept detector
+        self.matcher = matcher if matcher is not None else ImageMatcher(debug)
+        
+        # Reference images; templates are compiled on first use
         self.images_dir = os.path.join(os.path.dirname(__file__), 'images')
-        self.error_images = {}  # Initialize empty, load on demand
+        self.detector = DetectionPass(self.matcher)
 
-    def _load_error_images(self):
-        """Load error indicator images."""
-        images = {}
-        for img_name in self.error_indicators:
-            path = os.path.join(self.images_dir, img_name)
-            if os.path.exists(path):
-                images[img_name] = Image.open(path)
-            else:
-                self.logger.warning(f"Error indicator image not found: {img_name}")
-        return images
+    def target_classes(self):
+        """Target classes for the error indicators, to run in a DetectionPass."""
+        return [TargetClass(kind, [os.path.join(self.images_dir, name)], self.error_threshold, self.search_region)
+                for kind, name in self.error_indicators.items()]
 
-    def _ensure_images_loaded(self):
-        """Ensure all necessary images are loaded."""
-        if not self.error_images:
-            self.error_images = self._load_error_images()
+    def indicator_paths(self):
+        """Template files of the error indicators, which are not accept buttons."""
+        return {os.path.join(self.images_dir, name) for name in self.error_indicators.values()}
 
     def perform_recovery(self):
         """Perform the recovery sequence by typing 'continue'."""
@@ -65,32 +70,25 @@ class ErrorRecoveryHandler:
             return False
 
     def check_for_note(self, screen):
-        """Check if note icon is present on screen."""
-        self._ensure_images_loaded()
-        
+        """Check if note icon is present on screen (grayscale or RGB array, or PIL image)."""
         try:
-            note_icon = self.error_images.get('note-icon.png')
-            
-            if not note_icon:
-                self.logger.error("Note icon template not loaded")
-                return False
-
-            # Convert screen to PIL Image if it's not already
-            if not isinstance(screen, Image.Image):
-                screen = Image.fromarray(screen)
-
-            # Use PyAutoGUI's locate function which returns None if not found
-            location = pyautogui.locate(note_icon, screen, confidence=self.error_threshold)
-            
-            if location:
-                self.logger.info(f"Found note icon at {location}")
-                return True
-
-            return False
+            if isinstance(screen, Image.Image):
+                screen = np.asarray(screen)
+            self.detector.targets = self.target_classes()
+            return self.needs_recovery(self.detector.detect(self.matcher.to_gray(screen)))
         except Exception as e:
             self.logger.error(f"Error checking for note icon: {str(e)}")
             return False
 
+    def needs_recovery(self, result):
+        """Whether a DetectionResult holds an indicator that triggers recovery."""
+        for kind in self.error_indicators:
+            for detection in result.of(kind):
+                level = logging.INFO if kind in self.recovery_triggers else logging.DEBUG
+                self.logger.log(level, f"Found {kind} at ({detection.x}, {detection.y}) "
+                                       f"with confidence {detection.confidence:.3f}")
+        return any(result.found(kind) for kind in self.recovery_triggers)
+
     def handle_error_case(self, screen):
         """Main error handling flow."""
         if self.check_for_note(screen):
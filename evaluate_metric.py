@@ -0,0 +1,165 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+from correlation_engine import CorrelationEngine
+from metric_calibration import DEFAULT_MATCH_METHODS, MetricCalibrator, load_recording, pick_match
+from calibration_pack import CalibrationPack, PACK_FILE
+
+
+def paste(screen, patch, x, y, gain=1.0, noise=0.0, rng=None):
+    """Copy of screen with patch drawn at (x, y), optionally rescaled in brightness and noised."""
+    screen = screen.copy()
+    patch = patch.astype(np.float32) * gain
+    if noise:
+        patch += rng.normal(0.0, noise, patch.shape).astype(np.float32)
+    screen[y:y + patch.shape[0], x:x + patch.shape[1]] = np.clip(patch, 0, 255).astype(np.uint8)
+    return screen
+
+
+def calibration_cases(recording):
+    """The labelled frames calibration chose the metric from: (frame, button location or None).
+
+    Scores on these are in-sample and only shown for reference.
+    """
+    template, after_img, hover_screen, after_screen, location = recording
+    return [(hover_screen, location), (after_screen, None),
+            (paste(hover_screen, after_img, location[0], location[1]), None)]
+
+
+def build_cases(recording, samples, rng, variations=(), max_gain=0.1, noise=4.0):
+    """Labelled frames calibration never saw: (frame, button location or None).
+
+    Positives are the hover crop pasted at random spots of the after-click
+    screen with brightness and noise jitter; negatives are the clicked state
+    pasted at the same spots. Spots overlapping the recorded button are
+    skipped, since pasting there reproduces the recording. variations are
+    (pre, post) crops of other recorded buttons; each one at the template's
+    size is pasted as a further positive, and every clicked state as a
+    negative.
+    """
+    template, after_img, hover_screen, after_screen, location = recording
+    height, width = after_screen.shape[:2]
+    hover_img = np.asarray(template.bgr)
+
+    def spot():
+        for _ in range(100):
+            x = int(rng.integers(0, width - template.width + 1))
+            y = int(rng.integers(0, height - template.height + 1))
+            if abs(x - location[0]) >= template.width or abs(y - location[1]) >= template.height:
+                break
+        return x, y
+
+    cases = []
+    for _ in range(samples):
+        x, y = spot()
+        gain = 1.0 + float(rng.uniform(-max_gain, max_gain))
+        cases.append((paste(after_screen, hover_img, x, y, gain, noise, rng), (x, y)))
+        cases.append((paste(after_screen, after_img, x, y), None))
+    for pre, post in variations:
+        x, y = spot()
+        if pre.shape[:2] == (template.height, template.width):
+            cases.append((paste(after_screen, pre, x, y), (x, y)))
+        cases.append((paste(after_screen, post, x, y), None))
+    return cases
+
+
+def button_variations(pack):
+    """(pre, post) crops of the button variations recorded in a calibration pack."""
+    if pack is None:
+        return []
+    variations = []
+    for button in pack.buttons:
+        pre, post = pack.image(f"button_{button['index']}_pre"), pack.image(f"button_{button['index']}_post")
+        if pre is not None and post is not None:
+            variations.append((pre, post))
+    return variations
+
+
+def evaluate(cases, template, method_thresholds, engine, tolerance=2):
+    """Hits, misses, false alarms and mean decision time of one method list over labelled frames."""
+    methods = [method for method, threshold in method_thresholds]
+    result = {'hits': 0, 'positives': 0, 'false_alarms': 0, 'negatives': 0, 'seconds': 0.0}
+    for frame, location in cases:
+        start = time.perf_counter()
+        peaks = engine.peaks(engine.prepare(frame), template, methods)
+        match = pick_match(peaks, method_thresholds) if peaks is not None else None
+        result['seconds'] += time.perf_counter() - start
+        if location is None:
+            result['negatives'] += 1
+            result['false_alarms'] += match is not None
+        else:
+            result['positives'] += 1
+            hit = match is not None and all(abs(a - b) <= tolerance for a, b in zip(match[1], location))
+            result['hits'] += hit
+    result['ms'] = result['seconds'] / len(cases) * 1000 if cases else 0.0
+    return result
+
+
+def report(name, result):
+    hit_rate = result['hits'] / result['positives'] if result['positives'] else 0.0
+    false_rate = result['false_alarms'] / result['negatives'] if result['negatives'] else 0.0
+    print(f"{name:<26} | {hit_rate:>8.1%} | {false_rate:>12.1%} | {result['ms']:>11.1f}")
+    return hit_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check offline that the calibrated single metric finds the accept button as often as '
+                    'trying every method, on frames held out from calibration')
+    parser.add_argument('monitors', nargs='*',
+                        help='Calibrated monitor asset directories (default: assets/monitor_*)')
+    parser.add_argument('--samples', type=int, default=20,
+                        help='Synthetic button placements per monitor (default: 20)')
+    parser.add_argument('--recalibrate', action='store_true',
+                        help=f'Choose the metric again instead of reading it from {PACK_FILE}')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    directories = [Path(d) for d in args.monitors] or sorted(Path(__file__).parent.glob('assets/monitor_*'))
+    engine = CorrelationEngine()
+    calibrator = MetricCalibrator(engine)
+    rng = np.random.default_rng(args.seed)
+    evaluated = 0
+    for directory in directories:
+        recording = load_recording(directory)
+        if recording is None:
+            print(f"Skipping {directory}: no calibration screenshots (recalibrate to record them)")
+            continue
+        template = recording[0]
+        pack = CalibrationPack.load(directory / PACK_FILE)
+        choice = pack.metric if pack is not None and not args.recalibrate else None
+        if choice is None:
+            choice = calibrator.choose(template, [(recording[2], recording[4])],
+                                       [(recording[2], recording[4]), (recording[3], None), (recording[1], None)])
+        in_sample = calibration_cases(recording)
+        variations = button_variations(pack)
+        held_out = build_cases(recording, args.samples, rng, variations)
+
+        print(f"\n{directory}: {recording[2].shape[1]}x{recording[2].shape[0]}")
+        print("Mode                       | Hit rate | False alarms | ms/decision")
+        held_out_rates = None
+        for label, cases in ((f"Calibration recording, {len(in_sample)} frames (in-sample, for reference)",
+                              in_sample),
+                             (f"Held out, {len(held_out)} frames ({len(variations)} recorded button variations)",
+                              held_out)):
+            print("-" * 68)
+            print(label)
+            baseline = report('All methods', evaluate(cases, template, DEFAULT_MATCH_METHODS, engine))
+            if choice is not None:
+                single = report(f"{choice.name} > {choice.threshold:.3f}",
+                                evaluate(cases, template, choice.match_methods(), engine))
+                held_out_rates = baseline, single
+        if choice is None:
+            print("No single metric separates the button on this screen; the bot tries every method")
+            continue
+        baseline, single = held_out_rates
+        verdict = "no loss" if single >= baseline else f"loses {baseline - single:.1%}"
+        print(f"Single metric hit rate on held-out frames: {verdict}")
+        evaluated += 1
+    if not evaluated:
+        print("\nNothing evaluated")
+
+
+if __name__ == '__main__':
+    main()
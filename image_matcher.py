@@ -1,34 +1,103 @@
 import os
-import mss
-import mss.tools
 import numpy as np
 import cv2
 from PIL import Image, ImageDraw
 from logging_config import setup_logging, log_error_with_context, save_debug_image
+from screen_capture import CaptureEngine
+from tiled_match import TiledMatchCache
+from pyramid_match import PyramidMatcher
+from template_bank import TemplateBank, CompiledTemplate
+from correlation_engine import CorrelationEngine
+from peak_finder import find_peaks
+from match_quality import MatchQuality
+
+
+class Match:
+    """One instance of the target found by find_matches, with its top-left corner at (x, y)."""
+
+    def __init__(self, x, y, width, height, confidence, quality):
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.confidence = confidence
+        self.quality = quality
+
+    @property
+    def center_x(self):
+        return self.x + self.width // 2
+
+    @property
+    def center_y(self):
+        return self.y + self.height // 2
+
+    def __repr__(self):
+        return f"Match(({self.x}, {self.y}), confidence={self.confidence:.3f}, {self.quality})"
+
 
 class ImageMatcher:
-    def __init__(self, debug=False):
+    # Above this fraction of changed tiles, scoring all templates against one
+    # prepared frame is cheaper than re-matching dirty tiles per template
+    INCREMENTAL_MAX_DIRTY = 0.25
+    MATCH_TILE_SIZE = 256
+    # Most instances of one template reported per screen
+    MAX_INSTANCES = 10
+
+    def __init__(self, debug=False, pyramid=False, threshold=0.8, capture=None):
         self.logger = setup_logging('image_matcher', debug)
         self.debug = debug
-        self.screen = mss.mss()
-        self.template_cache = {}
+        self.threshold = threshold  # Correlation find_matches() requires
+        # Coarse-to-fine search instead of full-resolution matching, when enabled
+        self.pyramid = PyramidMatcher() if pyramid else None
+        self.capture = capture if capture is not None else CaptureEngine()
+        self.templates = TemplateBank()  # Templates are loaded and converted once
+        self._template_paths = {}  # template directory -> template files in it
+        self.tile_caches = {}  # cache key -> TiledMatchCache holding the last correlation map
+        self.correlation = CorrelationEngine()
+        self._last_gray = None  # last screen passed to find_all_matches
+        self._screen = None  # (BGR, grayscale) screen set for find_matches
+        self._target = None  # CompiledTemplate set for find_matches
         self.logger.info("ImageMatcher initialized")
 
     def get_monitors(self):
         """Get list of available monitors with error handling."""
         try:
-            monitors = self.screen.monitors[1:]  # Skip first monitor (represents "all monitors")
+            monitors = self.capture.monitors  # Current layout, without the "all monitors" entry
             self.logger.debug(f"Found {len(monitors)} monitors")
             return monitors
         except Exception as e:
             log_error_with_context(self.logger, e, "Failed to get monitors")
             return []
 
+    def capture_frame(self, region):
+        """Capture screen region as a read-only BGR frame from the shared capture engine."""
+        try:
+            return self.capture.grab(region)
+        except Exception as e:
+            log_error_with_context(self.logger, e, f"Screen capture failed for region: {region}")
+            return None
+
+    def frame_to_image(self, frame):
+        """Convert a captured BGR frame to an RGB PIL image."""
+        return Image.fromarray(cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB))
+
+    def frame_to_gray(self, frame):
+        """Convert a captured BGR frame straight to the grayscale array the matchers use."""
+        return cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY)
+
+    @staticmethod
+    def to_gray(image):
+        """Grayscale array for a compiled template, a grayscale array or an RGB image."""
+        if isinstance(image, CompiledTemplate):
+            return image.gray
+        image = np.asarray(image)
+        if image.ndim == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+
     def capture_screen(self, region):
         """Capture screen region with error handling and debug output."""
         try:
-            screenshot = self.screen.grab(region)
-            img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
+            frame = self.capture.grab(region)
+            img = self.frame_to_image(frame)
             
             if self.debug:
                 path = save_debug_image(img, 'screen_capture', 'debug_output')
@@ -40,77 +109,214 @@ class ImageMatcher:
             return None
 
     def load_template(self, template_path):
-        """Load and cache template images with error handling."""
+        """Load a template once and return its compiled form, with error handling."""
         try:
-            if template_path not in self.template_cache:
-                if not os.path.exists(template_path):
-                    raise FileNotFoundError(f"Template not found: {template_path}")
-                
-                template = Image.open(template_path)
-                self.template_cache[template_path] = template
-                self.logger.debug(f"Loaded template: {template_path}")
-            
-            return self.template_cache[template_path]
+            template = self.templates.get(template_path)
+            if template is None:
+                raise FileNotFoundError(f"Template not found: {template_path}")
+            return template
         except Exception as e:
             log_error_with_context(self.logger, e, f"Failed to load template: {template_path}")
             return None
 
-    def find_template(self, screen_img, template_img, threshold=0.8):
-        """Find template in screen image with error handling and debug output."""
+    def match_incremental(self, screen_gray, template_gray, cache_key):
+        """Correlate template over screen, re-matching only the tiles that changed since the last call."""
+        if cache_key not in self.tile_caches:
+            self.tile_caches[cache_key] = TiledMatchCache(tile_size=self.MATCH_TILE_SIZE)
+        cache = self.tile_caches[cache_key]
+        result = cache.match(screen_gray, template_gray)
+        if self.debug:
+            self.logger.debug(f"Incremental match '{cache_key}': "
+                              f"{cache.last_dirty_tiles}/{cache.last_total_tiles} tiles re-matched")
+        return result
+
+    def find_template(self, screen_img, template_img, threshold=0.8, cache_key=None):
+        """Find template in screen image with error handling and debug output.
+
+        With a cache_key the correlation map is kept between calls and only
+        dirty tiles of the screen are re-matched. In pyramid mode the search
+        runs coarse-to-fine instead.
+        """
         try:
             if screen_img is None or template_img is None:
                 return None
 
-            # Convert images to numpy arrays
-            screen_np = np.array(screen_img)
-            template_np = np.array(template_img)
-
-            # Convert to grayscale
-            screen_gray = cv2.cvtColor(screen_np, cv2.COLOR_RGB2GRAY)
-            template_gray = cv2.cvtColor(template_np, cv2.COLOR_RGB2GRAY)
+            # Compiled templates and grayscale screens are used as they are
+            screen_gray = self.to_gray(screen_img)
+            template_gray = self.to_gray(template_img)
 
             # Perform template matching
-            result = cv2.matchTemplate(screen_gray, template_gray, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-
-            if max_val >= threshold:
-                match = {
-                    'confidence': max_val,
-                    'x': max_loc[0] + template_gray.shape[1] // 2,
-                    'y': max_loc[1] + template_gray.shape[0] // 2,
-                    'width': template_gray.shape[1],
-                    'height': template_gray.shape[0]
-                }
-                
-                if self.debug:
-                    self.logger.debug(f"Match found - Confidence: {max_val:.4f} at ({match['x']}, {match['y']})")
-                
-                return match
-            
-            return None
+            if self.pyramid is not None:
+                max_val, max_loc = self.pyramid.match(screen_gray, template_gray, cv2.TM_CCOEFF_NORMED,
+                                                      template_pyramid=self._gray_pyramid(template_img))
+            else:
+                result = self._match_map(screen_gray, template_gray, cache_key)
+                if result is None:
+                    return None
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+
+            return self._build_match(max_val, max_loc, template_gray.shape[1], template_gray.shape[0], threshold)
 
         except Exception as e:
             log_error_with_context(self.logger, e, "Template matching failed")
             return None
 
-    def find_all_matches(self, screen_img, threshold=0.8):
-        """Find all template matches in screen image."""
+    def find_template_instances(self, screen_img, template_img, threshold=0.8, max_matches=None, cache_key=None):
+        """Find every distinct instance of a template in the screen, best first.
+
+        Like find_template, but returns a list of matches: local maxima of the
+        correlation map above threshold, with overlapping ones merged.
+        """
         try:
-            matches = []
-            template_dir = os.path.join(os.path.dirname(__file__), 'images')
+            if screen_img is None or template_img is None:
+                return []
+
+            screen_gray = self.to_gray(screen_img)
+            template_gray = self.to_gray(template_img)
+            height, width = template_gray.shape
+            max_matches = max_matches or self.MAX_INSTANCES
+
+            if self.pyramid is not None:
+                peaks = self.pyramid.match_all(screen_gray, template_gray, cv2.TM_CCOEFF_NORMED, threshold,
+                                               max_matches, template_pyramid=self._gray_pyramid(template_img))
+            else:
+                result = self._match_map(screen_gray, template_gray, cache_key)
+                if result is None:
+                    return []
+                peaks = find_peaks(result, threshold, (width, height), max_matches)
+
+            return [self._build_match(value, loc, width, height, threshold) for value, loc in peaks]
+
+        except Exception as e:
+            log_error_with_context(self.logger, e, "Template matching failed")
+            return []
+
+    def _match_map(self, screen_gray, template_gray, cache_key):
+        """TM_CCOEFF_NORMED map of the template over the screen, incremental when a cache_key is given."""
+        if cache_key is not None:
+            return self.match_incremental(screen_gray, template_gray, cache_key)
+        return cv2.matchTemplate(screen_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+
+    @staticmethod
+    def _gray_pyramid(template_img):
+        return template_img.gray_pyramid if isinstance(template_img, CompiledTemplate) else None
+
+    def _build_match(self, max_val, max_loc, width, height, threshold):
+        """Match dict centred on the template, or None below threshold."""
+        if max_val >= threshold:
+            match = {
+                'confidence': max_val,
+                'x': max_loc[0] + width // 2,
+                'y': max_loc[1] + height // 2,
+                'width': width,
+                'height': height
+            }
+            
+            if self.debug:
+                self.logger.debug(f"Match found - Confidence: {max_val:.4f} at ({match['x']}, {match['y']})")
             
+            return match
+        
+        return None
+
+    def set_images(self, screen, target):
+        """Set the screen (BGR array) and target (CompiledTemplate or BGR array) find_matches() searches.
+
+        The arrays are used in memory as they are; only the grayscale screen
+        is derived here.
+        """
+        if not isinstance(target, CompiledTemplate):
+            target = self.templates.add('<target>', np.ascontiguousarray(target))
+        self._screen = (screen, self.to_gray(screen) if screen.ndim == 3 else screen)
+        self._target = target
+
+    def load_images(self, screen_path, target_path):
+        """Path-based set_images() for the offline tools: read the screen and target from disk."""
+        screen = cv2.imread(screen_path)
+        target = self.load_template(target_path)
+        if screen is None or target is None:
+            raise FileNotFoundError(f"Failed to load images: {screen_path}, {target_path}")
+        self.set_images(screen, target)
+
+    def find_matches(self):
+        """Every instance of the target in the screen set by set_images(), best correlation first.
+
+        Returns Match objects, each with the MatchQuality of its screen patch.
+        """
+        if self._screen is None or self._target is None:
+            raise ValueError("No images set; call set_images() or load_images() first")
+        screen_bgr, screen_gray = self._screen
+        target = self._target
+        if screen_bgr.ndim == 2:
+            screen_bgr = cv2.cvtColor(screen_bgr, cv2.COLOR_GRAY2BGR)
+        matches = []
+        for found in self.find_template_instances(screen_gray, target, self.threshold):
+            x = found['x'] - target.width // 2
+            y = found['y'] - target.height // 2
+            patch = (slice(y, y + target.height), slice(x, x + target.width))
+            quality = MatchQuality(screen_bgr[patch], screen_gray[patch], target)
+            matches.append(Match(x, y, target.width, target.height, found['confidence'], quality))
+        return matches
+
+    def dirty_fraction(self, screen_gray):
+        """Fraction of match tiles that changed since the previous screen passed here."""
+        previous, self._last_gray = self._last_gray, screen_gray.copy()
+        if previous is None or previous.shape != screen_gray.shape:
+            return 1.0
+        changed = cv2.compare(previous, screen_gray, cv2.CMP_NE).astype(np.float32)
+        tile = self.MATCH_TILE_SIZE
+        height, width = changed.shape
+        # Any changed pixel leaves a non-zero tile average
+        grid = cv2.resize(changed, (-(-width // tile), -(-height // tile)), interpolation=cv2.INTER_AREA)
+        return np.count_nonzero(grid) / grid.size
+
+    def template_paths(self, template_dir):
+        """List the template files in a directory once; later calls reuse the listing."""
+        if template_dir not in self._template_paths:
             if not os.path.exists(template_dir):
                 raise FileNotFoundError(f"Template directory not found: {template_dir}")
+            self._template_paths[template_dir] = sorted(
+                os.path.join(template_dir, name) for name in os.listdir(template_dir)
+                if name.endswith(('.png', '.jpg', '.jpeg')))
+        return self._template_paths[template_dir]
 
-            for template_file in os.listdir(template_dir):
-                if template_file.endswith(('.png', '.jpg', '.jpeg')):
-                    template_path = os.path.join(template_dir, template_file)
-                    template_img = self.load_template(template_path)
-                    
-                    if template_img:
-                        match = self.find_template(screen_img, template_img, threshold)
-                        if match:
-                            matches.append(match)
+    def find_all_matches(self, screen_img, threshold=0.8, exclude=()):
+        """Find all template matches in screen image, every visible instance of each template.
+
+        Each match names the file it came from under 'template'. Template
+        files listed in exclude are skipped.
+        """
+        try:
+            matches = []
+            template_dir = os.path.join(os.path.dirname(__file__), 'images')
+            
+            # Convert the screen once for all templates
+            screen_gray = self.to_gray(screen_img)
+            templates = []
+            for template_path in self.template_paths(template_dir):
+                if template_path in exclude:
+                    continue
+                template = self.load_template(template_path)
+                if template is not None:
+                    templates.append((template_path, template))
+            
+            if self.pyramid is None and self.dirty_fraction(screen_gray) > self.INCREMENTAL_MAX_DIRTY:
+                # Most of the screen changed: score every template against one prepared frame
+                frame = self.correlation.prepare(screen_gray)
+                for template_path, template in templates:
+                    result = self.correlation.score(frame, template)
+                    if result is None:
+                        continue
+                    for value, loc in find_peaks(result, threshold, template.size, self.MAX_INSTANCES):
+                        match = self._build_match(value, loc, template.width, template.height, threshold)
+                        match['template'] = template_path
+                        matches.append(match)
+            else:
+                for template_path, template in templates:
+                    for match in self.find_template_instances(screen_gray, template, threshold,
+                                                              cache_key=template_path):
+                        match['template'] = template_path
+                        matches.append(match)
 
             if self.debug:
                 self.logger.debug(f"Found {len(matches)} matches above threshold {threshold}")
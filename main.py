@@ -6,14 +6,20 @@ import argparse
 from datetime import datetime
 import pyautogui
 import numpy as np
-from PIL import Image
 
 from image_matcher import ImageMatcher
 from error_recovery import ErrorRecoveryHandler
+from change_gate import ChangeGate
+from scan_scheduler import ScanScheduler
+from button_tracker import ButtonTracker
+from detection import DetectionPass, TargetClass, ACCEPT
+from cursor_window import create_locator
+from monitor_layout import create_watcher, monitor_layout
 from logging_config import setup_logging, log_error_with_context, log_match_result, save_debug_image
 
 class ClickBot:
-    def __init__(self, debug=False, interval=3.0, confidence_threshold=0.8):
+    def __init__(self, debug=False, interval=3.0, confidence_threshold=0.8, burst_interval=0.1, cpu_budget=0.25,
+                 pyramid=False, error_region=None, window_capture=True):
         # Initialize logging
         self.logger = setup_logging('clickbot', debug)
         self.debug = debug
@@ -24,24 +30,36 @@ class ClickBot:
         self.click_cooldown = 1.0  # Minimum time between clicks
         
         # Initialize components
-        self.matcher = ImageMatcher(debug)
-        self.error_handler = ErrorRecoveryHandler(debug)
+        self.matcher = ImageMatcher(debug, pyramid=pyramid)
+        self.error_handler = ErrorRecoveryHandler(debug, matcher=self.matcher, search_region=error_region)
+        self.change_gate = ChangeGate()
+        # Scan fast right after a screen change or click, slowing down to `interval` when idle
+        self.scheduler = ScanScheduler(burst_interval=burst_interval, idle_interval=interval, cpu_budget=cpu_budget)
+        # Buttons already found are searched for around their predicted position first
+        self.tracker = ButtonTracker()
+        # Accept buttons and error indicators are found in one pass over each frame
+        self.detector = DetectionPass(self.matcher, [self.accept_targets()] + self.error_handler.target_classes())
+        # On X11 only the Cursor window is captured, following its moves and resizes
+        self.window_locator = create_locator() if window_capture else None
+        self.capture_region = None  # Screen region being captured; match coordinates are relative to it
+        # Monitors are re-read only when X11 reports that the layout changed
+        self.layout_watcher = create_watcher()
         
         # Set up signal handlers
         signal.signal(signal.SIGINT, self.handle_interrupt)
         signal.signal(signal.SIGTERM, self.handle_interrupt)
         
-        self.logger.info(f"ClickBot initialized - Debug: {debug}, Interval: {interval}s, "
-                        f"Confidence Threshold: {confidence_threshold}")
+        self.logger.info(f"ClickBot initialized - Debug: {debug}, Interval: {burst_interval}-{interval}s, "
+                        f"CPU Budget: {cpu_budget}, Confidence Threshold: {confidence_threshold}")
 
     def find_cursor_monitor(self):
         """Find the monitor containing the Cursor application."""
         try:
             ref_image_path = os.path.join(os.path.dirname(__file__), 'images', 'cursor-screen-head.png')
-            if not os.path.exists(ref_image_path):
+            ref_image = self.matcher.load_template(ref_image_path)
+            if ref_image is None:
                 raise FileNotFoundError(f"Reference image not found: {ref_image_path}")
 
-            ref_image = Image.open(ref_image_path)
             monitors = self.matcher.get_monitors()
             
             best_match = None
@@ -76,6 +94,71 @@ class ClickBot:
             log_error_with_context(self.logger, e, "Monitor detection failed")
             return None
 
+    def following_window(self):
+        """Whether the capture region is the Cursor window's own rectangle."""
+        return self.window_locator is not None and self.window_locator.region() is not None
+
+    def layout_changed(self):
+        """Whether X11 reported a layout change that moved, resized, added or removed a monitor."""
+        if self.layout_watcher is None or not self.layout_watcher.poll():
+            return False
+        old_layout = monitor_layout(self.matcher.get_monitors())
+        new_layout = monitor_layout(self.matcher.capture.refresh_layout())
+        if new_layout == old_layout:
+            return False
+        self.logger.info(f"Monitor layout changed: {new_layout}")
+        return True
+
+    def find_capture_region(self):
+        """The Cursor window's rectangle when the window can be located, else the monitor showing Cursor."""
+        if self.following_window():
+            region = self.window_locator.region()
+            self.logger.info(f"Capturing the Cursor window at {region}")
+            return region
+        return self.find_cursor_monitor()
+
+    def find_tracked(self, screen_gray):
+        """Matches of buttons found on earlier ticks, searched only around their predicted position.
+
+        A tracked button missing from its window stops being tracked, so the
+        full search picks it up again.
+        """
+        height, width = screen_gray.shape[:2]
+        matches = []
+        for template_path in self.tracker.keys():
+            template = self.matcher.load_template(template_path)
+            window = self.tracker.window(template_path, width, height) if template is not None else None
+            if window is None:
+                continue
+            x, y, w, h = window
+            match = self.matcher.find_template(screen_gray[y:y + h, x:x + w], template, self.confidence_threshold)
+            if match is None:
+                self.tracker.miss(template_path)
+                continue
+            match.update({'x': match['x'] + x, 'y': match['y'] + y, 'template': template_path})
+            self.tracker.update(template_path, match['x'] - match['width'] // 2, match['y'] - match['height'] // 2,
+                                match['width'], match['height'])
+            matches.append(match)
+        return matches
+
+    def accept_targets(self):
+        """Target class of the accept buttons: every image in images/ but the error indicators."""
+        template_dir = os.path.join(os.path.dirname(__file__), 'images')
+        indicators = self.error_handler.indicator_paths()
+        return TargetClass(ACCEPT, [path for path in self.matcher.template_paths(template_dir)
+                                    if path not in indicators])
+
+    def find_matches(self, result):
+        """Accept matches of a detection pass; the best clickable instance of each template starts a track."""
+        matches = [detection.to_match() for detection in result.of(ACCEPT)]
+        tracked = set()
+        for match in matches:
+            if match['confidence'] >= self.confidence_threshold and match['template'] not in tracked:
+                tracked.add(match['template'])
+                self.tracker.update(match['template'], match['x'] - match['width'] // 2,
+                                    match['y'] - match['height'] // 2, match['width'], match['height'])
+        return matches
+
     def process_matches(self, matches, screen):
         """Process and validate matches, handling clicks if appropriate."""
         try:
@@ -91,6 +174,8 @@ class ClickBot:
 
                 if current_time - self.last_click_time < self.click_cooldown:
                     self.logger.debug("Click cooldown active")
+                    # The button is still there; search again once the cooldown is over, changed or not
+                    self.change_gate.invalidate()
                     continue
 
                 self.logger.info(f"High confidence match found: {match['confidence']:.4f} "
@@ -102,18 +187,28 @@ class ClickBot:
                     self.matcher.draw_match(annotated, match)
                     save_debug_image(annotated, 'match', 'annotated_matches')
                 else:
-                    # Perform click
-                    pyautogui.click(match['x'], match['y'])
+                    # Perform click, in screen coordinates
+                    left, top = (self.capture_region['left'], self.capture_region['top']) \
+                        if self.capture_region else (0, 0)
+                    click_x, click_y = left + match['x'], top + match['y']
+                    pyautogui.click(click_x, click_y)
                     self.last_click_time = current_time
-                    self.logger.info(f"Clicked at ({match['x']}, {match['y']})")
+                    self.change_gate.invalidate()
+                    self.scheduler.notify_activity()
+                    self.logger.info(f"Clicked at ({click_x}, {click_y})")
 
         except Exception as e:
             log_error_with_context(self.logger, e, "Match processing failed")
 
-    def handle_error_state(self, screen):
-        """Handle potential error states and perform recovery if needed."""
+    def handle_error_state(self, result):
+        """Handle potential error states in a detection pass and perform recovery if needed.
+
+        Returns False only when an error state was found and recovery failed.
+        """
         try:
-            if self.error_handler.handle_error_case(screen):
+            if not self.error_handler.needs_recovery(result):
+                return True
+            if self.error_handler.perform_recovery():
                 self.logger.info("Error state handled successfully")
                 return True
             else:
@@ -129,42 +224,73 @@ class ClickBot:
         self.logger.info("Starting ClickBot")
         
         try:
-            monitor = self.find_cursor_monitor()
+            monitor = self.find_capture_region()
             if not monitor:
                 raise RuntimeError("Failed to find Cursor monitor")
+            self.capture_region = monitor
 
             last_monitor_check = time.time()
-            monitor_check_interval = 300  # Check monitor every 5 minutes
+            monitor_check_interval = 300  # Without layout events, check the monitor every 5 minutes
             
             while self.running:
                 try:
                     current_time = time.time()
                     
-                    # Periodically recheck monitor
-                    if current_time - last_monitor_check > monitor_check_interval:
-                        monitor = self.find_cursor_monitor()
+                    # Follow the Cursor window as it moves and the monitors as they change; without
+                    # either kind of event, periodically recheck the monitor
+                    window_changed = self.window_locator is not None and self.window_locator.poll()
+                    layout_changed = self.layout_changed()
+                    if monitor is None or window_changed or layout_changed or (
+                            self.layout_watcher is None and not self.following_window() and
+                            current_time - last_monitor_check > monitor_check_interval):
+                        monitor = self.find_capture_region()
+                        self.capture_region = monitor
                         if not monitor:
-                            raise RuntimeError("Lost Cursor monitor")
+                            # The window events are consumed, so keep looking on later ticks
+                            # rather than capturing the old rectangle
+                            self.logger.warning("Lost Cursor window and monitor; searching again")
+                            time.sleep(self.interval)
+                            continue
+                        # Tracked positions are relative to the old region
+                        self.tracker.forget()
                         last_monitor_check = current_time
                     
-                    # Capture screen and check for errors first
-                    screen = self.matcher.capture_screen(monitor)
+                    # Skip capture and detection while nothing has changed, unless a search is due anyway
+                    if not self.change_gate.pending() and self.matcher.capture.has_changed(monitor) is False:
+                        self.scheduler.wait()
+                        continue
+                    frame = self.matcher.capture_frame(monitor)
+                    if frame is None or not self.change_gate.should_search(frame.image):
+                        self.scheduler.wait()
+                        continue
+                    self.scheduler.notify_activity()
+                    
+                    screen = self.matcher.frame_to_image(frame)
+                    screen_gray = self.matcher.frame_to_gray(frame)
+                    
+                    # Buttons already being tracked are searched only around their predicted position;
+                    # one pass over the frame finds everything else, error indicators included
+                    tracked = self.find_tracked(screen_gray)
+                    result = self.detector.detect(screen_gray, exclude={match['template'] for match in tracked},
+                                                  origin=(frame.region['left'], frame.region['top']))
                     
                     # Handle any error states before proceeding
-                    if not self.handle_error_state(screen):
+                    if not self.handle_error_state(result):
                         self.logger.warning("Error state detected but recovery failed")
-                        time.sleep(self.interval)
+                        # Retry on the next tick even if the screen stays the same
+                        self.change_gate.invalidate()
+                        self.scheduler.wait()
                         continue
                     
-                    # Proceed with normal operation
-                    matches = self.matcher.find_all_matches(screen)
-                    self.process_matches(matches, screen)
+                    # Proceed with normal operation, tracked buttons first
+                    self.process_matches(tracked, screen)
+                    self.process_matches(self.find_matches(result), screen)
                     
                     # Status update every 30 seconds
                     if int(current_time) % 30 == 0:
                         self.logger.info("Bot running - monitoring for matches")
                     
-                    time.sleep(self.interval)
+                    self.scheduler.wait()
                     
                 except Exception as e:
                     log_error_with_context(self.logger, e, "Error in main loop")
@@ -185,19 +311,43 @@ class ClickBot:
         self.logger.info(f"Received signal {signum}")
         self.stop()
 
+def parse_region(text):
+    """Parse 'LEFT,TOP,WIDTH,HEIGHT' into a region dict."""
+    try:
+        left, top, width, height = (int(value) for value in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LEFT,TOP,WIDTH,HEIGHT, got '{text}'")
+    return {'left': left, 'top': top, 'width': width, 'height': height}
+
 def main():
     parser = argparse.ArgumentParser(description='ClickBot - Automated UI interaction')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--interval', type=float, default=3.0,
-                       help='Scan interval in seconds (default: 3.0)')
+                       help='Idle scan interval in seconds (default: 3.0)')
+    parser.add_argument('--burst-interval', type=float, default=0.1,
+                       help='Scan interval right after a screen change or click (default: 0.1)')
+    parser.add_argument('--cpu-budget', type=float, default=0.25,
+                       help='Maximum fraction of one CPU core to spend scanning (default: 0.25)')
+    parser.add_argument('--pyramid', action='store_true',
+                       help='Use coarse-to-fine pyramid search instead of full-resolution matching')
     parser.add_argument('--confidence', type=float, default=0.8,
                        help='Minimum confidence threshold (default: 0.8)')
+    parser.add_argument('--whole-monitor', action='store_true',
+                       help='Capture the whole monitor showing Cursor instead of only its window (X11)')
+    parser.add_argument('--error-region', type=parse_region, default=None, metavar='LEFT,TOP,WIDTH,HEIGHT',
+                       help='Area to look for error indicators in, e.g. the chat panel, in screen coordinates '
+                            '(default: everything captured)')
     args = parser.parse_args()
 
     bot = ClickBot(
         debug=args.debug,
         interval=args.interval,
-        confidence_threshold=args.confidence
+        confidence_threshold=args.confidence,
+        burst_interval=args.burst_interval,
+        cpu_budget=args.cpu_budget,
+        pyramid=args.pyramid,
+        error_region=args.error_region,
+        window_capture=not args.whole_monitor
     )
     
     try:
@@ -0,0 +1,142 @@
+import numpy as np
+import cv2
+
+# SSIM constants for 8-bit images (Wang et al. 2004)
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def structural_similarity(a, b):
+    """Mean SSIM of two equally sized grayscale images, over 11x11 Gaussian windows (sigma 1.5)."""
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    blur = lambda image: cv2.GaussianBlur(image, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    mu_aa, mu_bb, mu_ab = mu_a * mu_a, mu_b * mu_b, mu_a * mu_b
+    var_a = blur(a * a) - mu_aa
+    var_b = blur(b * b) - mu_bb
+    cov = blur(a * b) - mu_ab
+    ssim_map = ((2 * mu_ab + SSIM_C1) * (2 * cov + SSIM_C2)) / ((mu_aa + mu_bb + SSIM_C1) * (var_a + var_b + SSIM_C2))
+    return float(ssim_map.mean())
+
+
+def edge_similarity(a, b):
+    """Dice overlap of the Canny edges of two equally sized grayscale images (1.0 when neither has edges)."""
+    edges_a = cv2.Canny(a, 50, 150) > 0
+    edges_b = cv2.Canny(b, 50, 150) > 0
+    total = np.count_nonzero(edges_a) + np.count_nonzero(edges_b)
+    if total == 0:
+        return 1.0
+    # Anti-aliasing moves edges by a pixel; count an edge as shared if the other image has one next to it
+    kernel = np.ones((3, 3), np.uint8)
+    near_a = cv2.dilate(edges_a.astype(np.uint8), kernel) > 0
+    near_b = cv2.dilate(edges_b.astype(np.uint8), kernel) > 0
+    shared = np.count_nonzero(edges_a & near_b) + np.count_nonzero(edges_b & near_a)
+    return shared / total
+
+
+def histogram_similarity(a, b, bins=8):
+    """Correlation of the colour histograms of two BGR images, clipped to 0..1."""
+    sizes = [bins] * 3
+    hist_a = cv2.calcHist([a], [0, 1, 2], None, sizes, [0, 256] * 3)
+    hist_b = cv2.calcHist([b], [0, 1, 2], None, sizes, [0, 256] * 3)
+    return max(0.0, float(cv2.compareHist(hist_a, hist_b, cv2.HISTCMP_CORREL)))
+
+
+# Weights of the ClickBot ranking score, in the order the score adds them up
+SSIM_WEIGHT = 0.4
+CONFIDENCE_WEIGHT = 0.3
+EDGE_WEIGHT = 0.2
+HISTOGRAM_WEIGHT = 0.1
+# Slack for rounding when comparing score bounds, so exact ties are never pruned
+BOUND_EPSILON = 1e-9
+
+
+class MatchQuality:
+    """How closely a matched screen patch resembles the target, beyond correlation.
+
+    Every score is in 0..1 (SSIM in -1..1), higher meaning more alike. Each
+    is computed on first access only, so a ranking can stop before the
+    expensive ones.
+    """
+
+    def __init__(self, patch_bgr, patch_gray, target):
+        self.patch_bgr = patch_bgr
+        self.patch_gray = patch_gray
+        self.target = target
+        self._scores = {}
+
+    def _score(self, name, compute):
+        if name not in self._scores:
+            self._scores[name] = compute()
+        return self._scores[name]
+
+    @property
+    def histogram_similarity(self):
+        return self._score('histogram', lambda: histogram_similarity(self.patch_bgr, self.target.bgr))
+
+    @property
+    def edge_similarity(self):
+        return self._score('edges', lambda: edge_similarity(self.patch_gray, self.target.gray))
+
+    @property
+    def structural_similarity(self):
+        return self._score('ssim', lambda: structural_similarity(self.patch_gray, self.target.gray))
+
+    def __repr__(self):
+        scores = ', '.join(f"{name}={value:.3f}" for name, value in self._scores.items())
+        return f"MatchQuality({scores})"
+
+
+def quality_score(match):
+    """Weighted ranking score of a match; evaluates every quality metric."""
+    return (match.quality.structural_similarity * SSIM_WEIGHT +
+            match.confidence * CONFIDENCE_WEIGHT +
+            match.quality.edge_similarity * EDGE_WEIGHT +
+            match.quality.histogram_similarity * HISTOGRAM_WEIGHT)
+
+
+def rank_matches(matches, count=1):
+    """The count best matches by quality_score(), best first, as a full stable sort would order them.
+
+    Metrics are evaluated cheapest first (histogram, then edges), keeping
+    for each match the range its score can still end up in. Matches whose
+    best possible score is below the count-th best worst possible score are
+    dropped before their next metric, and SSIM is computed only while a
+    remaining match could still make the top count. count=None ranks all.
+    """
+    if count is None or count >= len(matches):
+        return sorted(matches, key=quality_score, reverse=True)
+    if count <= 0:
+        return []
+
+    # Unknown SSIM lies in -1..1, unknown edge and histogram scores in 0..1
+    low = {id(m): m.confidence * CONFIDENCE_WEIGHT - SSIM_WEIGHT for m in matches}
+    high = {id(m): m.confidence * CONFIDENCE_WEIGHT + SSIM_WEIGHT + EDGE_WEIGHT + HISTOGRAM_WEIGHT
+            for m in matches}
+
+    def prune(candidates):
+        cutoff = sorted((low[id(m)] for m in candidates), reverse=True)[count - 1]
+        return [m for m in candidates if high[id(m)] >= cutoff - BOUND_EPSILON]
+
+    candidates = prune(matches)
+    for weight, metric in ((HISTOGRAM_WEIGHT, 'histogram_similarity'), (EDGE_WEIGHT, 'edge_similarity')):
+        for m in candidates:
+            value = getattr(m.quality, metric) * weight
+            low[id(m)] += value
+            high[id(m)] += value - weight
+        candidates = prune(candidates)
+
+    # SSIM for the most promising matches first, until no other one can make the top count
+    scored = []
+    for m in sorted(candidates, key=lambda m: high[id(m)], reverse=True):
+        if len(scored) >= count:
+            cutoff = sorted((score for score, _ in scored), reverse=True)[count - 1]
+            if high[id(m)] < cutoff - BOUND_EPSILON:
+                break
+        scored.append((quality_score(m), m))
+    # Stable sort in the original order, so ties rank as they would in a full sort
+    order = {id(m): index for index, m in enumerate(matches)}
+    scored.sort(key=lambda item: order[id(item[1])])
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [m for _, m in scored[:count]]
@@ -0,0 +1,213 @@
+import json
+import logging
+from pathlib import Path
+import numpy as np
+import cv2
+from correlation_engine import CorrelationEngine
+from template_bank import TemplateBank
+
+# Matching methods and their thresholds tried on every tick; for SQDIFF lower is better
+DEFAULT_MATCH_METHODS = [
+    (cv2.TM_CCOEFF_NORMED, 0.6),
+    (cv2.TM_CCORR_NORMED, 0.8),
+    (cv2.TM_SQDIFF_NORMED, 0.2)
+]
+
+# Cheapest first: CCORR only scales the correlation by the window norms, SQDIFF
+# also needs the window energy, CCOEFF subtracts every channel's window sum
+METRIC_COST_ORDER = (cv2.TM_CCORR_NORMED, cv2.TM_SQDIFF_NORMED, cv2.TM_CCOEFF_NORMED)
+
+METHOD_NAMES = {
+    cv2.TM_CCOEFF_NORMED: 'TM_CCOEFF_NORMED',
+    cv2.TM_CCORR_NORMED: 'TM_CCORR_NORMED',
+    cv2.TM_SQDIFF_NORMED: 'TM_SQDIFF_NORMED'
+}
+
+METRIC_FILE = 'metric.json'  # Written by earlier versions; import_assets() moves it into the pack
+HOVER_SCREEN_FILE = 'screen_hover.png'
+AFTER_SCREEN_FILE = 'screen_after.png'
+
+
+def to_confidence(method, value):
+    """Score in higher-is-better units; SQDIFF values are flipped (the mapping is its own inverse)."""
+    return 1.0 - value if method == cv2.TM_SQDIFF_NORMED else value
+
+
+def pick_match(peaks, method_thresholds):
+    """Best (confidence, location) among the methods whose peak clears its threshold, or None.
+
+    peaks maps method -> (value, location) as returned by
+    CorrelationEngine.peaks(); thresholds are in each method's own units, as
+    in DEFAULT_MATCH_METHODS.
+    """
+    best = None
+    for method, threshold in method_thresholds:
+        value, loc = peaks[method]
+        confidence = to_confidence(method, value)
+        if confidence > to_confidence(method, threshold) and (best is None or confidence > best[0]):
+            best = (confidence, loc)
+    return best
+
+
+class MetricChoice:
+    """The single matching method and threshold (in confidence units) calibrated for one monitor."""
+
+    def __init__(self, method, threshold, margin):
+        self.method = method
+        self.threshold = threshold
+        self.margin = margin  # Weakest button score minus strongest background score
+
+    @property
+    def name(self):
+        return METHOD_NAMES[self.method]
+
+    def match_methods(self):
+        """The choice as a one-entry method list in the format of DEFAULT_MATCH_METHODS."""
+        return [(self.method, to_confidence(self.method, self.threshold))]
+
+    def to_dict(self):
+        return {'method': self.name, 'threshold': self.threshold, 'margin': self.margin}
+
+    @classmethod
+    def from_dict(cls, data):
+        """The choice saved by to_dict(); raises KeyError, TypeError or ValueError if data is invalid."""
+        methods = {name: method for method, name in METHOD_NAMES.items()}
+        return cls(methods[data['method']], float(data['threshold']), float(data['margin']))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved choice, or return None if the file is missing or invalid."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                return cls.from_dict(json.load(f))
+        except (ValueError, KeyError, TypeError) as e:
+            logging.getLogger('metric_calibration').warning(f"Ignoring invalid metric file {path}: {e}")
+            return None
+
+    def __repr__(self):
+        return f"MetricChoice({self.name}, threshold={self.threshold:.3f}, margin={self.margin:.3f})"
+
+
+class MetricCalibrator:
+    """Picks the cheapest metric that separates the button from everything else on screen.
+
+    Positives are (image, (x, y)) pairs with the button's top-left corner in
+    the image; negatives are (image, exclude) pairs where exclude is None or
+    the (x, y) of a button whose overlapping positions are ignored. A metric
+    qualifies when its weakest positive score beats its strongest negative
+    score by min_margin; its threshold sits halfway between, or at the
+    method's default threshold when that is looser and still clears the
+    negatives by half the margin.
+    """
+
+    def __init__(self, engine=None, min_margin=0.05, tolerance=2, default_methods=DEFAULT_MATCH_METHODS):
+        self.logger = logging.getLogger('metric_calibration')
+        self.engine = engine or CorrelationEngine()
+        self.min_margin = min_margin
+        self.tolerance = tolerance  # Pixels a positive's peak may sit from its recorded location
+        self.defaults = {method: to_confidence(method, threshold) for method, threshold in default_methods}
+
+    def _confidence_maps(self, image, template):
+        scores = self.engine.scores(self.engine.prepare(image), template, METRIC_COST_ORDER)
+        if scores is None:
+            return None
+        return {method: (1.0 - result if method == cv2.TM_SQDIFF_NORMED else result)
+                for method, result in scores.items()}
+
+    def separations(self, template, positives, negatives):
+        """Per method, the (weakest positive, strongest negative) confidence."""
+        weakest = {method: np.inf for method in METRIC_COST_ORDER}
+        strongest = {method: -np.inf for method in METRIC_COST_ORDER}
+        t = self.tolerance
+        for image, (x, y) in positives:
+            maps = self._confidence_maps(image, template)
+            if maps is None:
+                continue
+            for method, confidence in maps.items():
+                window = confidence[max(0, y - t):y + t + 1, max(0, x - t):x + t + 1]
+                if window.size:
+                    weakest[method] = min(weakest[method], float(window.max()))
+        for image, exclude in negatives:
+            maps = self._confidence_maps(image, template)
+            if maps is None:
+                continue
+            for method, confidence in maps.items():
+                if exclude is not None:
+                    x, y = exclude
+                    confidence = confidence.copy()
+                    confidence[max(0, y - template.height + 1):y + template.height,
+                               max(0, x - template.width + 1):x + template.width] = -np.inf
+                strongest[method] = max(strongest[method], float(confidence.max()))
+        return {method: (weakest[method], strongest[method]) for method in METRIC_COST_ORDER}
+
+    def choose(self, template, positives, negatives):
+        """The cheapest qualifying MetricChoice, or None if no single metric separates the samples."""
+        if not positives or not negatives:
+            return None
+        separations = self.separations(template, positives, negatives)
+        for method in METRIC_COST_ORDER:
+            weakest, strongest = separations[method]
+            if not (np.isfinite(weakest) and np.isfinite(strongest)):
+                continue
+            margin = weakest - strongest
+            self.logger.debug(f"{METHOD_NAMES[method]}: button {weakest:.3f}, background {strongest:.3f}")
+            if margin < self.min_margin:
+                continue
+            threshold = (weakest + strongest) / 2
+            default = self.defaults.get(method)
+            if default is not None and strongest + self.min_margin / 2 <= default < threshold:
+                threshold = default
+            return MetricChoice(method, threshold, margin)
+        return None
+
+
+def load_recording(monitor_assets, template_bank=None):
+    """Calibration recording of a monitor, or None if it was calibrated without one.
+
+    Returns (template, after_img, hover_screen, after_screen, location) where
+    location is the button's top-left corner in hover_screen.
+    """
+    monitor_assets = Path(monitor_assets)
+    hover_file = monitor_assets / 'accept_button.png'
+    files = [hover_file, monitor_assets / 'accept_after.png',
+             monitor_assets / HOVER_SCREEN_FILE, monitor_assets / AFTER_SCREEN_FILE]
+    if not all(f.exists() for f in files):
+        return None
+    template = (template_bank or TemplateBank()).get(hover_file, expected_size=(80, 40))
+    after_img, hover_screen, after_screen = (cv2.imread(str(f)) for f in files[1:])
+    if template is None or after_img is None or hover_screen is None or after_screen is None:
+        return None
+    return locate_recording(template, after_img, hover_screen, after_screen)
+
+
+def locate_recording(template, after_img, hover_screen, after_screen):
+    """Recording tuple of load_recording() from images already in memory."""
+    # The hover crop was cut from this screen moments earlier, so it is the best SQDIFF match
+    location = cv2.minMaxLoc(cv2.matchTemplate(hover_screen, template.bgr, cv2.TM_SQDIFF))[2]
+    return template, after_img, hover_screen, after_screen, location
+
+
+def calibrate_monitor(monitor_assets, calibrator=None, template_bank=None, recording=None):
+    """Choose the single metric for a calibrated monitor.
+
+    The recording is read from monitor_assets unless given. Returns the
+    MetricChoice, or None when there is no recording or no single metric
+    separates the button from the rest of the screen. Nothing is written;
+    callers keep the choice in the monitor's calibration pack.
+    """
+    if recording is None:
+        recording = load_recording(monitor_assets, template_bank)
+    if recording is None:
+        return None
+    template, after_img, hover_screen, after_screen, location = recording
+    calibrator = calibrator or MetricCalibrator()
+    return calibrator.choose(template,
+                             positives=[(hover_screen, location)],
+                             negatives=[(hover_screen, location), (after_screen, None), (after_img, None)])
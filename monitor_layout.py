@@ -0,0 +1,120 @@
+import os
+import sys
+import ctypes
+import logging
+from x11_capture import (X11CaptureError, XEvent, X_ERROR_HANDLER, _load_library, add_error_listener,
+                         remove_error_listener)
+
+# Xlib and RandR constants
+STRUCTURE_NOTIFY_MASK = 1 << 17
+RR_SCREEN_CHANGE_NOTIFY_MASK = 1 << 0
+RR_CRTC_CHANGE_NOTIFY_MASK = 1 << 1
+RR_OUTPUT_CHANGE_NOTIFY_MASK = 1 << 2
+RR_SCREEN_CHANGE_NOTIFY = 0  # Offset from the extension's event base
+
+
+def monitor_layout(monitors):
+    """Comparable layout of a monitor list: (left, top, width, height) of each monitor, in order."""
+    return [(m['left'], m['top'], m['width'], m['height']) for m in monitors]
+
+
+class MonitorLayoutWatcher:
+    """Tells when monitors were plugged, unplugged, moved or resized, from X11 events.
+
+    With the RandR extension it subscribes to screen, CRTC and output change
+    notifications on the root window; without libXrandr, to the root
+    window's ConfigureNotify, which still reports every change of the
+    overall screen size. ``poll()`` drains the events without blocking, so
+    callers re-read the monitor geometry only after something happened.
+    """
+
+    def __init__(self, display_name=None):
+        self.logger = logging.getLogger('monitor_layout')
+        self.display = None
+        self.randr = False
+        self._randr_event_base = None
+
+        if not sys.platform.startswith('linux'):
+            raise X11CaptureError("Monitor layout events are only available on X11")
+        display_name = display_name or os.environ.get('DISPLAY')
+        if not display_name:
+            raise X11CaptureError("DISPLAY is not set")
+
+        self.x11 = _load_library('X11')
+        self.xrandr = _load_library('Xrandr', required=False)
+        self._declare_functions()
+        self.display = self.x11.XOpenDisplay(display_name.encode())
+        if not self.display:
+            raise X11CaptureError(f"Cannot open display {display_name}")
+        add_error_listener(self.x11, self._on_x_error)
+
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        if self.xrandr is not None:
+            event_base, error_base = ctypes.c_int(), ctypes.c_int()
+            if self.xrandr.XRRQueryExtension(self.display, ctypes.byref(event_base), ctypes.byref(error_base)):
+                self._randr_event_base = event_base.value
+                self.xrandr.XRRSelectInput(self.display, self.root, RR_SCREEN_CHANGE_NOTIFY_MASK |
+                                           RR_CRTC_CHANGE_NOTIFY_MASK | RR_OUTPUT_CHANGE_NOTIFY_MASK)
+                self.randr = True
+        if not self.randr:
+            self.logger.info("RandR not available; only screen size changes will be reported")
+            self.x11.XSelectInput(self.display, self.root, STRUCTURE_NOTIFY_MASK)
+        self.x11.XFlush(self.display)
+
+    def _declare_functions(self):
+        x11 = self.x11
+        vp, ul, i = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int
+
+        x11.XOpenDisplay.restype = vp
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [vp]
+        x11.XDefaultScreen.argtypes = [vp]
+        x11.XRootWindow.restype = ul
+        x11.XRootWindow.argtypes = [vp, i]
+        x11.XSelectInput.argtypes = [vp, ul, ctypes.c_long]
+        x11.XFlush.argtypes = [vp]
+        x11.XPending.argtypes = [vp]
+        x11.XNextEvent.argtypes = [vp, ctypes.POINTER(XEvent)]
+        x11.XSetErrorHandler.restype = vp
+        x11.XSetErrorHandler.argtypes = [X_ERROR_HANDLER]
+
+        if self.xrandr is not None:
+            xrandr = self.xrandr
+            xrandr.XRRQueryExtension.argtypes = [vp, ctypes.POINTER(i), ctypes.POINTER(i)]
+            xrandr.XRRSelectInput.restype = None
+            xrandr.XRRSelectInput.argtypes = [vp, ul, i]
+            xrandr.XRRUpdateConfiguration.argtypes = [ctypes.POINTER(XEvent)]
+
+    def _on_x_error(self, display, event):
+        if display == self.display:
+            self.logger.debug("X error on the monitor layout connection")
+
+    def poll(self):
+        """Process pending X events; True when any of them may have changed the monitor layout."""
+        changed = False
+        event = XEvent()
+        while self.x11.XPending(self.display):
+            self.x11.XNextEvent(self.display, ctypes.byref(event))
+            if self.randr and event.type == self._randr_event_base + RR_SCREEN_CHANGE_NOTIFY:
+                # Keeps Xlib's idea of the screen size on this connection current
+                self.xrandr.XRRUpdateConfiguration(ctypes.byref(event))
+            changed = True
+        if changed:
+            self.logger.debug("Monitor layout events received")
+        return changed
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+        remove_error_listener(self._on_x_error)
+
+
+def create_watcher(display_name=None):
+    """A MonitorLayoutWatcher, or None when no X11 display can be used."""
+    try:
+        return MonitorLayoutWatcher(display_name)
+    except (X11CaptureError, OSError) as e:
+        logging.getLogger('monitor_layout').info(f"Monitor layout events unavailable ({str(e)})")
+        return None
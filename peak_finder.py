@@ -0,0 +1,59 @@
+import numpy as np
+import cv2
+
+
+def non_max_suppression(locations, box_size, overlap=0.3, max_keep=None):
+    """Greedy box NMS over equally sized boxes, given best-first.
+
+    locations is an (N, 2) array of box top-left corners sorted by score;
+    returns the indices of the boxes kept (at most max_keep), in the same
+    order. A box is dropped when its intersection-over-union with a kept one
+    exceeds overlap.
+    """
+    width, height = box_size
+    area = float(width * height)
+    locations = np.asarray(locations, dtype=np.int64).reshape(-1, 2)
+    remaining = np.arange(len(locations))
+    keep = []
+    while remaining.size and (max_keep is None or len(keep) < max_keep):
+        best = remaining[0]
+        keep.append(int(best))
+        rest = remaining[1:]
+        # Equal boxes intersect in (size - |offset|) along each axis
+        ix = np.clip(width - np.abs(locations[rest, 0] - locations[best, 0]), 0, None)
+        iy = np.clip(height - np.abs(locations[rest, 1] - locations[best, 1]), 0, None)
+        intersection = ix * iy
+        iou = intersection / (2 * area - intersection)
+        remaining = rest[iou <= overlap]
+    return keep
+
+
+def find_peaks(result, threshold, box_size, max_peaks=10, lower_is_better=False, overlap=0.3,
+               neighbourhood=3, max_candidates=1024):
+    """Every distinct instance in a match result map, best first.
+
+    Local maxima (points equal to the dilated map) that clear threshold are
+    ranked with argpartition, and overlapping template boxes of box_size
+    (width, height) are merged by NMS. Returns up to max_peaks
+    ``(value, (x, y))`` pairs in the map's own units; for SQDIFF maps pass
+    lower_is_better=True, and values below threshold count instead.
+    """
+    scores = np.asarray(result, dtype=np.float32)
+    if lower_is_better:
+        scores, threshold = -scores, -threshold
+    kernel = np.ones((neighbourhood, neighbourhood), np.uint8)
+    peaks = (scores >= cv2.dilate(scores, kernel)) & (scores >= threshold)
+    ys, xs = np.nonzero(peaks)
+    if not len(ys):
+        return []
+
+    values = scores[ys, xs]
+    if len(values) > max_candidates:
+        top = np.argpartition(values, -max_candidates)[-max_candidates:]
+        ys, xs, values = ys[top], xs[top], values[top]
+    order = np.argsort(-values, kind='stable')
+    locations = np.stack([xs[order], ys[order]], axis=1)
+    keep = non_max_suppression(locations, box_size, overlap, max_peaks)
+
+    sign = -1.0 if lower_is_better else 1.0
+    return [(sign * float(values[order[i]]), (int(locations[i, 0]), int(locations[i, 1]))) for i in keep]
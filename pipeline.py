@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+from collections import deque
+from queue import Empty
+from scan_scheduler import ScanScheduler
+
+
+class LatestQueue:
+    """Bounded queue that never blocks producers: when full, the oldest item is dropped."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = max(1, maxsize)
+        self._items = deque()
+        self._not_empty = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Enqueue an item, dropping the oldest one if the queue is full. Returns the dropped item or None."""
+        with self._not_empty:
+            dropped = None
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._not_empty.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        """Dequeue the oldest item, raising queue.Empty if none arrives within timeout."""
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._items, timeout):
+                raise Empty
+            return self._items.popleft()
+
+    def clear(self):
+        """Empty the queue and return the items that were in it."""
+        with self._not_empty:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+
+class DetectionPipeline:
+    """Capture, detection and actuation stages on their own threads, linked by LatestQueues.
+
+    ``capture_fn()`` returns a work item or None, ``detect_fn(item)`` returns
+    a result or None and ``act_fn(result)`` performs it. Captures are paced
+    by a ScanScheduler: a captured item or a performed action counts as
+    activity and bursts the capture rate. Both queues drop their oldest
+    entry, so a slow scan or click never stalls capture, and detection
+    always works on the freshest frame. ``release_fn(item)``, when given,
+    is called once for every captured item when the pipeline is done with
+    it: after detection, or when it was dropped or never queued.
+    """
+
+    def __init__(self, capture_fn, detect_fn, act_fn, capture_interval=0.2, queue_size=1, name='pipeline',
+                 scheduler=None, release_fn=None):
+        self.logger = logging.getLogger(name)
+        self.capture_fn = capture_fn
+        self.detect_fn = detect_fn
+        self.act_fn = act_fn
+        self.release_fn = release_fn
+        self.capture_interval = capture_interval
+        # Without a scheduler, capture at a fixed interval
+        self.scheduler = scheduler or ScanScheduler(capture_interval, capture_interval, cpu_budget=None)
+        self.name = name
+        self.frames = LatestQueue(queue_size)
+        self.actions = LatestQueue(queue_size)
+        self.stop_event = threading.Event()
+        self.threads = []
+
+        self.captured = 0
+        self.detected = 0
+        self.acted = 0
+        self.stale_actions = 0
+        self.errors = 0
+        self._last_action_end = 0.0
+
+    def start(self):
+        """Start the three stage threads.
+
+        Every run gets its own stop event: stage threads of an earlier run
+        that stop() gave up waiting for (e.g. while verifying a click) exit
+        once their current step ends, instead of running on beside the new
+        ones.
+        """
+        self.stop_event = threading.Event()
+        self._release_all(self.frames.clear())
+        self.actions.clear()
+        self._last_action_end = 0.0
+        self.threads = [
+            threading.Thread(target=self._run_stage, args=(stage, self.stop_event), name=f"{self.name}-{stage.__name__.strip('_')}",
+                             daemon=True)
+            for stage in (self._capture, self._detect, self._act)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """Signal the stages to stop and wait for them to finish."""
+        self.stop_event.set()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+                if thread.is_alive():
+                    self.logger.warning(f"{thread.name} is still busy; it exits when its current step ends")
+        self.threads = []
+        self._release_all(self.frames.clear())
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def stats(self):
+        """Counters for observing backpressure between the stages."""
+        return {
+            'captured': self.captured,
+            'detected': self.detected,
+            'acted': self.acted,
+            'frame_queue_depth': self.frames.depth,
+            'action_queue_depth': self.actions.depth,
+            'dropped_frames': self.frames.dropped,
+            'dropped_actions': self.actions.dropped,
+            'stale_actions': self.stale_actions,
+            'errors': self.errors
+        }
+
+    def _release(self, item):
+        if self.release_fn is not None:
+            self.release_fn(item)
+
+    def _release_all(self, queued):
+        for captured_at, item in queued:
+            self._release(item)
+
+    def _run_stage(self, stage, stop_event):
+        while not stop_event.is_set():
+            try:
+                stage(stop_event)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"{threading.current_thread().name} error: {str(e)}")
+                stop_event.wait(self.capture_interval)
+
+    def _capture(self, stop_event):
+        started = time.time()
+        item = self.capture_fn()
+        if item is not None:
+            if stop_event.is_set():
+                self._release(item)
+            else:
+                self.captured += 1
+                self.scheduler.notify_activity()
+                dropped = self.frames.put((started, item))
+                if dropped is not None:
+                    self._release(dropped[1])
+        self.scheduler.wait(stop_event)
+
+    def _detect(self, stop_event):
+        try:
+            captured_at, item = self.frames.get(timeout=0.1)
+        except Empty:
+            return
+        try:
+            result = self.detect_fn(item)
+        finally:
+            self._release(item)
+        # A stopped run's late result must not reach the next run's actuation stage
+        if result is not None and not stop_event.is_set():
+            self.detected += 1
+            self.actions.put((captured_at, result))
+
+    def _act(self, stop_event):
+        try:
+            captured_at, result = self.actions.get(timeout=0.1)
+        except Empty:
+            return
+        # Frames captured before the previous action finished may show a button that is already gone
+        if captured_at < self._last_action_end:
+            self.stale_actions += 1
+            return
+        try:
+            if self.act_fn(result):
+                self.acted += 1
+                self.scheduler.notify_activity()
+        finally:
+            self._last_action_end = time.time()
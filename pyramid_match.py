@@ -0,0 +1,101 @@
+import numpy as np
+import cv2
+from peak_finder import find_peaks, non_max_suppression
+
+
+def pyramid_levels(template_shape, max_levels=2, min_template_side=10):
+    """Number of halvings the template can take while keeping its shorter side >= min_template_side."""
+    levels = 0
+    side = min(template_shape[:2])
+    while levels < max_levels and side // 2 >= min_template_side:
+        side //= 2
+        levels += 1
+    return levels
+
+
+class PyramidMatcher:
+    """Coarse-to-fine template search.
+
+    The frame and template are reduced with ``cv2.pyrDown``, the top_k peaks
+    of the coarse correlation map are kept and each one is re-matched at full
+    resolution in a window of ``margin`` pixels around its upscaled position.
+    Returns the same ``(value, (x, y))`` a full-resolution ``minMaxLoc`` would
+    report for the best location (the minimum for SQDIFF methods). Callers
+    that keep templates compiled can pass the pre-reduced levels in
+    ``template_pyramid`` (index i holding level i + 1).
+    """
+
+    def __init__(self, max_levels=2, top_k=5, margin=4, min_template_side=10):
+        self.max_levels = max_levels
+        self.top_k = top_k
+        self.margin = margin
+        self.min_template_side = min_template_side
+
+    def match(self, image, template, method=cv2.TM_CCOEFF_NORMED, template_pyramid=None):
+        lower_is_better = method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+        refined = self._refine(image, template, method, self.top_k, template_pyramid)
+        if not refined:
+            return self._best(cv2.matchTemplate(image, template, method), lower_is_better, (0, 0))
+        return min(refined, key=lambda peak: peak[0]) if lower_is_better else max(refined, key=lambda peak: peak[0])
+
+    def match_all(self, image, template, method=cv2.TM_CCOEFF_NORMED, threshold=0.8, max_matches=10,
+                  template_pyramid=None):
+        """Every distinct instance past threshold, best first, as ``(value, (x, y))`` pairs."""
+        lower_is_better = method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+        template_h, template_w = template.shape[:2]
+        refined = self._refine(image, template, method, max(self.top_k, 2 * max_matches), template_pyramid)
+        if not refined:
+            return find_peaks(cv2.matchTemplate(image, template, method), threshold, (template_w, template_h),
+                              max_matches, lower_is_better)
+        refined = [peak for peak in refined if (peak[0] <= threshold if lower_is_better else peak[0] >= threshold)]
+        refined.sort(key=lambda peak: peak[0], reverse=not lower_is_better)
+        keep = non_max_suppression([loc for value, loc in refined], (template_w, template_h), max_keep=max_matches)
+        return [refined[i] for i in keep]
+
+    def _refine(self, image, template, method, top_k, template_pyramid):
+        """Full-resolution peaks around the top_k coarse peaks, or None when the pyramid cannot be used."""
+        template_h, template_w = template.shape[:2]
+        image_h, image_w = image.shape[:2]
+        lower_is_better = method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+
+        levels = pyramid_levels(template.shape, self.max_levels, self.min_template_side)
+        if levels == 0:
+            return None
+
+        small_image = image
+        for _ in range(levels):
+            small_image = cv2.pyrDown(small_image)
+        if template_pyramid is not None and len(template_pyramid) >= levels:
+            small_template = template_pyramid[levels - 1]
+        else:
+            small_template = template
+            for _ in range(levels):
+                small_template = cv2.pyrDown(small_template)
+        if (small_image.shape[0] < small_template.shape[0] or small_image.shape[1] < small_template.shape[1]):
+            return None
+
+        coarse = cv2.matchTemplate(small_image, small_template, method)
+        small_h, small_w = small_template.shape[:2]
+        candidates = find_peaks(coarse, np.inf if lower_is_better else -np.inf, (small_w, small_h), top_k,
+                                lower_is_better, overlap=0.1)
+
+        scale = 2 ** levels
+        pad = scale + self.margin
+        refined = []
+        for value, (cx, cy) in candidates:
+            # Full-resolution window covering every position that rounds to this coarse cell
+            x0 = max(0, cx * scale - pad)
+            y0 = max(0, cy * scale - pad)
+            x1 = min(image_w, cx * scale + pad + template_w)
+            y1 = min(image_h, cy * scale + pad + template_h)
+            if x1 - x0 < template_w or y1 - y0 < template_h:
+                continue
+            result = cv2.matchTemplate(image[y0:y1, x0:x1], template, method)
+            refined.append(self._best(result, lower_is_better, (x0, y0)))
+        return refined or None
+
+    @staticmethod
+    def _best(result, lower_is_better, offset):
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        value, loc = (min_val, min_loc) if lower_is_better else (max_val, max_loc)
+        return value, (loc[0] + offset[0], loc[1] + offset[1])
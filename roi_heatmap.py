@@ -0,0 +1,134 @@
+import time
+import logging
+from pathlib import Path
+import numpy as np
+import cv2
+
+
+class RoiHeatmap:
+    """Persisted per-monitor heatmap of where accept buttons were found.
+
+    The monitor is divided into cells. Every successful match adds heat to
+    the cells under the matched box. Searches are restricted to the hot
+    regions, with a full-frame scan every ``full_scan_every`` ticks or after
+    ``miss_streak_limit`` consecutive misses. New heat is written to disk at
+    most once per ``save_interval`` seconds, and by ``flush()``.
+    """
+
+    def __init__(self, path, width, height, cell_size=32, margin_cells=2,
+                 full_scan_every=25, miss_streak_limit=10, min_heat=0.05, save_interval=30.0,
+                 clock=time.monotonic):
+        self.logger = logging.getLogger('roi_heatmap')
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.margin_cells = margin_cells  # Cells of slack around hot regions
+        self.full_scan_every = full_scan_every
+        self.miss_streak_limit = miss_streak_limit
+        self.min_heat = min_heat  # Cells below this fraction of the hottest cell are ignored
+        self.save_interval = save_interval
+        self.clock = clock
+        self.ticks = 0
+        self.miss_streak = 0
+        self.dirty = False  # Heat recorded since the last save
+        self._saved_at = clock()
+
+        shape = (-(-height // cell_size), -(-width // cell_size))
+        self.grid = np.zeros(shape, dtype=np.float32)
+        self.load()
+
+    def load(self):
+        """Load the heatmap from disk if it matches the monitor geometry."""
+        if not self.path.exists():
+            return
+        try:
+            grid = np.load(self.path)
+            if grid.shape == self.grid.shape:
+                self.grid = grid.astype(np.float32)
+                self.logger.info(f"Loaded ROI heatmap {self.path} ({int(self.grid.sum())} hits)")
+            else:
+                self.logger.warning(f"Ignoring ROI heatmap {self.path}: monitor geometry changed")
+        except Exception as e:
+            self.logger.warning(f"Failed to load ROI heatmap {self.path}: {str(e)}")
+
+    def save(self):
+        """Persist the heatmap next to the monitor's calibration assets."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(self.path, self.grid)
+        self.dirty = False
+        self._saved_at = self.clock()
+
+    def flush(self):
+        """Save the heatmap if heat was recorded since the last save, e.g. when the bot stops."""
+        if self.dirty:
+            self.save()
+
+    def record(self, x, y, width, height):
+        """Add heat for a match box given in monitor-relative pixels."""
+        x0, y0 = max(0, x // self.cell_size), max(0, y // self.cell_size)
+        x1 = min(self.grid.shape[1], (x + width - 1) // self.cell_size + 1)
+        y1 = min(self.grid.shape[0], (y + height - 1) // self.cell_size + 1)
+        self.grid[y0:y1, x0:x1] += 1
+        self.dirty = True
+        # Matches run on the hot path; disk writes are batched
+        if self.clock() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def regions(self, min_width=0, min_height=0):
+        """Return hot regions as (x, y, width, height) rects, hottest first."""
+        if not self.grid.any():
+            return []
+
+        hot = (self.grid >= self.grid.max() * self.min_heat) & (self.grid > 0)
+        if self.margin_cells:
+            size = 2 * self.margin_cells + 1
+            hot = cv2.dilate(hot.astype(np.uint8), np.ones((size, size), np.uint8)) > 0
+
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(hot.astype(np.uint8), connectivity=8)
+        regions = []
+        for label in range(1, count):
+            cx, cy, cw, ch = stats[label, :4]
+            heat = self.grid[labels == label].sum()
+            x, y = cx * self.cell_size, cy * self.cell_size
+            w = min(cw * self.cell_size, self.width - x)
+            h = min(ch * self.cell_size, self.height - y)
+
+            # Grow regions that are smaller than the template so matching is possible
+            if w < min_width:
+                x = max(0, min(x - (min_width - w) // 2, self.width - min_width))
+                w = min(min_width, self.width)
+            if h < min_height:
+                y = max(0, min(y - (min_height - h) // 2, self.height - min_height))
+                h = min(min_height, self.height)
+            regions.append((heat, (int(x), int(y), int(w), int(h))))
+
+        regions.sort(key=lambda r: r[0], reverse=True)
+        return [rect for _, rect in regions]
+
+    def plan(self, min_width=0, min_height=0):
+        """Return the regions to search this tick, or None when a full-frame scan is due."""
+        self.ticks += 1
+        if not self.grid.any():
+            return None
+        if self.full_scan_every and self.ticks % self.full_scan_every == 0:
+            return None
+        if self.miss_streak >= self.miss_streak_limit:
+            self.miss_streak = 0
+            return None
+        return self.regions(min_width, min_height)
+
+    def hit(self, x, y, width, height):
+        """Record a successful match and reset the miss streak."""
+        self.miss_streak = 0
+        self.record(x, y, width, height)
+
+    def miss(self):
+        """Record a tick where the searched regions had no match."""
+        self.miss_streak += 1
+
+    def searched_fraction(self, regions):
+        """Fraction of the monitor's pixels covered by the given regions."""
+        if regions is None:
+            return 1.0
+        return sum(w * h for _, _, w, h in regions) / float(self.width * self.height)
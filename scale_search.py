@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+
+# Display scaling steps (100-200% and back) and common editor zoom levels, relative to calibration
+DEFAULT_SCALES = (0.5, 0.67, 0.75, 0.8, 0.9, 1.0, 1.1, 1.25, 1.5, 1.75, 2.0)
+SCALE_FILE = 'scale.json'  # Written by earlier versions; import_assets() moves it into the pack
+
+
+class ScaleSearch:
+    """Finds the template scale of each monitor and searches only that scale afterwards.
+
+    A monitor starts at its calibrated scale. ``sweep()`` tries every other
+    scale, at most once per resweep_interval per monitor unless forced (the
+    first sweep runs at once). A scale that finds the button with at least
+    adopt_confidence, stricter than a normal match because small scales
+    match more background, replaces the cached one; callers persist it.
+    ``claim_discovery()`` is True once per monitor until ``forget()``, for
+    a first sweep after startup or a resolution change, and ``postpone()``
+    holds sweeps off, e.g. after a click made the button go away.
+    """
+
+    def __init__(self, scales=DEFAULT_SCALES, resweep_interval=60.0, adopt_confidence=0.9, clock=time.monotonic):
+        self.logger = logging.getLogger('scale_search')
+        self.scales = tuple(scales)
+        self.resweep_interval = resweep_interval
+        self.adopt_confidence = adopt_confidence
+        self.clock = clock
+        self._scales = {}  # key -> current scale
+        self._last_sweep = {}  # key -> clock time of the last sweep
+        self._discovered = set()  # keys whose discovery sweep was claimed
+        self._lock = threading.Lock()
+
+    def scale(self, key, default=1.0):
+        """Current scale for key (default until a sweep adopts another one)."""
+        with self._lock:
+            return self._scales.setdefault(key, default)
+
+    def claim_discovery(self, key):
+        """True the first time it is called for key since forget(), so discovery runs once."""
+        with self._lock:
+            if key in self._discovered:
+                return False
+            self._discovered.add(key)
+            return True
+
+    def postpone(self, key):
+        """Hold sweeps for key off for resweep_interval, as if one had just run."""
+        with self._lock:
+            self._last_sweep[key] = self.clock()
+
+    def sweep(self, key, search, force=False):
+        """Try every scale but the current one and adopt the best that finds a match.
+
+        search(scale) returns a match dict with a 'confidence', or None.
+        Returns (scale, match), or (None, None) when nothing was found with
+        adopt_confidence or, unless forced, the last sweep for key was too
+        recent.
+        """
+        current = self.scale(key)
+        now = self.clock()
+        with self._lock:
+            last = self._last_sweep.get(key)
+            if not force and last is not None and now - last < self.resweep_interval:
+                return None, None
+            self._last_sweep[key] = now
+
+        best_scale, best_match = None, None
+        for scale in self.scales:
+            if scale == current:
+                continue
+            match = search(scale)
+            if match and (best_match is None or match['confidence'] > best_match['confidence']):
+                best_scale, best_match = scale, match
+        if best_match is None:
+            self.logger.debug(f"Scale sweep for {key} found nothing")
+            return None, None
+        if best_match['confidence'] < self.adopt_confidence:
+            self.logger.debug(f"Scale sweep for {key}: best match at {best_scale:g} "
+                              f"(confidence {best_match['confidence']:.3f}) is too weak to adopt")
+            return None, None
+
+        self.logger.info(f"Scale for {key} changed from {current:g} to {best_scale:g} "
+                         f"(confidence {best_match['confidence']:.3f})")
+        with self._lock:
+            self._scales[key] = best_scale
+        return best_scale, best_match
+
+    def forget(self, key=None):
+        """Drop cached scales, sweep times and discovery (all keys, or one), e.g. after recalibration."""
+        with self._lock:
+            if key is None:
+                self._scales.clear()
+                self._last_sweep.clear()
+                self._discovered.clear()
+            else:
+                self._scales.pop(key, None)
+                self._last_sweep.pop(key, None)
+                self._discovered.discard(key)
@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+
+
+class ScanScheduler:
+    """Adapts the scan rate to recent activity instead of sleeping a fixed interval.
+
+    After a screen change or a click the scheduler bursts to ``burst_interval``;
+    with no further activity the interval decays exponentially back to
+    ``idle_interval`` (the distance halves every ``half_life`` seconds). The
+    interval is also stretched so that the process's CPU time stays within
+    ``cpu_budget`` (fraction of one core, None for no limit).
+    """
+
+    def __init__(self, burst_interval=0.1, idle_interval=2.0, half_life=5.0, cpu_budget=0.25,
+                 clock=time.monotonic, cpu_clock=time.process_time):
+        self.logger = logging.getLogger('scan_scheduler')
+        self.burst_interval = burst_interval
+        self.idle_interval = max(idle_interval, burst_interval)
+        self.half_life = half_life
+        self.cpu_budget = cpu_budget
+        self.clock = clock
+        self.cpu_clock = cpu_clock
+        self._lock = threading.Lock()
+        self._last_activity = None
+        self._last_tick = None
+        self._last_cpu = None
+        self.scan_cost = 0.0  # Smoothed CPU seconds spent per scan cycle
+        self.throttled = 0  # Number of intervals stretched to honour the CPU budget
+
+    def notify_activity(self):
+        """Record a screen change or click, bursting to the fast scan rate."""
+        with self._lock:
+            self._last_activity = self.clock()
+
+    def activity_interval(self, now=None):
+        """Interval implied by recent activity alone, ignoring the CPU budget."""
+        if self._last_activity is None:
+            return self.idle_interval
+        now = self.clock() if now is None else now
+        weight = 0.5 ** (max(0.0, now - self._last_activity) / self.half_life) if self.half_life > 0 else 0.0
+        return self.idle_interval - (self.idle_interval - self.burst_interval) * weight
+
+    def next_interval(self):
+        """Return how long to wait before the next scan, updating the CPU cost estimate."""
+        with self._lock:
+            now = self.clock()
+            cpu = self.cpu_clock()
+            if self._last_tick is not None:
+                # All CPU the process used since the previous tick is the cost of one scan cycle
+                cost = max(0.0, cpu - self._last_cpu)
+                self.scan_cost = cost if self.scan_cost == 0.0 else 0.7 * self.scan_cost + 0.3 * cost
+            self._last_tick = now
+            self._last_cpu = cpu
+
+            interval = self.activity_interval(now)
+            if self.cpu_budget:
+                budget_interval = self.scan_cost / self.cpu_budget
+                if budget_interval > interval:
+                    self.throttled += 1
+                    interval = budget_interval
+            return interval
+
+    def wait(self, stop_event=None):
+        """Sleep until the next scan is due, returning early if stop_event is set. Returns the interval."""
+        interval = self.next_interval()
+        if stop_event is not None:
+            stop_event.wait(interval)
+        else:
+            time.sleep(interval)
+        return interval
@@ -0,0 +1,244 @@
+import sys
+import os
+import time
+import logging
+import threading
+import numpy as np
+import cv2
+import mss
+from x11_capture import XShmBackend, X11CaptureError
+
+
+class Frame:
+    """A captured frame: a read-only BGR view into the capture engine's ring buffer."""
+
+    __slots__ = ('image', 'frame_id', 'timestamp', 'region')
+
+    def __init__(self, image, frame_id, timestamp, region):
+        self.image = image
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.region = region
+
+    @property
+    def width(self):
+        return self.image.shape[1]
+
+    @property
+    def height(self):
+        return self.image.shape[0]
+
+    def __repr__(self):
+        return (f"Frame(id={self.frame_id}, {self.width}x{self.height} "
+                f"at ({self.region['left']}, {self.region['top']}))")
+
+
+class MssBackend:
+    """Capture backend that grabs through an mss session (works everywhere)."""
+
+    name = 'mss'
+
+    def __init__(self, sct=None):
+        self._sct = sct
+
+    @property
+    def sct(self):
+        if self._sct is None:
+            self._sct = mss.mss()
+        return self._sct
+
+    def grab(self, region):
+        """Capture a region and return its raw BGRA pixels without copying."""
+        screenshot = self.sct.grab(region)
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+    def poll_damage(self):
+        """mss cannot tell which parts of the screen changed."""
+        return None
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+
+def create_backend(preferred='auto', fallback=None):
+    """Pick the fastest available capture backend, falling back to mss."""
+    logger = logging.getLogger('screen_capture')
+    if preferred in ('auto', 'xshm') and sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+        try:
+            backend = XShmBackend()
+            logger.info("Using MIT-SHM capture backend"
+                        f"{' with XDamage' if backend.damage is not None else ''}")
+            return backend
+        except (X11CaptureError, OSError) as e:
+            logger.info(f"MIT-SHM capture unavailable ({str(e)}), falling back to mss")
+    return fallback if fallback is not None else MssBackend()
+
+
+def _intersects(rect, region):
+    left, top, width, height = rect
+    return (left < region['left'] + region['width'] and region['left'] < left + width and
+            top < region['top'] + region['height'] and region['top'] < top + height)
+
+
+class CaptureEngine:
+    """Long-lived screen capture that writes frames into a preallocated ring of NumPy buffers.
+
+    Consumers get read-only views, not copies. A view stays valid until the
+    ring wraps around, i.e. for ``ring_size - 1`` further grabs of a region
+    with the same size. Frames grabbed with ``lease=True`` keep their slot
+    until ``release()``: the ring skips leased slots, and grows when every
+    slot is leased, so frames waiting in a queue are never overwritten.
+    """
+
+    def __init__(self, ring_size=3, sct=None, backend=None):
+        self.logger = logging.getLogger('screen_capture')
+        self.ring_size = max(2, ring_size)
+        # mss is always kept for monitor geometry and as a fallback for the faster backends
+        self._mss = MssBackend(sct)
+        if backend is None:
+            backend = self._mss if sct is not None else create_backend(fallback=self._mss)
+        self.backend = backend
+        self._dirty = {}  # region key -> damaged since last grab, when the backend reports damage
+        self._rings = {}  # (height, width) -> list of BGR buffers
+        self._next_slot = {}  # (height, width) -> index of the slot to write next
+        self._leased = set()  # ids of ring buffers held by leased frames
+        self._latest = {}  # region key -> last Frame grabbed for that region
+        self._frame_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def sct(self):
+        """The mss session owned by this engine, opened on first use."""
+        return self._mss.sct
+
+    @property
+    def monitors(self):
+        """Physical monitors as reported by mss (the "all monitors" entry is skipped)."""
+        return self.sct.monitors[1:]
+
+    @staticmethod
+    def _normalize_region(region):
+        return {
+            'left': int(region['left']),
+            'top': int(region['top']),
+            'width': int(region['width']),
+            'height': int(region['height'])
+        }
+
+    @staticmethod
+    def _region_key(region):
+        return (region['left'], region['top'], region['width'], region['height'])
+
+    def _next_buffer(self, height, width):
+        """Return the next ring slot for frames of the given size, allocating the ring once."""
+        shape = (height, width)
+        ring = self._rings.get(shape)
+        if ring is None:
+            ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.ring_size)]
+            self._rings[shape] = ring
+            self._next_slot[shape] = 0
+            self.logger.debug(f"Allocated {self.ring_size} frame buffers of {width}x{height}")
+
+        start = self._next_slot[shape]
+        for offset in range(len(ring)):
+            index = (start + offset) % len(ring)
+            if id(ring[index]) not in self._leased:
+                self._next_slot[shape] = (index + 1) % len(ring)
+                return ring[index]
+        # Every slot is leased; a frame still in use must not be overwritten
+        ring.append(np.empty((height, width, 3), dtype=np.uint8))
+        self._next_slot[shape] = 0
+        self.logger.debug(f"All {width}x{height} frame buffers leased, grew ring to {len(ring)}")
+        return ring[-1]
+
+    def grab(self, region, lease=False):
+        """Capture a region into the ring and return it as a read-only Frame.
+
+        A leased frame's slot is not reused until the frame is passed to release().
+        """
+        region = self._normalize_region(region)
+        with self._lock:
+            # Raw BGRA pixels without copying, converted straight into the ring slot
+            try:
+                bgra = self.backend.grab(region)
+            except (ValueError, X11CaptureError) as e:
+                if self.backend is self._mss:
+                    raise
+                self.logger.debug(f"{self.backend.name} grab failed ({str(e)}), using mss")
+                bgra = self._mss.grab(region)
+            height, width = bgra.shape[:2]
+            buffer = self._next_buffer(height, width)
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=buffer)
+            if lease:
+                self._leased.add(id(buffer))
+
+            view = buffer.view()
+            view.flags.writeable = False
+
+            self._frame_id += 1
+            frame = Frame(view, self._frame_id, time.time(), region)
+            key = self._region_key(region)
+            self._latest[key] = frame
+            self._dirty[key] = False
+            return frame
+
+    def has_changed(self, region):
+        """Whether a region was damaged since it was last grabbed.
+
+        Returns None when the backend cannot report damage, in which case
+        callers have to compare pixels themselves.
+        """
+        with self._lock:
+            rects = self.backend.poll_damage()
+            if rects is None:
+                return None
+            if rects:
+                for key in self._dirty:
+                    if not self._dirty[key]:
+                        tracked = dict(zip(('left', 'top', 'width', 'height'), key))
+                        self._dirty[key] = any(_intersects(rect, tracked) for rect in rects)
+            return self._dirty.get(self._region_key(self._normalize_region(region)), True)
+
+    def release(self, frame):
+        """Return a leased frame's slot to the ring; frame is the Frame or its image."""
+        image = frame.image if isinstance(frame, Frame) else frame
+        with self._lock:
+            self._leased.discard(id(image.base))
+
+    def latest(self, region):
+        """Return the most recent frame grabbed for a region, or None."""
+        return self._latest.get(self._region_key(self._normalize_region(region)))
+
+    def release_buffers(self):
+        """Drop all ring buffers, e.g. after the monitor layout changed."""
+        with self._lock:
+            self._rings.clear()
+            self._next_slot.clear()
+            self._latest.clear()
+            self._dirty.clear()
+            self._leased.clear()
+
+    def refresh_layout(self):
+        """Re-read the monitor layout after it changed and return the new monitors.
+
+        mss and the X11 backends read the screen geometry when they connect,
+        so both are reopened; frame buffers sized for the old layout are
+        dropped.
+        """
+        with self._lock:
+            self._mss.close()
+            if self.backend is not self._mss:
+                name = self.backend.name
+                self.backend.close()
+                self.backend = create_backend(name, fallback=self._mss)
+        self.release_buffers()
+        return self.monitors
+
+    def close(self):
+        """Release buffers and close the capture backends."""
+        self.release_buffers()
+        if self.backend is not self._mss:
+            self.backend.close()
+        self._mss.close()
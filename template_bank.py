@@ -0,0 +1,154 @@
+import os
+import logging
+import threading
+import numpy as np
+import cv2
+from pyramid_match import pyramid_levels
+
+
+def _read_only(array):
+    array = np.ascontiguousarray(array)
+    array.flags.writeable = False
+    return array
+
+
+class CompiledTemplate:
+    """A template loaded once, with every representation the matchers need precomputed.
+
+    All arrays are contiguous and read-only so they can be shared between
+    threads and matchers without copying.
+    """
+
+    def __init__(self, path, image, max_levels=2, min_template_side=10):
+        self.path = str(path)
+        self.source = self.path  # Path of the unscaled template this one was resized from
+        self.max_levels = max_levels
+        self.min_template_side = min_template_side
+        self._scaled = {}  # scale -> CompiledTemplate resized by it
+        if image.ndim == 3 and image.shape[2] == 4:
+            # Transparent pixels are excluded from matching
+            alpha = image[:, :, 3]
+            self.mask = _read_only(alpha) if (alpha < 255).any() else None
+            image = image[:, :, :3]
+        else:
+            self.mask = None
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+        self.bgr = _read_only(image)
+        self.gray = _read_only(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        self.height, self.width = self.gray.shape
+
+        # Reduced copies for coarse-to-fine search; index i holds level i + 1
+        levels = pyramid_levels(self.gray.shape, max_levels, min_template_side)
+        self.bgr_pyramid = []
+        self.gray_pyramid = []
+        bgr, gray = self.bgr, self.gray
+        for _ in range(levels):
+            bgr, gray = cv2.pyrDown(bgr), cv2.pyrDown(gray)
+            self.bgr_pyramid.append(_read_only(bgr))
+            self.gray_pyramid.append(_read_only(gray))
+
+        # Statistics used by the normalised correlation scores
+        gray64 = self.gray.astype(np.float64)
+        bgr64 = self.bgr.astype(np.float64)
+        self.gray_mean = float(gray64.mean())
+        self.gray_norm = float(np.sqrt(np.sum(gray64 ** 2)))
+        self.gray_zero_mean_norm = float(np.sqrt(np.sum((gray64 - self.gray_mean) ** 2)))
+        self.bgr_mean = bgr64.reshape(-1, 3).mean(axis=0)
+        self.bgr_norm = float(np.sqrt(np.sum(bgr64 ** 2)))
+        self.bgr_zero_mean_norm = float(np.sqrt(np.sum((bgr64 - self.bgr_mean) ** 2)))
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def pyramid(self, color=True):
+        """Pre-reduced pyramid levels of the BGR or grayscale template."""
+        return self.bgr_pyramid if color else self.gray_pyramid
+
+    def scaled(self, scale):
+        """This template resized by scale, compiled once and cached (self at scale 1)."""
+        if scale == 1.0:
+            return self
+        template = self._scaled.get(scale)
+        if template is None:
+            size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+            image = cv2.resize(self.bgr, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+            if self.mask is not None:
+                mask = cv2.resize(self.mask, size, interpolation=cv2.INTER_NEAREST)
+                image = np.dstack([image, mask])
+            template = CompiledTemplate(f"{self.path}@{scale:g}", image, self.max_levels, self.min_template_side)
+            template.source = self.source
+            self._scaled[scale] = template
+        return template
+
+    def __repr__(self):
+        return f"CompiledTemplate({os.path.basename(self.path)}, {self.width}x{self.height})"
+
+
+class TemplateBank:
+    """Loads each template file once and keeps its compiled form.
+
+    Missing files are remembered too, so a hot loop never touches the disk.
+    Call ``invalidate()`` after template files are written (e.g. after
+    calibration) to pick up the new contents.
+    """
+
+    def __init__(self, max_levels=2, min_template_side=10):
+        self.logger = logging.getLogger('template_bank')
+        self.max_levels = max_levels
+        self.min_template_side = min_template_side
+        self._templates = {}  # (path, expected size) -> CompiledTemplate or None
+        self._lock = threading.Lock()
+
+    def get(self, path, expected_size=None):
+        """Return the compiled template for a file, or None if it is missing or unreadable.
+
+        With expected_size=(width, height), a template saved in the
+        transposed orientation is rotated to match.
+        """
+        key = (str(path), expected_size)
+        with self._lock:
+            if key in self._templates:
+                return self._templates[key]
+            template = self._load(str(path), expected_size)
+            self._templates[key] = template
+            return template
+
+    def _load(self, path, expected_size):
+        if not os.path.exists(path):
+            return None
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            self.logger.error(f"Failed to load template: {path}")
+            return None
+
+        if expected_size is not None:
+            width, height = expected_size
+            if image.shape[:2] != (height, width) and image.shape[:2] == (width, height):
+                self.logger.warning(f"Template {path} has wrong orientation {image.shape[:2]}, rotating")
+                image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+
+        template = CompiledTemplate(path, image, self.max_levels, self.min_template_side)
+        self.logger.debug(f"Compiled {template}")
+        return template
+
+    def add(self, path, image):
+        """Compile an in-memory image (BGR, BGRA or grayscale) and register it under path."""
+        template = CompiledTemplate(path, image, self.max_levels, self.min_template_side)
+        with self._lock:
+            self._templates[(str(path), None)] = template
+        return template
+
+    def invalidate(self, path=None):
+        """Forget one template (all its orientations) or all of them, so they are reloaded on next use."""
+        with self._lock:
+            if path is None:
+                self._templates.clear()
+            else:
+                for key in [key for key in self._templates if key[0] == str(path)]:
+                    del self._templates[key]
+
+    def __len__(self):
+        return sum(1 for template in self._templates.values() if template is not None)
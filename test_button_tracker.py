@@ -0,0 +1,50 @@
+import unittest
+
+from button_tracker import ButtonTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestButtonTracker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = ButtonTracker(margin=10, smoothing=1.0, clock=self.clock)
+
+    def test_window_surrounds_last_box(self):
+        self.assertIsNone(self.tracker.window('m0', 1920, 1080))
+        self.tracker.update('m0', 500, 300, 80, 40)
+        self.assertEqual(self.tracker.window('m0', 1920, 1080), (490, 290, 100, 60))
+
+    def test_prediction_follows_scrolling(self):
+        self.tracker.update('m0', 500, 300, 80, 40)
+        self.clock.now = 0.5
+        self.tracker.update('m0', 500, 250, 80, 40)
+        self.clock.now = 1.0
+        self.assertEqual(self.tracker.predict('m0'), (500, 200, 80, 40))
+
+    def test_window_is_clipped_and_dropped_off_screen(self):
+        self.tracker.update('m0', 0, 5, 80, 40)
+        self.assertEqual(self.tracker.window('m0', 1920, 1080), (0, 0, 90, 55))
+        self.clock.now = 1.0
+        self.tracker.update('m0', 0, -100, 80, 40)  # Scrolling up 105 px/s
+        self.clock.now = 2.0
+        self.assertIsNone(self.tracker.window('m0', 1920, 1080))
+        self.assertEqual(self.tracker.keys(), [])
+
+    def test_miss_and_age_drop_tracks(self):
+        self.tracker.update('a', 10, 10, 80, 40)
+        self.tracker.update('b', 200, 10, 80, 40)
+        self.tracker.miss('a')
+        self.assertEqual(self.tracker.keys(), ['b'])
+        self.clock.now = 31.0
+        self.assertIsNone(self.tracker.predict('b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import cv2
+
+from calibration_pack import (CalibrationPack, PACK_FILE, PACK_VERSION, HOVER, AFTER, HOVER_SCREEN,
+                              import_assets)
+from metric_calibration import MetricChoice, METRIC_FILE, HOVER_SCREEN_FILE
+
+
+class TestCalibrationPack(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.hover = rng.integers(0, 256, (40, 80, 3), dtype=np.uint8)
+        self.after = rng.integers(0, 256, (40, 80, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(text)
+
+    def test_round_trip_maps_read_only_images(self):
+        path = os.path.join(self.directory, PACK_FILE)
+        metric = MetricChoice(cv2.TM_CCORR_NORMED, 0.9, 0.1)
+        CalibrationPack({HOVER: self.hover, AFTER: self.after}, [40, 20],
+                        {'left': 0, 'top': 0, 'width': 1920, 'height': 1080}, 1.25, metric).save(path)
+
+        pack = CalibrationPack.load(path)
+        np.testing.assert_array_equal(pack.image(HOVER), self.hover)
+        np.testing.assert_array_equal(pack.image(AFTER), self.after)
+        self.assertFalse(pack.image(HOVER).flags.writeable)
+        self.assertEqual(pack.image(HOVER).ctypes.data % 64, 0)
+        self.assertTrue(pack.calibrated)
+        self.assertEqual((pack.click, pack.monitor['width'], pack.scale), ([40, 20], 1920, 1.25))
+        self.assertEqual((pack.metric.method, pack.metric.threshold), (cv2.TM_CCORR_NORMED, 0.9))
+
+    def test_saving_over_the_mapped_file_releases_it(self):
+        path = os.path.join(self.directory, PACK_FILE)
+        CalibrationPack({HOVER: self.hover, AFTER: self.after}, [40, 20]).save(path)
+        pack = CalibrationPack.load(path)
+        pack.metric = MetricChoice(cv2.TM_CCOEFF_NORMED, 0.8, 0.1)
+        pack.save(path)
+
+        self.assertIsNone(pack._mapping)
+        np.testing.assert_array_equal(pack.image(HOVER), self.hover)
+        self.assertFalse(pack.image(HOVER).flags.writeable)
+        self.assertEqual(CalibrationPack.load(path).metric.method, cv2.TM_CCOEFF_NORMED)
+        self.assertEqual(os.listdir(self.directory), [PACK_FILE])
+
+    def test_close_with_views_in_use(self):
+        path = os.path.join(self.directory, PACK_FILE)
+        CalibrationPack({HOVER: self.hover}).save(path)
+        pack = CalibrationPack.load(path)
+        view = pack.image(HOVER)
+        pack.close()
+        os.remove(path)
+        np.testing.assert_array_equal(view, self.hover)
+        np.testing.assert_array_equal(pack.image(HOVER), self.hover)
+
+    def test_other_versions_are_ignored(self):
+        path = os.path.join(self.directory, PACK_FILE)
+        CalibrationPack({HOVER: self.hover}).save(path)
+        with open(path, 'r+b') as f:
+            f.seek(8)
+            f.write((PACK_VERSION + 1).to_bytes(4, 'little'))
+        self.assertIsNone(CalibrationPack.load(path))
+        self.assertIsNone(CalibrationPack.load(os.path.join(self.directory, 'missing.pack')))
+
+    def test_import_existing_assets(self):
+        cv2.imwrite(os.path.join(self.directory, 'accept_button.png'), self.hover)
+        cv2.imwrite(os.path.join(self.directory, 'accept_after.png'), self.after)
+        cv2.imwrite(os.path.join(self.directory, HOVER_SCREEN_FILE), np.zeros((60, 120, 3), np.uint8))
+        self.write('click_coords.txt', '862,427')
+        self.write('scale.json', json.dumps({'scale': 1.5}))
+        MetricChoice(cv2.TM_SQDIFF_NORMED, 0.1, 0.2).save(os.path.join(self.directory, METRIC_FILE))
+        cv2.imwrite(os.path.join(self.directory, 'button_1_pre.png'), self.hover)
+        cv2.imwrite(os.path.join(self.directory, 'button_1_post.png'), self.after)
+        self.write('click_coords_1.txt', '12,34')
+        self.write('monitor_1.txt', '-1435,-1080,1920,1080')
+
+        pack = import_assets(self.directory)
+        pack.save(os.path.join(self.directory, PACK_FILE))
+        pack = CalibrationPack.load(os.path.join(self.directory, PACK_FILE))
+        self.assertTrue(pack.calibrated)
+        np.testing.assert_array_equal(pack.image(HOVER), self.hover)
+        np.testing.assert_array_equal(pack.image('button_1_post'), self.after)
+        self.assertEqual(pack.image(HOVER_SCREEN).shape, (60, 120, 3))
+        self.assertEqual((pack.click, pack.scale, pack.metric.method), ([862, 427], 1.5, cv2.TM_SQDIFF_NORMED))
+        self.assertEqual(pack.buttons, [{'index': 1, 'click': [12, 34], 'monitor': {
+            'left': -1435, 'top': -1080, 'width': 1920, 'height': 1080}}])
+        # The variations say which monitor this was
+        self.assertEqual(pack.monitor['left'], -1435)
+
+    def test_import_without_calibration(self):
+        self.assertIsNone(import_assets(self.directory))
+        self.write('click_coords.txt', '40,20')
+        pack = import_assets(self.directory)
+        self.assertFalse(pack.calibrated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+
+from change_gate import ChangeGate
+
+
+class TestChangeGate(unittest.TestCase):
+    def setUp(self):
+        self.gate = ChangeGate(tile_size=16, refresh_interval=None)
+        self.frame = np.full((120, 200, 3), 40, dtype=np.uint8)
+
+    def test_first_frame_is_searched(self):
+        self.assertTrue(self.gate.should_search(self.frame))
+
+    def test_unchanged_frame_is_skipped(self):
+        self.gate.should_search(self.frame)
+        self.assertFalse(self.gate.should_search(self.frame.copy()))
+        self.assertEqual(self.gate.frames_skipped, 1)
+        self.assertAlmostEqual(self.gate.skip_ratio, 0.5)
+
+    def test_small_button_appearing_is_detected(self):
+        self.gate.should_search(self.frame)
+        changed = self.frame.copy()
+        changed[50:58, 100:116] = (200, 120, 30)
+        self.assertTrue(self.gate.should_search(changed))
+
+        tiles = self.gate.changed_tiles(self.frame)
+        self.assertTrue(tiles.any())
+        self.assertLess(tiles.sum(), tiles.size)
+
+    def test_invalidate_forces_search(self):
+        self.gate.should_search(self.frame, key='a')
+        self.gate.should_search(self.frame, key='b')
+        self.gate.invalidate('a')
+        self.assertTrue(self.gate.should_search(self.frame, key='a'))
+        self.assertFalse(self.gate.should_search(self.frame, key='b'))
+
+    def test_pending_until_searched(self):
+        frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        self.assertTrue(self.gate.pending())
+        self.gate.should_search(frame)
+        self.assertFalse(self.gate.pending())
+        self.gate.invalidate()
+        self.assertTrue(self.gate.pending())
+
+    def test_refresh_interval_forces_search(self):
+        gate = ChangeGate(tile_size=16, refresh_interval=0.0)
+        gate.should_search(self.frame)
+        self.assertTrue(gate.should_search(self.frame))
+
+
+if __name__ == '__main__':
+    unittest.main()
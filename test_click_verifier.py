@@ -0,0 +1,43 @@
+import time
+import unittest
+import numpy as np
+import cv2
+
+from click_verifier import ClickVerifier
+from template_bank import TemplateBank
+
+
+def make_button():
+    button = np.full((40, 80, 3), (60, 140, 40), dtype=np.uint8)
+    cv2.putText(button, 'Accept', (8, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return button
+
+
+class TestClickVerifier(unittest.TestCase):
+    def setUp(self):
+        self.verifier = ClickVerifier()
+        self.button = make_button()
+        self.background = np.full_like(self.button, 30)
+
+    def test_detects_button_going_away(self):
+        self.assertTrue(self.verifier.arm(self.button))
+        noisy = self.button.copy()
+        noisy[20, 40] = 0  # A blinking caret is not a change
+        self.assertFalse(self.verifier.changed(noisy))
+        self.assertTrue(self.verifier.changed(self.background))
+
+    def test_arm_checks_region_still_shows_button(self):
+        template = TemplateBank().add('button', make_button())
+        self.assertTrue(self.verifier.arm(self.button, template))
+        self.assertFalse(self.verifier.arm(self.background, template))
+
+    def test_probe_is_cheap(self):
+        self.verifier.arm(self.button)
+        start = time.perf_counter()
+        for _ in range(1000):
+            self.verifier.changed(self.button)
+        self.assertLess((time.perf_counter() - start) / 1000, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
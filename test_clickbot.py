@@ -1,4 +1,5 @@
 import os
+import time
 import unittest
 from unittest.mock import Mock, patch
 from PIL import Image
@@ -74,6 +75,27 @@ class TestClickBot(unittest.TestCase):
             debug_bot.process_matches(matches, self.test_image)
             mock_click.assert_not_called()  # Should not click in debug mode
 
+class TestClickRetry(unittest.TestCase):
+    def test_cooldown_then_retry_on_unchanged_frame(self):
+        bot = ClickBot(debug=False, interval=0.1)
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        matches = [{'confidence': 0.9, 'x': 10, 'y': 10}]
+        self.assertTrue(bot.change_gate.should_search(frame))
+        self.assertFalse(bot.change_gate.should_search(frame))
+
+        # Held back by the cooldown, so the same frame is searched again
+        bot.last_click_time = time.time()
+        with patch('pyautogui.click') as mock_click:
+            bot.process_matches(matches, frame)
+            mock_click.assert_not_called()
+        self.assertTrue(bot.change_gate.pending())
+        self.assertTrue(bot.change_gate.should_search(frame))
+
+        bot.last_click_time = time.time() - bot.click_cooldown
+        with patch('pyautogui.click') as mock_click:
+            bot.process_matches(matches, frame)
+            mock_click.assert_called_once_with(10, 10)
+
 class TestImageMatcher(unittest.TestCase):
     def setUp(self):
         self.matcher = ImageMatcher(debug=True)
@@ -106,6 +128,14 @@ class TestImageMatcher(unittest.TestCase):
         self.assertIsNotNone(match)
         self.assertGreater(match['confidence'], 0.8)
 
+    def test_in_memory_matches(self):
+        # Match arrays directly, without writing the screen to disk
+        self.screen.paste(self.template, (75, 75))
+        self.matcher.set_images(np.array(self.screen)[:, :, ::-1], np.array(self.template)[:, :, ::-1])
+        matches = self.matcher.find_matches()
+        self.assertEqual((matches[0].center_x, matches[0].center_y), (100, 100))
+        self.assertGreater(matches[0].quality.structural_similarity, 0.9)
+
     def test_error_handling(self):
         # Test invalid template
         match = self.matcher.find_template(self.screen, None)
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+import cv2
+
+from color_prefilter import ColorPrefilter
+from template_bank import TemplateBank
+
+
+def make_button(fill=(200, 120, 40)):
+    button = np.full((40, 80, 3), (30, 30, 30), dtype=np.uint8)
+    cv2.rectangle(button, (6, 8), (73, 31), fill, -1)
+    cv2.putText(button, 'Accept', (14, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return button
+
+
+def make_screen(width=640, height=480, seed=0):
+    """Dark editor-like screen with grey text lines."""
+    rng = np.random.default_rng(seed)
+    screen = np.full((height, width, 3), 30, dtype=np.uint8)
+    for y in range(10, height - 10, 18):
+        length = int(rng.integers(50, width - 20))
+        cv2.putText(screen, 'x' * (length // 10), (10, y + 10), cv2.FONT_HERSHEY_PLAIN, 1.0, (180, 180, 180), 1)
+    return screen
+
+
+def contains(window, x, y, width, height):
+    wx, wy, ww, wh = window
+    return wx <= x and wy <= y and x + width <= wx + ww and y + height <= wy + wh
+
+
+class TestColorPrefilter(unittest.TestCase):
+    def setUp(self):
+        self.template = TemplateBank().add('button', make_button())
+        self.prefilter = ColorPrefilter(full_scan_every=0)
+
+    def test_fill_color_is_button_fill(self):
+        expected = cv2.cvtColor(np.uint8([[[200, 120, 40]]]), cv2.COLOR_BGR2LAB)[0, 0]
+        np.testing.assert_allclose(self.prefilter.fill_color(self.template), expected, atol=2)
+
+    def test_windows_surround_each_button(self):
+        screen = make_screen()
+        spots = [(100, 50), (400, 300)]
+        for x, y in spots:
+            screen[y:y + 40, x:x + 80] = make_button()
+        windows = self.prefilter.candidates(screen, self.template)
+        self.assertEqual(len(windows), 2)
+        self.assertTrue(all(w == 100 and h == 60 for _, _, w, h in windows))
+        for x, y in spots:
+            self.assertTrue(any(contains(window, x, y, 80, 40) for window in windows))
+
+    def test_other_colours_yield_no_windows(self):
+        screen = make_screen()
+        screen[200:240, 300:380] = make_button(fill=(40, 160, 40))
+        self.assertEqual(self.prefilter.candidates(screen, self.template), [])
+
+    def test_undistinctive_colour_searches_everything(self):
+        screen = np.full((480, 640, 3), (200, 120, 40), dtype=np.uint8)
+        self.assertIsNone(self.prefilter.candidates(screen, self.template))
+        prefilter = ColorPrefilter(full_scan_every=3)
+        results = [prefilter.candidates(make_screen(), self.template) for _ in range(3)]
+        self.assertEqual(results, [[], [], None])
+
+    def test_calibrate_fits_tolerance_to_recorded_screen(self):
+        screen = make_screen()
+        screen[100:140, 200:280] = make_button()
+        self.assertEqual(self.prefilter.calibrate(self.template, screen, (200, 100)), ColorPrefilter.TOLERANCES[0])
+        self.assertIsNone(self.prefilter.calibrate(self.template, make_screen(), (200, 100)))
+        self.assertIsNone(self.prefilter.candidates(screen, self.template))
+
+    def test_calibration_applies_to_scaled_templates(self):
+        screen = cv2.resize(make_screen(), None, fx=1.25, fy=1.25)
+        screen[100:150, 200:300] = cv2.resize(make_button(), (100, 50))
+        scaled = self.template.scaled(1.25)
+        self.assertTrue(self.prefilter.candidates(screen, scaled))
+        # Disabled for the calibrated template means disabled at every scale
+        self.assertIsNone(self.prefilter.calibrate(self.template, make_screen(), (200, 100)))
+        self.assertIsNone(self.prefilter.candidates(screen, scaled))
+
+    def test_full_scans_are_counted_per_key(self):
+        prefilter = ColorPrefilter(full_scan_every=2)
+        screen = make_screen()
+        results = [prefilter.candidates(screen, self.template, key=key) for key in (0, 1, 0, 1)]
+        self.assertEqual(results, [[], [], None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import cv2
+
+from correlation_engine import CorrelationEngine, FUSED_METHODS
+from template_bank import TemplateBank
+
+
+def make_screen(width=400, height=300, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height // 4, width // 4), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+class TestCorrelationEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = CorrelationEngine()
+        self.bank = TemplateBank()
+        self.screen = make_screen()
+
+    def test_matches_opencv_ccoeff_normed(self):
+        frame = self.engine.prepare(self.screen)
+        for i, (x, y, w, h) in enumerate([(10, 20, 80, 40), (200, 150, 53, 20), (300, 250, 24, 20)]):
+            template = self.bank.add(f"t{i}", self.screen[y:y + h, x:x + w])
+            result = self.engine.score(frame, template)
+            expected = cv2.matchTemplate(self.screen, template.gray, cv2.TM_CCOEFF_NORMED)
+            self.assertEqual(result.shape, expected.shape)
+            np.testing.assert_allclose(result, expected, atol=1e-3)
+            self.assertEqual(cv2.minMaxLoc(result)[3], (x, y))
+
+    def test_window_stats_are_shared_per_size(self):
+        frame = self.engine.prepare(self.screen)
+        first = frame.window_stats(80, 40)
+        self.assertIs(frame.window_stats(80, 40), first)
+
+    def test_flat_windows_score_zero(self):
+        screen = self.screen.copy()
+        screen[:100, :200] = 128
+        frame = self.engine.prepare(screen)
+        template = self.bank.add('t', self.screen[150:190, 250:330])
+        result = self.engine.score(frame, template)
+        self.assertTrue(np.all(result[:50, :100] == 0))
+
+    def test_score_all_reports_each_template(self):
+        frame = self.engine.prepare(self.screen)
+        small = self.bank.add('small', self.screen[100:140, 100:180])
+        large = self.bank.add('large', make_screen(500, 400, seed=1))
+        best = self.engine.score_all(frame, [small, large])
+        self.assertIsNone(best['large'])
+        value, loc = best['small']
+        self.assertAlmostEqual(value, 1.0, places=3)
+        self.assertEqual(loc, (100, 100))
+
+    def test_fused_methods_match_opencv_on_colour_frames(self):
+        rng = np.random.default_rng(2)
+        screen = cv2.resize(rng.integers(0, 256, (75, 100, 3), dtype=np.uint8), (400, 300),
+                            interpolation=cv2.INTER_CUBIC)
+        template = self.bank.add('bgr', screen[120:160, 200:280])
+        results = self.engine.scores(self.engine.prepare(screen), template)
+        self.assertEqual(set(results), set(FUSED_METHODS))
+        for method in FUSED_METHODS:
+            expected = cv2.matchTemplate(screen, template.bgr, method)
+            np.testing.assert_allclose(results[method], expected, atol=1e-3, err_msg=f"method {method}")
+
+    def test_peaks_use_minimum_for_sqdiff(self):
+        template = self.bank.add('t', self.screen[50:90, 60:140])
+        peaks = self.engine.peaks(self.engine.prepare(self.screen), template)
+        self.assertEqual(peaks[cv2.TM_SQDIFF_NORMED][1], (60, 50))
+        self.assertAlmostEqual(peaks[cv2.TM_SQDIFF_NORMED][0], 0.0, places=4)
+        self.assertEqual(peaks[cv2.TM_CCORR_NORMED][1], (60, 50))
+        self.assertEqual(peaks[cv2.TM_CCOEFF_NORMED][1], (60, 50))
+
+    def test_black_windows_are_worst_sqdiff(self):
+        screen = self.screen.copy()
+        screen[:100, :200] = 0
+        template = self.bank.add('t', self.screen[150:190, 250:330])
+        results = self.engine.scores(self.engine.prepare(screen), template)
+        self.assertTrue(np.all(results[cv2.TM_SQDIFF_NORMED][:50, :100] == 1.0))
+        self.assertTrue(np.all(results[cv2.TM_CCORR_NORMED][:50, :100] == 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import numpy as np
+import cv2
+
+from calibration_pack import CalibrationPack, PACK_FILE, HOVER, AFTER
+from metric_calibration import MetricChoice
+import cursor_auto_accept
+
+MONITORS = [{'left': 0, 'top': 0, 'width': 640, 'height': 480},
+            {'left': -800, 'top': -120, 'width': 800, 'height': 600}]
+# Button top-left corner on each monitor, in monitor-relative pixels
+POSITIONS = [(120, 300), (610, 40)]
+
+
+def make_bot(monitors, **kwargs):
+    with patch('cursor_auto_accept.CaptureEngine') as engine, \
+            patch('cursor_auto_accept.create_watcher', return_value=None):
+        engine.return_value.monitors = monitors
+        return cursor_auto_accept.CursorAutoAccept(**kwargs)
+
+
+def make_button():
+    button = np.full((40, 80, 3), (30, 30, 30), dtype=np.uint8)
+    cv2.rectangle(button, (6, 8), (73, 31), (200, 120, 40), -1)
+    cv2.putText(button, 'Accept', (14, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return button
+
+
+def make_screen(width, height):
+    """Dark editor-like screen with grey text lines."""
+    screen = np.full((height, width, 3), 30, dtype=np.uint8)
+    for y in range(10, height - 10, 18):
+        cv2.putText(screen, 'x' * 40, (10, y + 10), cv2.FONT_HERSHEY_PLAIN, 1.0, (180, 180, 180), 1)
+    return screen
+
+
+class TestMonitorScan(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        os.chdir(self.temp_dir)
+        rng = np.random.default_rng(0)
+        self.button = rng.integers(0, 256, (40, 80, 3), dtype=np.uint8)
+        for index, monitor in enumerate(MONITORS):
+            monitor_assets = os.path.join('assets', f'monitor_{index}')
+            os.makedirs(monitor_assets)
+            CalibrationPack({HOVER: self.button, AFTER: np.zeros_like(self.button)}, [40, 20],
+                            monitor).save(os.path.join(monitor_assets, PACK_FILE))
+
+        self.bot = make_bot(MONITORS)
+
+        self.frames = []
+        for index, monitor in enumerate(MONITORS):
+            frame = rng.integers(0, 256, (monitor['height'], monitor['width'], 3), dtype=np.uint8)
+            button = self.button.astype(np.float32)
+            if index == 0:
+                # Slightly off, so the other monitor holds the best match
+                button += rng.normal(0, 8, button.shape)
+            x, y = POSITIONS[index]
+            frame[y:y + 40, x:x + 80] = np.clip(button, 0, 255).astype(np.uint8)
+            self.frames.append(frame)
+
+    def tearDown(self):
+        self.bot.scan_pool.shutdown()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_monitors_are_scanned_in_parallel_with_their_offsets(self):
+        scans = [(index, monitor, self.frames[index], self.bot._load_hover_template(index))
+                 for index, monitor in enumerate(MONITORS)]
+        self.assertTrue(all(scan[3] is not None for scan in scans))
+
+        results = {}
+        scan_monitor = self.bot._scan_monitor
+
+        def record(monitor_index, *args):
+            match = scan_monitor(monitor_index, *args)
+            results[monitor_index] = (threading.current_thread().name, match)
+            return match
+
+        self.bot._scan_monitor = record
+        best = self.bot._detect_best(scans)
+
+        self.assertEqual(sorted(results), [0, 1])
+        for index, (thread_name, match) in results.items():
+            self.assertTrue(thread_name.startswith('monitor-scan'))
+            self.assertEqual(match['monitor_index'], index)
+            self.assertEqual(match['monitor'], MONITORS[index])
+            self.assertEqual((match['relative_x'], match['relative_y']), POSITIONS[index])
+        self.assertEqual(best['monitor_index'], 1)
+        self.assertGreater(best['confidence'], results[0][1]['confidence'])
+
+
+class TestScaleDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        os.chdir(self.temp_dir)
+        self.monitor = {'left': 0, 'top': 0, 'width': 640, 'height': 480}
+        self.pack_file = os.path.join('assets', 'monitor_0', PACK_FILE)
+        os.makedirs(os.path.dirname(self.pack_file))
+        # A calibrated metric strict enough that the button at another scale does not match
+        CalibrationPack({HOVER: make_button(), AFTER: np.zeros((40, 80, 3), np.uint8)}, [40, 20], self.monitor,
+                        metric=MetricChoice(cv2.TM_CCOEFF_NORMED, 0.8, 0.3)).save(self.pack_file)
+        self.bot = make_bot([self.monitor], single_metric=True)
+        self.now = 0.0
+        self.bot.scales.clock = lambda: self.now
+        self.template = self.bot._load_hover_template(0)
+
+    def tearDown(self):
+        self.bot.scan_pool.shutdown()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def frame(self, scale=None, x=300, y=200):
+        """Screen with the button zoomed by scale at (x, y), or without a button."""
+        frame = make_screen(self.monitor['width'], self.monitor['height'])
+        if scale is not None:
+            button = cv2.resize(make_button(), None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            frame[y:y + button.shape[0], x:x + button.shape[1]] = button
+        return frame
+
+    def scan(self, frame):
+        return self.bot._scan_monitor(0, self.monitor, frame, self.template)
+
+    def test_first_scan_discovers_new_scale_without_tracked_button(self):
+        self.assertIsNone(self.bot.tracker.window(0, 640, 480))
+        match = self.scan(self.frame(1.5, x=420, y=60))
+
+        self.assertEqual((match['relative_x'], match['relative_y'], match['width']), (420, 60, 120))
+        self.assertEqual(self.bot.scales.scale(0), 1.5)
+        self.assertEqual(CalibrationPack.load(self.pack_file).scale, 1.5)
+
+    def test_near_miss_triggers_sweep(self):
+        self.assertIsNone(self.scan(self.frame()))  # Discovery finds nothing
+        self.assertIsNone(self.scan(self.frame(1.1)))  # Too soon after discovery
+        self.now = self.bot.scales.resweep_interval
+        match = self.scan(self.frame(1.1))
+        self.assertEqual(match['width'], 88)
+        self.assertEqual(self.bot.scales.scale(0), 1.1)
+
+    def test_no_sweep_after_click(self):
+        self.assertIsNone(self.scan(self.frame()))
+        self.now = self.bot.scales.resweep_interval
+        self.bot.scales.postpone(0)
+        self.assertIsNone(self.scan(self.frame(1.1)))
+        self.assertEqual(self.bot.scales.scale(0), 1.0)
+        self.now += self.bot.scales.resweep_interval
+        self.assertEqual(self.scan(self.frame(1.1))['width'], 88)
+
+
+if __name__ == '__main__':
+    unittest.main()
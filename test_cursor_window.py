@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import shutil
+import subprocess
+import unittest
+
+from cursor_window import CursorWindowLocator, clip_rectangle, wm_class_matches
+
+XVFB_DISPLAY = ':96'
+
+
+class TestWindowHelpers(unittest.TestCase):
+    def test_wm_class_matches_instance_or_class(self):
+        self.assertTrue(wm_class_matches(b'cursor\0Cursor\0', 'cursor'))
+        self.assertTrue(wm_class_matches(b'editor\0Cursor\0', 'cursor'))
+        self.assertFalse(wm_class_matches(b'code\0Code\0', 'cursor'))
+
+    def test_clip_rectangle_to_screen(self):
+        self.assertEqual(clip_rectangle(-10, 20, 100, 50, 1920, 1080),
+                         {'left': 0, 'top': 20, 'width': 90, 'height': 50})
+        self.assertIsNone(clip_rectangle(2000, 0, 10, 10, 1920, 1080))
+
+
+@unittest.skipUnless(sys.platform.startswith('linux') and shutil.which('Xvfb'), "Xvfb not installed")
+class TestCursorWindowUnderXvfb(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.xvfb = subprocess.Popen(['Xvfb', XVFB_DISPLAY, '-screen', '0', '640x480x24', '-nolisten', 'tcp'],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Wait for the server socket to appear
+        socket = f"/tmp/.X11-unix/X{XVFB_DISPLAY[1:]}"
+        for _ in range(50):
+            if os.path.exists(socket):
+                break
+            time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.xvfb.terminate()
+        cls.xvfb.wait()
+
+    def setUp(self):
+        try:
+            from Xlib import X, Xatom, display
+        except ImportError:
+            self.skipTest("python-xlib not installed")
+        self.xlib_display = display.Display(XVFB_DISPLAY)
+        root = self.xlib_display.screen().root
+        # A dummy Cursor window, published the way an EWMH window manager would
+        self.window = root.create_window(50, 40, 300, 200, 0, X.CopyFromParent)
+        self.window.set_wm_class('cursor', 'Cursor')
+        self.window.map()
+        client_list = self.xlib_display.intern_atom('_NET_CLIENT_LIST')
+        root.change_property(client_list, Xatom.WINDOW, 32, [self.window.id])
+        self.xlib_display.sync()
+        self.locator = CursorWindowLocator(XVFB_DISPLAY)
+
+    def tearDown(self):
+        self.locator.close()
+        self.window.destroy()
+        self.xlib_display.close()
+
+    def wait_for_change(self):
+        for _ in range(50):
+            if self.locator.poll():
+                return True
+            time.sleep(0.02)
+        return False
+
+    def test_finds_window_rectangle(self):
+        self.assertEqual(self.locator.region(), {'left': 50, 'top': 40, 'width': 300, 'height': 200})
+        self.assertFalse(self.locator.poll())
+
+    def test_follows_moves_and_resizes(self):
+        self.locator.region()
+        self.window.configure(x=100, y=60, width=400, height=300)
+        self.xlib_display.sync()
+        self.assertTrue(self.wait_for_change())
+        self.assertEqual(self.locator.region(), {'left': 100, 'top': 60, 'width': 400, 'height': 300})
+
+        # Partly off-screen windows are clipped to what can be captured
+        self.window.configure(x=500)
+        self.xlib_display.sync()
+        self.assertTrue(self.wait_for_change())
+        self.assertEqual(self.locator.region(), {'left': 500, 'top': 60, 'width': 140, 'height': 300})
+
+    def test_unmapped_window_has_no_region(self):
+        self.locator.region()
+        self.window.unmap()
+        self.xlib_display.sync()
+        self.assertTrue(self.wait_for_change())
+        self.assertIsNone(self.locator.region())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import cv2
+
+from detection import DetectionPass, TargetClass, ACCEPT, NOTE_ICON
+from image_matcher import ImageMatcher
+from screen_capture import CaptureEngine
+from test_screen_capture import FakeSct
+
+
+def make_screen(width=400, height=300, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height // 4, width // 4), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+class TestDetectionPass(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.screen = make_screen()
+        # Both targets are cut from the screen, so each occurs exactly once
+        self.accept_path = os.path.join(self.directory, 'accept.png')
+        self.note_path = os.path.join(self.directory, 'note.png')
+        cv2.imwrite(self.accept_path, self.screen[40:70, 60:120])
+        cv2.imwrite(self.note_path, self.screen[200:240, 300:340])
+        self.matcher = ImageMatcher(capture=CaptureEngine(sct=FakeSct()))
+        self.detector = DetectionPass(self.matcher, [
+            TargetClass(ACCEPT, [self.accept_path]),
+            TargetClass(NOTE_ICON, [self.note_path, os.path.join(self.directory, 'missing.png')],
+                        region={'left': 200, 'top': 150, 'width': 200, 'height': 150})])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_detects_every_class_in_one_pass(self):
+        # The first pass prepares each region once, the second re-matches dirty tiles only
+        for _ in range(2):
+            result = self.detector.detect(self.screen)
+            accept, = result.of(ACCEPT)
+            note, = result.of(NOTE_ICON)
+            self.assertEqual((accept.x, accept.y, accept.template), (90, 55, self.accept_path))
+            self.assertEqual((note.x, note.y), (320, 220))
+            self.assertEqual(accept.to_match()['confidence'], accept.confidence)
+
+    def test_region_and_exclude_limit_the_search(self):
+        self.detector.targets[1].region = {'left': 0, 'top': 0, 'width': 200, 'height': 150}
+        result = self.detector.detect(self.screen, exclude={self.accept_path})
+        self.assertFalse(result.found(ACCEPT))
+        self.assertFalse(result.found(NOTE_ICON))
+        self.assertEqual(len(result), 0)
+
+    def test_region_is_translated_into_the_frame(self):
+        # The frame is a window captured at (1000, 500); the region is given in screen coordinates
+        self.detector.targets[1].region = {'left': 1250, 'top': 650, 'width': 300, 'height': 300}
+        note, = self.detector.detect(self.screen, origin=(1000, 500)).of(NOTE_ICON)
+        self.assertEqual((note.x, note.y), (320, 220))
+
+        self.detector.targets[1].region = {'left': 0, 'top': 0, 'width': 200, 'height': 150}
+        with self.assertLogs('detection', 'WARNING'):
+            result = self.detector.detect(self.screen, origin=(1000, 500))
+        self.assertFalse(result.found(NOTE_ICON))
+        self.assertTrue(result.found(ACCEPT))
+
+
+if __name__ == '__main__':
+    unittest.main()
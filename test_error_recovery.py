@@ -165,6 +165,21 @@ class TestErrorRecoveryHandler(unittest.TestCase):
         success = self.handler.perform_recovery(self.screen)
         self.assertFalse(success)
 
+    def test_note_icon_search_region(self):
+        # Indicators are matched with the shared engine, only inside the search region
+        note_icon = Image.new('RGB', (24, 24), color='white')
+        for i in range(24):
+            note_icon.putpixel((i, i), (0, 0, 0))
+        note_icon.save(os.path.join(self.test_images_dir, 'note-icon.png'))
+        self.screen.paste(note_icon, (500, 100))
+        self.handler.images_dir = self.test_images_dir
+        try:
+            self.assertTrue(self.handler.check_for_note(self.screen))
+            self.handler.search_region = {'left': 0, 'top': 0, 'width': 400, 'height': 600}
+            self.assertFalse(self.handler.check_for_note(self.screen))
+        finally:
+            os.remove(os.path.join(self.test_images_dir, 'note-icon.png'))
+
     def test_error_image_loading(self):
         # Test with missing images
         handler = ErrorRecoveryHandler(debug=True)
@@ -0,0 +1,38 @@
+import unittest
+import numpy as np
+
+from evaluate_metric import build_cases, calibration_cases
+from metric_calibration import locate_recording
+from template_bank import TemplateBank
+
+
+class TestEvaluateMetric(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        screen = rng.integers(0, 256, (200, 300, 3), dtype=np.uint8)
+        self.button = rng.integers(0, 256, (40, 80, 3), dtype=np.uint8)
+        hover_screen, after_screen = screen.copy(), screen.copy()
+        hover_screen[60:100, 100:180] = self.button
+        after_screen[60:100, 100:180] = 30
+        template = TemplateBank().add('button', self.button)
+        self.recording = locate_recording(template, after_screen[60:100, 100:180], hover_screen, after_screen)
+
+    def test_held_out_cases_avoid_the_recorded_button(self):
+        cases = build_cases(self.recording, 30, np.random.default_rng(1))
+        in_sample = calibration_cases(self.recording)
+        self.assertEqual(len(cases), 60)
+        for frame, location in cases:
+            self.assertFalse(any(np.array_equal(frame, calibration) for calibration, _ in in_sample))
+            if location is not None:
+                x, y = location
+                self.assertTrue(abs(x - 100) >= 80 or abs(y - 60) >= 40)
+
+    def test_variations_at_template_size_are_positives(self):
+        variations = [(self.button, np.zeros_like(self.button)),
+                      (self.button[10:30, 5:75], np.zeros((20, 70, 3), np.uint8))]
+        cases = build_cases(self.recording, 0, np.random.default_rng(1), variations)
+        self.assertEqual([location is not None for frame, location in cases], [True, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
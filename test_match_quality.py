@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+import cv2
+
+from match_quality import (MatchQuality, edge_similarity, histogram_similarity, quality_score, rank_matches,
+                           structural_similarity)
+from template_bank import TemplateBank
+
+
+class FakeQuality:
+    """Fixed scores that count how often each is read."""
+
+    def __init__(self, ssim, edges, histogram):
+        self.scores = {'structural_similarity': ssim, 'edge_similarity': edges, 'histogram_similarity': histogram}
+        self.reads = {name: 0 for name in self.scores}
+
+    def __getattr__(self, name):
+        if name in ('scores', 'reads'):
+            raise AttributeError(name)
+        self.reads[name] += 1
+        return self.scores[name]
+
+
+class FakeMatch:
+    def __init__(self, confidence, quality):
+        self.confidence = confidence
+        self.quality = quality
+
+
+def make_button():
+    button = np.full((40, 80, 3), (60, 140, 40), dtype=np.uint8)
+    cv2.putText(button, 'Accept', (8, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return button
+
+
+class TestMatchQuality(unittest.TestCase):
+    def setUp(self):
+        self.button = make_button()
+        self.gray = cv2.cvtColor(self.button, cv2.COLOR_BGR2GRAY)
+        other = np.full((40, 80, 3), (200, 60, 60), dtype=np.uint8)
+        cv2.putText(other, 'No', (30, 32), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        self.other = other
+
+    def test_identical_patches_score_one(self):
+        template = TemplateBank().add('button', self.button)
+        quality = MatchQuality(self.button, self.gray, template)
+        self.assertAlmostEqual(quality.structural_similarity, 1.0, places=2)
+        self.assertEqual(quality.edge_similarity, 1.0)
+        self.assertAlmostEqual(quality.histogram_similarity, 1.0, places=5)
+
+    def test_different_patches_score_lower(self):
+        other_gray = cv2.cvtColor(self.other, cv2.COLOR_BGR2GRAY)
+        self.assertLess(structural_similarity(self.gray, other_gray), 0.8)
+        self.assertLess(edge_similarity(self.gray, other_gray), 0.8)
+        self.assertLess(histogram_similarity(self.button, self.other), 0.5)
+
+
+    def test_rank_matches_agrees_with_full_sort(self):
+        rng = np.random.default_rng(0)
+        for trial in range(200):
+            # Coarse values make exact ties common
+            values = rng.integers(0, 5, (int(rng.integers(1, 12)), 4)) / 4.0
+            matches = [FakeMatch(c, FakeQuality(s, e, h)) for c, s, e, h in values]
+            expected = sorted(matches, key=quality_score, reverse=True)
+            for count in (1, 3):
+                self.assertEqual([id(m) for m in rank_matches(matches, count)],
+                                 [id(m) for m in expected[:count]])
+
+    def test_rank_matches_skips_hopeless_ssim(self):
+        strong = FakeMatch(0.99, FakeQuality(0.95, 0.9, 0.9))
+        weak = [FakeMatch(0.85, FakeQuality(0.3, 0.1, 0.1)) for _ in range(5)]
+        self.assertIs(rank_matches(weak + [strong])[0], strong)
+        self.assertEqual(sum(m.quality.reads['structural_similarity'] for m in weak), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
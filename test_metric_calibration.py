@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import cv2
+
+from metric_calibration import (METRIC_COST_ORDER, METRIC_FILE, HOVER_SCREEN_FILE, AFTER_SCREEN_FILE,
+                                MetricCalibrator, MetricChoice, calibrate_monitor, pick_match)
+from template_bank import TemplateBank
+
+
+def make_screen(width=320, height=240, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def make_button():
+    button = np.full((40, 80, 3), (60, 140, 40), dtype=np.uint8)
+    cv2.putText(button, 'Accept', (8, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return button
+
+
+class TestMetricCalibration(unittest.TestCase):
+    def setUp(self):
+        self.after_screen = make_screen()
+        self.hover_screen = self.after_screen.copy()
+        self.hover_screen[100:140, 150:230] = make_button()
+        self.template = TemplateBank().add('button', make_button())
+        self.calibrator = MetricCalibrator()
+
+    def test_picks_cheapest_separating_metric(self):
+        choice = self.calibrator.choose(self.template, [(self.hover_screen, (150, 100))],
+                                        [(self.hover_screen, (150, 100)), (self.after_screen, None)])
+        weakest, strongest = self.calibrator.separations(
+            self.template, [(self.hover_screen, (150, 100))], [(self.after_screen, None)])[choice.method]
+        self.assertEqual(choice.method, METRIC_COST_ORDER[0])
+        self.assertGreater(choice.threshold, strongest)
+        self.assertLess(choice.threshold, weakest)
+
+    def test_skips_metrics_that_do_not_separate(self):
+        # A dimmed (disabled) copy of the button fools CCORR and CCOEFF, which ignore contrast
+        lookalike = self.hover_screen.copy()
+        lookalike[20:60, 20:100] = cv2.convertScaleAbs(make_button(), alpha=0.6)
+        choice = self.calibrator.choose(self.template, [(lookalike, (150, 100))], [(lookalike, (150, 100))])
+        self.assertEqual(choice.method, cv2.TM_SQDIFF_NORMED)
+        self.assertIsNone(self.calibrator.choose(self.template, [(self.hover_screen, (150, 100))],
+                                                 [(self.hover_screen, None)]))
+
+    def test_pick_match_keeps_threshold_units(self):
+        peaks = {cv2.TM_CCOEFF_NORMED: (0.5, (1, 1)), cv2.TM_SQDIFF_NORMED: (0.1, (2, 2))}
+        self.assertEqual(pick_match(peaks, [(cv2.TM_CCOEFF_NORMED, 0.6), (cv2.TM_SQDIFF_NORMED, 0.2)]),
+                         (0.9, (2, 2)))
+        choice = MetricChoice(cv2.TM_SQDIFF_NORMED, 0.95, 0.2)
+        self.assertIsNone(pick_match(peaks, choice.match_methods()))
+
+    def test_calibrate_monitor_chooses_from_recording(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cv2.imwrite(os.path.join(directory, 'accept_button.png'), make_button())
+            cv2.imwrite(os.path.join(directory, 'accept_after.png'), self.after_screen[100:140, 150:230])
+            cv2.imwrite(os.path.join(directory, HOVER_SCREEN_FILE), self.hover_screen)
+            cv2.imwrite(os.path.join(directory, AFTER_SCREEN_FILE), self.after_screen)
+            choice = calibrate_monitor(directory)
+            self.assertIsNotNone(choice)
+            # The choice is kept in the calibration pack, not in a file of its own
+            self.assertFalse(os.path.exists(os.path.join(directory, METRIC_FILE)))
+            os.remove(os.path.join(directory, HOVER_SCREEN_FILE))
+            self.assertIsNone(calibrate_monitor(directory))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
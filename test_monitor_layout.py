@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import shutil
+import subprocess
+import unittest
+
+from monitor_layout import MonitorLayoutWatcher, monitor_layout
+
+XVFB_DISPLAY = ':95'
+
+
+class TestMonitorLayout(unittest.TestCase):
+    def test_layout_ignores_extra_keys(self):
+        monitors = [{'left': 0, 'top': 0, 'width': 1920, 'height': 1080, 'match': None},
+                    {'left': 1920, 'top': 0, 'width': 1280, 'height': 1024}]
+        self.assertEqual(monitor_layout(monitors), [(0, 0, 1920, 1080), (1920, 0, 1280, 1024)])
+        self.assertNotEqual(monitor_layout(monitors), monitor_layout(monitors[:1]))
+
+
+@unittest.skipUnless(sys.platform.startswith('linux') and shutil.which('Xvfb'), "Xvfb not installed")
+class TestMonitorLayoutUnderXvfb(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.xvfb = subprocess.Popen(['Xvfb', XVFB_DISPLAY, '-screen', '0', '1024x768x24', '-nolisten', 'tcp'],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Wait for the server socket to appear
+        socket = f"/tmp/.X11-unix/X{XVFB_DISPLAY[1:]}"
+        for _ in range(50):
+            if os.path.exists(socket):
+                break
+            time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.xvfb.terminate()
+        cls.xvfb.wait()
+
+    def setUp(self):
+        try:
+            from Xlib import display
+        except ImportError:
+            self.skipTest("python-xlib not installed")
+        self.xlib_display = display.Display(XVFB_DISPLAY)
+        if not self.xlib_display.has_extension('RANDR'):
+            self.skipTest("Xvfb without RandR")
+        self.watcher = MonitorLayoutWatcher(XVFB_DISPLAY)
+
+    def tearDown(self):
+        self.watcher.close()
+        self.xlib_display.close()
+
+    def wait_for_change(self):
+        for _ in range(50):
+            if self.watcher.poll():
+                return True
+            time.sleep(0.02)
+        return False
+
+    def test_reports_screen_resize(self):
+        self.assertFalse(self.watcher.poll())
+        root = self.xlib_display.screen().root
+        root.xrandr_set_screen_size(800, 600, 211, 158)
+        self.xlib_display.sync()
+        self.assertTrue(self.wait_for_change())
+        # Events are consumed; nothing further happened
+        self.assertFalse(self.watcher.poll())
+
+
+if __name__ == '__main__':
+    unittest.main()
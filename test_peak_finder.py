@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import cv2
+
+from peak_finder import find_peaks, non_max_suppression
+
+
+def make_screen(width=400, height=300, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height // 4, width // 4), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+class TestPeakFinder(unittest.TestCase):
+    def test_finds_every_instance(self):
+        screen = make_screen()
+        button = screen[10:50, 10:90].copy()
+        spots = [(250, 30), (40, 200), (300, 240)]
+        for x, y in spots:
+            screen[y:y + 40, x:x + 80] = button
+        result = cv2.matchTemplate(screen, button, cv2.TM_CCOEFF_NORMED)
+        peaks = find_peaks(result, 0.95, (80, 40))
+        self.assertEqual(sorted(loc for value, loc in peaks), sorted(spots + [(10, 10)]))
+        self.assertTrue(all(value > 0.99 for value, loc in peaks))
+
+    def test_sqdiff_peaks_are_minima(self):
+        screen = make_screen()
+        button = screen[100:140, 200:280].copy()
+        result = cv2.matchTemplate(screen, button, cv2.TM_SQDIFF_NORMED)
+        peaks = find_peaks(result, 0.05, (80, 40), lower_is_better=True)
+        self.assertEqual(peaks[0][1], (200, 100))
+        self.assertLess(peaks[0][0], 1e-4)
+        self.assertTrue(all(value <= 0.05 for value, loc in peaks))
+
+    def test_results_are_best_first_and_capped(self):
+        result = np.zeros((100, 100), np.float32)
+        for i, (x, y) in enumerate([(10, 10), (50, 10), (10, 60), (60, 60)]):
+            result[y, x] = 0.5 + 0.1 * i
+        peaks = find_peaks(result, 0.4, (20, 20), max_peaks=3)
+        self.assertEqual([loc for value, loc in peaks], [(60, 60), (10, 60), (50, 10)])
+        self.assertEqual(find_peaks(result, 0.9, (20, 20)), [])
+
+    def test_nms_merges_overlapping_boxes(self):
+        locations = [(0, 0), (5, 0), (100, 0), (40, 0)]
+        # (5, 0) overlaps the first 80x40 box by 75/85 IoU, (40, 0) by 1/3
+        self.assertEqual(non_max_suppression(locations, (80, 40), overlap=0.3), [0, 2])
+        self.assertEqual(non_max_suppression(locations, (80, 40), overlap=0.5), [0, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import time
+import threading
+import unittest
+from queue import Empty
+
+from pipeline import LatestQueue, DetectionPipeline
+
+
+class TestLatestQueue(unittest.TestCase):
+    def test_full_queue_drops_oldest(self):
+        q = LatestQueue(maxsize=2)
+        q.put(1)
+        q.put(2)
+        self.assertEqual(q.put(3), 1)
+        self.assertEqual(q.depth, 2)
+        self.assertEqual(q.dropped, 1)
+        self.assertEqual(q.get(), 2)
+        self.assertEqual(q.get(), 3)
+
+    def test_get_times_out(self):
+        with self.assertRaises(Empty):
+            LatestQueue().get(timeout=0.01)
+
+
+class TestDetectionPipeline(unittest.TestCase):
+    def test_items_flow_through_all_stages(self):
+        acted = []
+        counter = iter(range(1000))
+        pipeline = DetectionPipeline(lambda: next(counter), lambda item: item * 2,
+                                     lambda result: acted.append(result) or True, capture_interval=0.005)
+        pipeline.start()
+        time.sleep(0.2)
+        pipeline.stop()
+
+        self.assertFalse(pipeline.running)
+        self.assertGreater(len(acted), 0)
+        self.assertTrue(all(result % 2 == 0 for result in acted))
+        self.assertEqual(pipeline.stats()['acted'], len(acted))
+
+    def test_capture_continues_while_acting(self):
+        release = threading.Event()
+        pipeline = DetectionPipeline(lambda: time.time(), lambda item: item,
+                                     lambda result: release.wait(1.0), capture_interval=0.005)
+        pipeline.start()
+        time.sleep(0.2)
+        stats = pipeline.stats()
+        release.set()
+        pipeline.stop()
+
+        # The actuation stage is blocked, so capture keeps going and old frames are dropped
+        self.assertGreater(stats['captured'], 10)
+        self.assertGreater(stats['dropped_frames'] + stats['dropped_actions'], 0)
+        self.assertLessEqual(stats['action_queue_depth'], 1)
+
+    def test_results_from_before_an_action_are_stale(self):
+        acted = []
+
+        def act(result):
+            acted.append(result)
+            time.sleep(0.05)
+            return True
+
+        pipeline = DetectionPipeline(lambda: 1, lambda item: item, act, capture_interval=0.005)
+        pipeline.start()
+        time.sleep(0.3)
+        pipeline.stop()
+        self.assertGreater(pipeline.stale_actions, 0)
+
+    def test_every_captured_item_is_released_once(self):
+        release = threading.Event()
+        counter = iter(range(1000))
+        captured, released = [], []
+        lock = threading.Lock()
+
+        def capture():
+            item = next(counter)
+            captured.append(item)
+            return item
+
+        def release_item(item):
+            with lock:
+                released.append(item)
+
+        pipeline = DetectionPipeline(capture, lambda item: release.wait(0.05) and None,
+                                     lambda result: True, capture_interval=0.005, release_fn=release_item)
+        pipeline.start()
+        time.sleep(0.2)
+        release.set()
+        pipeline.stop()
+
+        # Detection is slower than capture, so frames are dropped; dropped, detected and
+        # still-queued frames are each handed back exactly once
+        self.assertGreater(pipeline.stats()['dropped_frames'], 0)
+        self.assertEqual(sorted(released), captured)
+
+    def test_restart_retires_busy_threads(self):
+        release = threading.Event()
+        pipeline = DetectionPipeline(lambda: 1, lambda item: item, lambda result: release.wait(2.0),
+                                     capture_interval=0.005)
+        pipeline.start()
+        time.sleep(0.1)
+        old_threads = pipeline.threads
+        pipeline.stop(timeout=0.05)
+        # The actuation stage is still inside act_fn
+        self.assertTrue(any(thread.is_alive() for thread in old_threads))
+
+        pipeline.start()
+        release.set()
+        for thread in old_threads:
+            thread.join(1.0)
+        self.assertFalse(any(thread.is_alive() for thread in old_threads))
+        self.assertTrue(pipeline.running)
+        pipeline.stop()
+
+    def test_stage_errors_are_counted(self):
+        def capture():
+            raise RuntimeError("boom")
+
+        pipeline = DetectionPipeline(capture, lambda item: item, lambda result: True, capture_interval=0.01)
+        pipeline.start()
+        time.sleep(0.05)
+        pipeline.stop()
+        self.assertGreater(pipeline.errors, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+import cv2
+
+from pyramid_match import PyramidMatcher, pyramid_levels
+
+
+def make_screen(width=640, height=480, seed=0):
+    """Smooth random background with a few distinct UI-like blocks."""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    screen = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    for _ in range(6):
+        x, y = int(rng.integers(0, width - 80)), int(rng.integers(0, height - 40))
+        cv2.rectangle(screen, (x, y), (x + 60, y + 25), tuple(int(c) for c in rng.integers(0, 256, 3)), -1)
+    return screen
+
+
+class TestPyramidMatcher(unittest.TestCase):
+    def test_levels_keep_template_large_enough(self):
+        self.assertEqual(pyramid_levels((40, 80), max_levels=2, min_template_side=10), 2)
+        self.assertEqual(pyramid_levels((20, 70), max_levels=2, min_template_side=10), 1)
+        self.assertEqual(pyramid_levels((12, 30), max_levels=2, min_template_side=10), 0)
+
+    def test_matches_full_resolution_location(self):
+        screen = make_screen()
+        matcher = PyramidMatcher()
+        for x, y in [(37, 91), (402, 250), (561, 433)]:
+            template = screen[y:y + 40, x:x + 80].copy()
+            for method in (cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED, cv2.TM_SQDIFF_NORMED):
+                value, loc = matcher.match(screen, template, method)
+                self.assertEqual(loc, (x, y), f"method {method}")
+
+    def test_value_equals_full_resolution_score(self):
+        screen = make_screen(seed=3)
+        template = screen[200:240, 300:380].copy()
+        value, loc = PyramidMatcher().match(screen, template, cv2.TM_CCOEFF_NORMED)
+        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        self.assertAlmostEqual(value, float(result[loc[1], loc[0]]), places=5)
+        self.assertAlmostEqual(value, float(result.max()), places=5)
+
+    def test_small_template_falls_back_to_full_search(self):
+        screen = make_screen(seed=5)
+        template = screen[100:110, 100:120].copy()
+        value, loc = PyramidMatcher().match(screen, template, cv2.TM_SQDIFF_NORMED)
+        self.assertEqual(loc, (100, 100))
+
+    def test_match_all_finds_repeated_buttons(self):
+        screen = make_screen(seed=7)
+        button = screen[50:90, 50:130].copy()
+        spots = [(50, 50), (300, 120), (480, 400)]
+        for x, y in spots[1:]:
+            screen[y:y + 40, x:x + 80] = button
+        for method, threshold in ((cv2.TM_CCOEFF_NORMED, 0.95), (cv2.TM_SQDIFF_NORMED, 0.05)):
+            peaks = PyramidMatcher().match_all(screen, button, method, threshold)
+            self.assertEqual(sorted(loc for value, loc in peaks), spots, f"method {method}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from roi_heatmap import RoiHeatmap
+
+
+class TestRoiHeatmap(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'monitor_0', 'roi_heatmap.npy')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_heatmap(self, **kwargs):
+        return RoiHeatmap(self.path, 3440, 1440, **kwargs)
+
+    def test_empty_heatmap_scans_full_frame(self):
+        self.assertIsNone(self.make_heatmap().plan(80, 40))
+
+    def test_hits_restrict_search_to_small_region(self):
+        heatmap = self.make_heatmap()
+        heatmap.hit(2900, 1200, 80, 40)
+        regions = heatmap.plan(80, 40)
+
+        self.assertEqual(len(regions), 1)
+        x, y, w, h = regions[0]
+        self.assertTrue(x <= 2900 and x + w >= 2980)
+        self.assertTrue(y <= 1200 and y + h >= 1240)
+        self.assertLess(heatmap.searched_fraction(regions), 0.05)
+
+    def test_heatmap_is_persisted(self):
+        heatmap = self.make_heatmap()
+        heatmap.hit(100, 100, 80, 40)
+        heatmap.flush()
+        self.assertEqual(self.make_heatmap().regions(80, 40), self.make_heatmap().regions(80, 40))
+        self.assertTrue(self.make_heatmap().grid.any())
+
+    def test_saves_are_debounced(self):
+        now = [0.0]
+        heatmap = self.make_heatmap(save_interval=30.0, clock=lambda: now[0])
+        heatmap.hit(100, 100, 80, 40)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(heatmap.dirty)
+
+        now[0] = 31.0
+        heatmap.hit(100, 100, 80, 40)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(heatmap.dirty)
+        mtime = os.stat(self.path).st_mtime_ns
+        heatmap.flush()
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+
+    def test_geometry_change_discards_heatmap(self):
+        heatmap = self.make_heatmap()
+        heatmap.hit(100, 100, 80, 40)
+        heatmap.flush()
+        other = RoiHeatmap(self.path, 1920, 1080)
+        self.assertFalse(other.grid.any())
+
+    def test_periodic_full_scan(self):
+        heatmap = self.make_heatmap(full_scan_every=3)
+        heatmap.hit(100, 100, 80, 40)
+        plans = [heatmap.plan(80, 40) for _ in range(3)]
+        self.assertIsNotNone(plans[0])
+        self.assertIsNotNone(plans[1])
+        self.assertIsNone(plans[2])
+
+    def test_miss_streak_triggers_full_scan(self):
+        heatmap = self.make_heatmap(full_scan_every=0, miss_streak_limit=2)
+        heatmap.hit(100, 100, 80, 40)
+        heatmap.miss()
+        heatmap.miss()
+        self.assertIsNone(heatmap.plan(80, 40))
+        self.assertIsNotNone(heatmap.plan(80, 40))
+
+    def test_regions_grow_to_template_size(self):
+        heatmap = self.make_heatmap(margin_cells=0)
+        heatmap.record(3430, 1430, 5, 5)
+        x, y, w, h = heatmap.regions(200, 100)[0]
+        self.assertGreaterEqual(w, 200)
+        self.assertGreaterEqual(h, 100)
+        self.assertLessEqual(x + w, 3440)
+        self.assertLessEqual(y + h, 1440)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from scale_search import ScaleSearch
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScaleSearch(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.searched = []
+
+    def search(self, scale):
+        self.searched.append(scale)
+        return {'confidence': 1.0 - abs(scale - 1.25)} if 1.1 <= scale <= 1.5 else None
+
+    def test_sweep_adopts_best_scale(self):
+        scales = ScaleSearch(clock=self.clock)
+        self.assertEqual(scales.scale('m0'), 1.0)
+        scale, match = scales.sweep('m0', self.search)
+        self.assertEqual(scale, 1.25)
+        self.assertNotIn(1.0, self.searched)
+        self.assertEqual(scales.scale('m0'), 1.25)
+        # The calibrated default only applies until a scale is adopted
+        self.assertEqual(scales.scale('m0', default=1.5), 1.25)
+        self.assertEqual(scales.scale('m1', default=1.5), 1.5)
+
+    def test_sweeps_are_rate_limited(self):
+        scales = ScaleSearch(resweep_interval=60.0, clock=self.clock)
+        self.assertEqual(scales.sweep('m0', lambda scale: None), (None, None))
+        self.clock.now = 30.0
+        self.searched = []
+        self.assertEqual(scales.sweep('m0', self.search), (None, None))
+        self.assertEqual(self.searched, [])
+        self.assertEqual(scales.sweep('m0', self.search, force=True)[0], 1.25)
+
+    def test_postpone_holds_sweeps_off(self):
+        scales = ScaleSearch(resweep_interval=60.0, clock=self.clock)
+        scales.postpone('m0')
+        self.assertEqual(scales.sweep('m0', self.search), (None, None))
+        self.clock.now = 61.0
+        self.assertEqual(scales.sweep('m0', self.search)[0], 1.25)
+
+    def test_weak_matches_are_not_adopted(self):
+        scales = ScaleSearch(clock=self.clock)
+        self.assertEqual(scales.sweep('m0', lambda scale: {'confidence': 0.85} if scale == 0.5 else None),
+                         (None, None))
+        self.assertEqual(scales.scale('m0'), 1.0)
+
+    def test_discovery_is_claimed_once(self):
+        scales = ScaleSearch(clock=self.clock)
+        self.assertTrue(scales.claim_discovery('m0'))
+        self.assertFalse(scales.claim_discovery('m0'))
+        self.assertTrue(scales.claim_discovery('m1'))
+        scales.forget('m0')
+        self.assertTrue(scales.claim_discovery('m0'))
+
+    def test_forget_resets_scale(self):
+        scales = ScaleSearch(clock=self.clock)
+        scales.sweep('m0', self.search)
+        scales.forget('m0')
+        self.assertEqual(scales.scale('m0'), 1.0)
+        self.assertEqual(scales.sweep('m0', self.search)[0], 1.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
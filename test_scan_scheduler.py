@@ -0,0 +1,60 @@
+import unittest
+
+from scan_scheduler import ScanScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScanScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cpu = FakeClock()
+
+    def make_scheduler(self, **kwargs):
+        kwargs.setdefault('burst_interval', 0.1)
+        kwargs.setdefault('idle_interval', 2.0)
+        kwargs.setdefault('half_life', 5.0)
+        kwargs.setdefault('cpu_budget', None)
+        return ScanScheduler(clock=self.clock, cpu_clock=self.cpu, **kwargs)
+
+    def test_starts_idle(self):
+        self.assertAlmostEqual(self.make_scheduler().next_interval(), 2.0)
+
+    def test_activity_bursts_then_decays(self):
+        scheduler = self.make_scheduler()
+        scheduler.notify_activity()
+        self.assertAlmostEqual(scheduler.next_interval(), 0.1)
+
+        self.clock.now = 5.0  # One half-life later the interval is halfway back to idle
+        self.assertAlmostEqual(scheduler.next_interval(), 1.05)
+
+        self.clock.now = 60.0
+        self.assertAlmostEqual(scheduler.next_interval(), 2.0, places=3)
+
+    def test_cpu_budget_stretches_interval(self):
+        scheduler = self.make_scheduler(cpu_budget=0.25)
+        scheduler.notify_activity()
+        scheduler.next_interval()
+
+        # Each scan cycle costs 0.1 s of CPU, so at most one scan every 0.4 s
+        self.cpu.now += 0.1
+        self.assertAlmostEqual(scheduler.next_interval(), 0.4)
+        self.assertEqual(scheduler.throttled, 1)
+
+    def test_cheap_scans_are_not_throttled(self):
+        scheduler = self.make_scheduler(cpu_budget=0.25)
+        scheduler.notify_activity()
+        scheduler.next_interval()
+        self.cpu.now += 0.001
+        self.assertAlmostEqual(scheduler.next_interval(), 0.1)
+        self.assertEqual(scheduler.throttled, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+from screen_capture import CaptureEngine
+
+
+class FakeShot:
+    def __init__(self, bgra):
+        self.height, self.width = bgra.shape[:2]
+        self.raw = bytearray(bgra.tobytes())
+
+
+class FakeSct:
+    """Stands in for an mss session and returns a new solid colour on every grab."""
+
+    def __init__(self):
+        self.monitors = [{'left': 0, 'top': 0, 'width': 64, 'height': 32}] * 2
+        self.grabs = 0
+
+    def grab(self, region):
+        self.grabs += 1
+        bgra = np.zeros((region['height'], region['width'], 4), dtype=np.uint8)
+        bgra[..., 0] = self.grabs  # Blue channel carries the grab count
+        bgra[..., 3] = 255
+        return FakeShot(bgra)
+
+    def close(self):
+        pass
+
+
+class TestCaptureEngine(unittest.TestCase):
+    def setUp(self):
+        self.region = {'left': 0, 'top': 0, 'width': 64, 'height': 32}
+        self.engine = CaptureEngine(ring_size=3, sct=FakeSct())
+
+    def test_frame_is_read_only_bgr(self):
+        frame = self.engine.grab(self.region)
+        self.assertEqual(frame.image.shape, (32, 64, 3))
+        self.assertFalse(frame.image.flags.writeable)
+        self.assertEqual(frame.image[0, 0, 0], 1)
+        with self.assertRaises(ValueError):
+            frame.image[0, 0, 0] = 0
+
+    def test_frame_ids_and_timestamps_increase(self):
+        first = self.engine.grab(self.region)
+        second = self.engine.grab(self.region)
+        self.assertEqual(second.frame_id, first.frame_id + 1)
+        self.assertGreaterEqual(second.timestamp, first.timestamp)
+        self.assertIs(self.engine.latest(self.region), second)
+
+    def test_ring_buffers_are_reused(self):
+        frames = [self.engine.grab(self.region) for _ in range(4)]
+        # The fourth grab wraps around and writes into the first slot
+        self.assertTrue(np.shares_memory(frames[0].image, frames[3].image))
+        self.assertFalse(np.shares_memory(frames[0].image, frames[1].image))
+        self.assertEqual(len(self.engine._rings), 1)
+
+    def test_leased_slots_are_not_overwritten(self):
+        leased = self.engine.grab(self.region, lease=True)
+        frames = [self.engine.grab(self.region) for _ in range(4)]
+        self.assertFalse(any(np.shares_memory(leased.image, frame.image) for frame in frames))
+        self.assertEqual(leased.image[0, 0, 0], 1)
+
+        # Leasing every slot grows the ring instead of reusing one
+        more = [self.engine.grab(self.region, lease=True) for _ in range(3)]
+        self.assertEqual(len(self.engine._rings[(32, 64)]), 4)
+        self.assertEqual([frame.image[0, 0, 0] for frame in [leased] + more], [1, 6, 7, 8])
+
+        self.engine.release(leased)
+        for frame in more:
+            self.engine.release(frame.image)
+        reused = [self.engine.grab(self.region) for _ in range(4)]
+        self.assertTrue(any(np.shares_memory(leased.image, frame.image) for frame in reused))
+
+    def test_release_buffers(self):
+        self.engine.grab(self.region)
+        self.engine.release_buffers()
+        self.assertIsNone(self.engine.latest(self.region))
+        self.assertEqual(len(self.engine._rings), 0)
+
+    def test_refresh_layout_reopens_mss(self):
+        self.engine.grab(self.region)
+        plugged = FakeSct()
+        plugged.monitors = plugged.monitors + [{'left': 64, 'top': 0, 'width': 32, 'height': 32}]
+        with patch('screen_capture.mss.mss', return_value=plugged):
+            monitors = self.engine.refresh_layout()
+        self.assertEqual(len(monitors), 2)
+        self.assertIs(self.engine.sct, plugged)
+        self.assertIsNone(self.engine.latest(self.region))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import cv2
+
+from template_bank import TemplateBank
+
+
+class TestTemplateBank(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, (40, 80, 3), dtype=np.uint8)
+        self.path = os.path.join(self.temp_dir, 'accept_button.png')
+        cv2.imwrite(self.path, self.image)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_representations_are_precomputed(self):
+        template = TemplateBank().get(self.path)
+        np.testing.assert_array_equal(template.bgr, self.image)
+        np.testing.assert_array_equal(template.gray, cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+        self.assertEqual(template.size, (80, 40))
+        self.assertEqual([level.shape for level in template.gray_pyramid], [(20, 40), (10, 20)])
+        self.assertAlmostEqual(template.gray_mean, float(template.gray.mean()))
+        self.assertAlmostEqual(template.gray_norm, float(np.linalg.norm(template.gray.astype(np.float64))))
+        self.assertIsNone(template.mask)
+        self.assertFalse(template.bgr.flags.writeable)
+
+    def test_file_is_read_once(self):
+        bank = TemplateBank()
+        with patch('template_bank.cv2.imread', wraps=cv2.imread) as imread:
+            first = bank.get(self.path)
+            second = bank.get(self.path)
+        self.assertIs(first, second)
+        self.assertEqual(imread.call_count, 1)
+
+    def test_missing_file_is_cached(self):
+        bank = TemplateBank()
+        missing = os.path.join(self.temp_dir, 'missing.png')
+        self.assertIsNone(bank.get(missing))
+        cv2.imwrite(missing, self.image)
+        self.assertIsNone(bank.get(missing))
+        bank.invalidate(missing)
+        self.assertIsNotNone(bank.get(missing))
+
+    def test_transposed_template_is_rotated(self):
+        cv2.imwrite(self.path, cv2.rotate(self.image, cv2.ROTATE_90_COUNTERCLOCKWISE))
+        template = TemplateBank().get(self.path, expected_size=(80, 40))
+        np.testing.assert_array_equal(template.bgr, self.image)
+
+    def test_alpha_channel_becomes_mask(self):
+        bgra = cv2.cvtColor(self.image, cv2.COLOR_BGR2BGRA)
+        bgra[:10, :10, 3] = 0
+        template = TemplateBank().add('masked', bgra)
+        self.assertEqual(template.bgr.shape, (40, 80, 3))
+        self.assertEqual(template.mask[0, 0], 0)
+        self.assertEqual(template.mask[20, 40], 255)
+
+    def test_scaled_copies_are_compiled_once(self):
+        template = TemplateBank().get(self.path)
+        scaled = template.scaled(1.5)
+        self.assertEqual(scaled.size, (120, 60))
+        self.assertIs(template.scaled(1.5), scaled)
+        self.assertIs(template.scaled(1.0), template)
+        self.assertEqual(template.scaled(0.5).gray_pyramid[0].shape, (10, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+import cv2
+
+from tiled_match import TiledMatchCache
+
+
+class TestTiledMatchCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.frame = rng.integers(0, 256, (300, 420), dtype=np.uint8)
+        self.template = self.frame[100:140, 200:280].copy()
+
+    def full_tiled_recompute(self, frame):
+        return TiledMatchCache(tile_size=64).match(frame, self.template).copy()
+
+    def test_first_match_agrees_with_opencv(self):
+        cache = TiledMatchCache(tile_size=64)
+        result = cache.match(self.frame, self.template)
+        expected = cv2.matchTemplate(self.frame, self.template, cv2.TM_CCOEFF_NORMED)
+        self.assertEqual(result.shape, expected.shape)
+        np.testing.assert_allclose(result, expected, atol=1e-4)
+        self.assertEqual(cv2.minMaxLoc(result)[3], cv2.minMaxLoc(expected)[3])
+        self.assertEqual(cache.last_dirty_tiles, cache.last_total_tiles)
+
+    def test_incremental_equals_full_recompute(self):
+        cache = TiledMatchCache(tile_size=64)
+        cache.match(self.frame, self.template)
+
+        # Simulate a streaming reply changing a strip of the screen
+        changed = self.frame.copy()
+        changed[220:236, 10:180] = 255
+        result = cache.match(changed, self.template)
+
+        self.assertGreater(cache.last_dirty_tiles, 0)
+        self.assertLess(cache.last_dirty_tiles, cache.last_total_tiles)
+        np.testing.assert_array_equal(result, self.full_tiled_recompute(changed))
+        np.testing.assert_allclose(
+            result, cv2.matchTemplate(changed, self.template, cv2.TM_CCOEFF_NORMED), atol=1e-4)
+
+    def test_change_inside_template_padding_marks_tile_dirty(self):
+        cache = TiledMatchCache(tile_size=64)
+        cache.match(self.frame, self.template)
+
+        # A pixel just past a tile boundary still lies in the padded window of the previous tile
+        changed = self.frame.copy()
+        changed[10, 64 + 20] ^= 0xFF
+        result = cache.match(changed, self.template)
+        np.testing.assert_array_equal(result, self.full_tiled_recompute(changed))
+
+    def test_unchanged_frame_rematches_nothing(self):
+        cache = TiledMatchCache(tile_size=64)
+        cache.match(self.frame, self.template)
+        cache.match(self.frame.copy(), self.template)
+        self.assertEqual(cache.last_dirty_tiles, 0)
+
+    def test_colour_frames_and_template_change(self):
+        rng = np.random.default_rng(3)
+        frame = rng.integers(0, 256, (200, 260, 3), dtype=np.uint8)
+        cache = TiledMatchCache(tile_size=50)
+        cache.match(frame, frame[20:60, 30:110].copy())
+
+        other = frame[120:160, 100:180].copy()
+        result = cache.match(frame, other)
+        self.assertEqual(cache.last_dirty_tiles, cache.last_total_tiles)
+        np.testing.assert_allclose(result, cv2.matchTemplate(frame, other, cv2.TM_CCOEFF_NORMED), atol=1e-4)
+
+    def test_template_larger_than_frame(self):
+        self.assertIsNone(TiledMatchCache().match(self.template, self.frame))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import shutil
+import subprocess
+import unittest
+from unittest.mock import patch
+
+from screen_capture import CaptureEngine, MssBackend, create_backend
+from x11_capture import XShmBackend, X11CaptureError
+
+XVFB_DISPLAY = ':97'
+
+
+class TestBackendFallback(unittest.TestCase):
+    def test_unreachable_display_falls_back_to_mss(self):
+        with patch.dict(os.environ, {'DISPLAY': ':12345'}):
+            self.assertIsInstance(create_backend(), MssBackend)
+
+    def test_missing_display_raises(self):
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(X11CaptureError):
+                XShmBackend()
+
+    def test_explicit_mss_backend(self):
+        self.assertIsInstance(create_backend('mss'), MssBackend)
+
+
+@unittest.skipUnless(sys.platform.startswith('linux') and shutil.which('Xvfb'), "Xvfb not installed")
+class TestXShmBackendUnderXvfb(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.xvfb = subprocess.Popen(['Xvfb', XVFB_DISPLAY, '-screen', '0', '320x240x24', '-nolisten', 'tcp'],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Wait for the server socket to appear
+        socket = f"/tmp/.X11-unix/X{XVFB_DISPLAY[1:]}"
+        for _ in range(50):
+            if os.path.exists(socket):
+                break
+            time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.xvfb.terminate()
+        cls.xvfb.wait()
+
+    def setUp(self):
+        try:
+            from Xlib import display
+        except ImportError:
+            self.skipTest("python-xlib not installed")
+        self.xlib_display = display.Display(XVFB_DISPLAY)
+        self.root = self.xlib_display.screen().root
+        self.backend = XShmBackend(XVFB_DISPLAY)
+
+    def tearDown(self):
+        self.backend.close()
+        self.xlib_display.close()
+
+    def fill(self, colour, x, y, width, height):
+        gc = self.root.create_gc(foreground=colour)
+        self.root.fill_rectangle(gc, x, y, width, height)
+        self.xlib_display.sync()
+
+    def test_grab_returns_bgra_pixels(self):
+        self.fill(0x0000ff, 10, 20, 40, 30)
+        pixels = self.backend.grab({'left': 0, 'top': 0, 'width': 100, 'height': 80})
+        self.assertEqual(pixels.shape, (80, 100, 4))
+        self.assertEqual(tuple(pixels[30, 20, :3]), (255, 0, 0))  # Blue in BGR order
+
+    def test_damage_reports_changed_rectangle(self):
+        if self.backend.damage is None:
+            self.skipTest("XDamage not available")
+        self.backend.poll_damage()
+        self.fill(0x00ff00, 200, 100, 20, 10)
+        time.sleep(0.1)
+        rects = self.backend.poll_damage()
+        self.assertTrue(any(x <= 200 and y <= 100 and x + w >= 220 and y + h >= 110
+                            for x, y, w, h in rects))
+
+    def test_engine_skips_untouched_regions(self):
+        if self.backend.damage is None:
+            self.skipTest("XDamage not available")
+        engine = CaptureEngine(backend=self.backend)
+        left = {'left': 0, 'top': 0, 'width': 100, 'height': 100}
+        right = {'left': 200, 'top': 0, 'width': 100, 'height': 100}
+        engine.grab(left)
+        engine.grab(right)
+
+        self.fill(0xffffff, 220, 10, 5, 5)
+        time.sleep(0.1)
+        self.assertFalse(engine.has_changed(left))
+        self.assertTrue(engine.has_changed(right))
+
+    def test_region_outside_screen_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.backend.grab({'left': 300, 'top': 0, 'width': 100, 'height': 10})
+
+
+if __name__ == '__main__':
+    unittest.main()
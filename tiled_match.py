@@ -0,0 +1,88 @@
+import logging
+import numpy as np
+import cv2
+
+
+class TiledMatchCache:
+    """Correlation map built from per-tile matchTemplate calls, keeping the result of every tile.
+
+    The result map is split into tiles. Each tile is computed from the frame
+    window it depends on, i.e. the tile padded by the template size. On the
+    next frame only tiles whose window contains a changed pixel are
+    re-matched; the rest are reused from the cached map. Because every tile
+    is always computed from the same inputs, the merged map is identical to
+    a full tile-by-tile recompute.
+    """
+
+    def __init__(self, tile_size=256, method=cv2.TM_CCOEFF_NORMED):
+        self.logger = logging.getLogger('tiled_match')
+        self.tile_size = tile_size
+        self.method = method
+        self._frame = None
+        self._template = None
+        self._result = None
+        self.last_dirty_tiles = 0
+        self.last_total_tiles = 0
+
+    def reset(self):
+        """Forget the cached frame and correlation map."""
+        self._frame = None
+        self._template = None
+        self._result = None
+
+    def _tiles(self, result_height, result_width):
+        for y0 in range(0, result_height, self.tile_size):
+            for x0 in range(0, result_width, self.tile_size):
+                yield y0, min(y0 + self.tile_size, result_height), x0, min(x0 + self.tile_size, result_width)
+
+    def _changed_pixels(self, frame):
+        """Integral image of the mask of pixels that differ from the cached frame."""
+        changed = frame != self._frame
+        if changed.ndim == 3:
+            changed = changed.any(axis=2)
+        return cv2.integral(changed.view(np.uint8))
+
+    def match(self, frame, template):
+        """Return the correlation map of template over frame, re-matching only dirty tiles."""
+        frame_h, frame_w = frame.shape[:2]
+        template_h, template_w = template.shape[:2]
+        result_h, result_w = frame_h - template_h + 1, frame_w - template_w + 1
+        if result_h <= 0 or result_w <= 0:
+            return None
+
+        full = (self._result is None or
+                self._frame.shape != frame.shape or
+                self._template.shape != template.shape or
+                not np.array_equal(self._template, template))
+        if full:
+            self._result = np.empty((result_h, result_w), dtype=np.float32)
+            self._template = template.copy()
+        else:
+            integral = self._changed_pixels(frame)
+
+        dirty = 0
+        total = 0
+        for y0, y1, x0, x1 in self._tiles(result_h, result_w):
+            total += 1
+            # Frame window this tile depends on: the tile padded by the template size
+            wy1, wx1 = y1 + template_h - 1, x1 + template_w - 1
+            if not full:
+                changed = (integral[wy1, wx1] - integral[y0, wx1] -
+                           integral[wy1, x0] + integral[y0, x0])
+                if not changed:
+                    continue
+            dirty += 1
+            self._result[y0:y1, x0:x1] = cv2.matchTemplate(frame[y0:wy1, x0:wx1], template, self.method)
+
+        if self._frame is None or self._frame.shape != frame.shape:
+            self._frame = frame.copy()
+        elif dirty:
+            np.copyto(self._frame, frame)
+
+        self.last_dirty_tiles = dirty
+        self.last_total_tiles = total
+        self.logger.debug(f"Re-matched {dirty}/{total} tiles")
+
+        view = self._result.view()
+        view.flags.writeable = False
+        return view
@@ -0,0 +1,342 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+import logging
+from collections import OrderedDict
+import numpy as np
+
+
+class X11CaptureError(RuntimeError):
+    """Raised when the X server or the MIT-SHM extension cannot be used."""
+
+
+# Xlib / SysV IPC constants
+ZPIXMAP = 2
+ALL_PLANES = ctypes.c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+X_DAMAGE_REPORT_RAW_RECTANGLES = 0
+X_DAMAGE_NOTIFY = 0
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int)
+    ]
+
+
+class XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; only these are read
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int)
+    ]
+
+
+class XRectangle(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_short),
+        ('y', ctypes.c_short),
+        ('width', ctypes.c_ushort),
+        ('height', ctypes.c_ushort)
+    ]
+
+
+class XDamageNotifyEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('serial', ctypes.c_ulong),
+        ('send_event', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('drawable', ctypes.c_ulong),
+        ('damage', ctypes.c_ulong),
+        ('level', ctypes.c_int),
+        ('more', ctypes.c_int),
+        ('timestamp', ctypes.c_ulong),
+        ('area', XRectangle),
+        ('geometry', XRectangle)
+    ]
+
+
+class XEvent(ctypes.Union):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('damage', XDamageNotifyEvent),
+        ('pad', ctypes.c_long * 24)
+    ]
+
+
+X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+# Xlib has one error handler per process; every X11 user in this process shares this one
+_error_handler = None
+_error_listeners = []
+
+
+def _dispatch_x_error(display, event):
+    for listener in list(_error_listeners):
+        listener(display, event)
+    return 0
+
+
+def add_error_listener(x11, listener):
+    """Call listener(display, event) on every X error instead of letting Xlib exit the process."""
+    global _error_handler
+    if _error_handler is None:
+        _error_handler = X_ERROR_HANDLER(_dispatch_x_error)
+        x11.XSetErrorHandler(_error_handler)
+    _error_listeners.append(listener)
+
+
+def remove_error_listener(listener):
+    if listener in _error_listeners:
+        _error_listeners.remove(listener)
+
+
+def _load_library(name, required=True):
+    path = ctypes.util.find_library(name)
+    if path is None:
+        if required:
+            raise X11CaptureError(f"lib{name} not found")
+        return None
+    return ctypes.CDLL(path)
+
+
+class _ShmImage:
+    """One XShm image and its shared memory segment, reused for every grab of the same size."""
+
+    def __init__(self, backend, width, height):
+        self.backend = backend
+        self.shminfo = XShmSegmentInfo()
+        self.ximage = None
+        self.attached = False
+
+        xext = backend.xext
+        self.ximage = xext.XShmCreateImage(backend.display, backend.visual, backend.depth, ZPIXMAP,
+                                           None, ctypes.byref(self.shminfo), width, height)
+        if not self.ximage:
+            raise X11CaptureError("XShmCreateImage failed")
+
+        image = self.ximage.contents
+        if image.bits_per_pixel != 32:
+            self.close()
+            raise X11CaptureError(f"Unsupported pixel format: {image.bits_per_pixel} bpp")
+
+        size = image.bytes_per_line * height
+        libc = backend.libc
+        self.shminfo.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if self.shminfo.shmid < 0:
+            self.close()
+            raise X11CaptureError("shmget failed")
+
+        self.shminfo.shmaddr = libc.shmat(self.shminfo.shmid, None, 0)
+        if self.shminfo.shmaddr in (None, ctypes.c_void_p(-1).value):
+            self.shminfo.shmaddr = None
+            self.close()
+            raise X11CaptureError("shmat failed")
+        image.data = self.shminfo.shmaddr
+        self.shminfo.readOnly = 0
+
+        if not xext.XShmAttach(backend.display, ctypes.byref(self.shminfo)):
+            self.close()
+            raise X11CaptureError("XShmAttach failed")
+        self.attached = True
+        backend.x11.XSync(backend.display, 0)
+        # Both sides are attached; the segment is freed as soon as both detach
+        libc.shmctl(self.shminfo.shmid, IPC_RMID, None)
+
+        buffer = (ctypes.c_ubyte * size).from_address(self.shminfo.shmaddr)
+        rows = np.frombuffer(buffer, dtype=np.uint8).reshape(height, image.bytes_per_line)
+        self.array = rows[:, :width * 4].reshape(height, width, 4)
+
+    def close(self):
+        backend = self.backend
+        if self.attached:
+            backend.xext.XShmDetach(backend.display, ctypes.byref(self.shminfo))
+            backend.x11.XSync(backend.display, 0)
+            self.attached = False
+        if self.ximage:
+            self.ximage.contents.data = None
+            backend.x11.XFree(self.ximage)
+            self.ximage = None
+        if self.shminfo.shmaddr:
+            backend.libc.shmdt(ctypes.c_void_p(self.shminfo.shmaddr))
+            self.shminfo.shmaddr = None
+
+
+class XShmBackend:
+    """Zero-copy X11 capture through MIT-SHM, with XDamage reporting which rectangles changed.
+
+    Grabs return a BGRA view onto the shared memory segment, valid until the
+    next grab of a region with the same size.
+    """
+
+    name = 'xshm'
+
+    def __init__(self, display_name=None, max_images=8):
+        self.logger = logging.getLogger('x11_capture')
+        self.max_images = max_images
+        self.display = None
+        self.damage = None
+        self._images = OrderedDict()  # (width, height) -> _ShmImage
+        self._pending_damage = []
+        self._last_error = None
+
+        if not sys.platform.startswith('linux'):
+            raise X11CaptureError("MIT-SHM capture is only available on Linux")
+        display_name = display_name or os.environ.get('DISPLAY')
+        if not display_name:
+            raise X11CaptureError("DISPLAY is not set")
+
+        self.x11 = _load_library('X11')
+        self.xext = _load_library('Xext')
+        self.libc = _load_library('c')
+        self.xdamage = _load_library('Xdamage', required=False)
+        self._declare_functions()
+
+        self.display = self.x11.XOpenDisplay(display_name.encode())
+        if not self.display:
+            raise X11CaptureError(f"Cannot open display {display_name}")
+
+        # Record X errors instead of letting Xlib's default handler exit the process
+        add_error_listener(self.x11, self._on_x_error)
+
+        if not self.xext.XShmQueryExtension(self.display):
+            self.close()
+            raise X11CaptureError("MIT-SHM extension not available")
+
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        self.screen_width = self.x11.XDisplayWidth(self.display, screen)
+        self.screen_height = self.x11.XDisplayHeight(self.display, screen)
+
+        self._damage_event_base = None
+        if self.xdamage is not None:
+            event_base, error_base = ctypes.c_int(), ctypes.c_int()
+            if self.xdamage.XDamageQueryExtension(self.display, ctypes.byref(event_base), ctypes.byref(error_base)):
+                self._damage_event_base = event_base.value
+                self.damage = self.xdamage.XDamageCreate(self.display, self.root, X_DAMAGE_REPORT_RAW_RECTANGLES)
+                self.x11.XSync(self.display, 0)
+        if self.damage is None:
+            self.logger.info("XDamage not available; changes will not be reported")
+
+    def _declare_functions(self):
+        x11, xext, libc = self.x11, self.xext, self.libc
+        vp, ul, i, ui = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_uint
+
+        x11.XOpenDisplay.restype = vp
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [vp]
+        x11.XDefaultScreen.argtypes = [vp]
+        x11.XRootWindow.restype = ul
+        x11.XRootWindow.argtypes = [vp, i]
+        x11.XDefaultVisual.restype = vp
+        x11.XDefaultVisual.argtypes = [vp, i]
+        x11.XDefaultDepth.argtypes = [vp, i]
+        x11.XDisplayWidth.argtypes = [vp, i]
+        x11.XDisplayHeight.argtypes = [vp, i]
+        x11.XSync.argtypes = [vp, i]
+        x11.XFree.argtypes = [vp]
+        x11.XPending.argtypes = [vp]
+        x11.XNextEvent.argtypes = [vp, ctypes.POINTER(XEvent)]
+        x11.XSetErrorHandler.restype = vp
+        x11.XSetErrorHandler.argtypes = [X_ERROR_HANDLER]
+
+        xext.XShmQueryExtension.argtypes = [vp]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmCreateImage.argtypes = [vp, vp, ui, i, ctypes.c_char_p, ctypes.POINTER(XShmSegmentInfo), ui, ui]
+        xext.XShmAttach.argtypes = [vp, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [vp, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [vp, ul, ctypes.POINTER(XImage), i, i, ul]
+
+        libc.shmget.restype = i
+        libc.shmget.argtypes = [i, ctypes.c_size_t, i]
+        libc.shmat.restype = vp
+        libc.shmat.argtypes = [i, vp, i]
+        libc.shmdt.argtypes = [vp]
+        libc.shmctl.argtypes = [i, i, vp]
+
+        if self.xdamage is not None:
+            self.xdamage.XDamageQueryExtension.argtypes = [vp, ctypes.POINTER(i), ctypes.POINTER(i)]
+            self.xdamage.XDamageCreate.restype = ul
+            self.xdamage.XDamageCreate.argtypes = [vp, ul, i]
+            self.xdamage.XDamageDestroy.argtypes = [vp, ul]
+
+    def _on_x_error(self, display, event):
+        if display == self.display:
+            self._last_error = True
+
+    def _image(self, width, height):
+        key = (width, height)
+        image = self._images.get(key)
+        if image is None:
+            image = _ShmImage(self, width, height)
+            self._images[key] = image
+            if len(self._images) > self.max_images:
+                _, oldest = self._images.popitem(last=False)
+                oldest.close()
+        else:
+            self._images.move_to_end(key)
+        return image
+
+    def grab(self, region):
+        """Capture a region of the root window and return a BGRA view onto shared memory."""
+        left, top, width, height = region['left'], region['top'], region['width'], region['height']
+        if (left < 0 or top < 0 or width <= 0 or height <= 0 or
+                left + width > self.screen_width or top + height > self.screen_height):
+            raise ValueError(f"Region {region} is outside the {self.screen_width}x{self.screen_height} screen")
+
+        image = self._image(width, height)
+        self._last_error = None
+        if not self.xext.XShmGetImage(self.display, self.root, image.ximage, left, top, ALL_PLANES):
+            raise X11CaptureError("XShmGetImage failed")
+        if self._last_error:
+            raise X11CaptureError("X error during XShmGetImage")
+        return image.array
+
+    def poll_damage(self):
+        """Return the rectangles (left, top, width, height) damaged since the last poll, or None if unknown."""
+        if self.damage is None:
+            return None
+
+        event = XEvent()
+        notify_type = self._damage_event_base + X_DAMAGE_NOTIFY
+        while self.x11.XPending(self.display):
+            self.x11.XNextEvent(self.display, ctypes.byref(event))
+            if event.type == notify_type:
+                area = event.damage.area
+                self._pending_damage.append((area.x, area.y, area.width, area.height))
+
+        rects, self._pending_damage = self._pending_damage, []
+        return rects
+
+    def close(self):
+        """Detach all shared memory segments and close the display."""
+        for image in self._images.values():
+            image.close()
+        self._images.clear()
+        if self.display:
+            if self.damage is not None:
+                self.xdamage.XDamageDestroy(self.display, self.damage)
+                self.damage = None
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+        remove_error_listener(self._on_x_error)